@@ -0,0 +1,114 @@
+"""
+Measures the effect of Arrow IPC compression on Flight downloads.
+
+Usage:
+    python misc/benchmarks/flight_compression_benchmark.py [--rows 1000000]
+        [--bandwidth-mbps 1000]
+
+Starts a local Flight server and, for typical tables (numeric, wide
+string-heavy and mixed), reports the size of the IPC stream sent by do_get
+with every codec and the end-to-end latency of do_get on the loopback
+interface. Loopback hides the transfer time, so the latency expected on
+a link of the given bandwidth (loopback latency plus stream size divided
+by bandwidth) is reported as well.
+"""
+
+import argparse
+import random
+import string
+import threading
+import timeit
+
+import numpy as np
+import pyarrow
+import pyarrow.flight
+
+from tabpy.tabpy_server.app.arrow_server import COMPRESSION_CODECS, COMPRESSION_HEADER
+from tabpy.tabpy_server.app.arrow_server import FlightServer
+
+
+def _make_tables(rows):
+    rnd = random.Random(42)
+    words = ["".join(rnd.choices(string.ascii_lowercase, k=12)) for _ in range(5000)]
+    rng = np.random.default_rng(42)
+    numeric = pyarrow.table(
+        {f"f{i}": rng.normal(size=rows) for i in range(4)}
+        | {f"i{i}": rng.integers(0, 1000, size=rows) for i in range(4)}
+    )
+    strings = pyarrow.table(
+        {
+            f"s{i}": pyarrow.array(rng.choice(words, size=rows // 4))
+            for i in range(20)
+        }
+    )
+    mixed = pyarrow.table(
+        {
+            "id": np.arange(rows),
+            "score": rng.random(size=rows),
+            "category": pyarrow.array(rng.choice(words[:50], size=rows)),
+            "comment": pyarrow.array(rng.choice(words, size=rows)),
+        }
+    )
+    return {"numeric": numeric, "strings": strings, "mixed": mixed}
+
+
+def _stream_size(table, compression):
+    options = None
+    if compression != "none":
+        options = pyarrow.ipc.IpcWriteOptions(compression=compression)
+    sink = pyarrow.MockOutputStream()
+    with pyarrow.ipc.new_stream(sink, table.schema, options=options) as writer:
+        writer.write_table(table)
+    return sink.size()
+
+
+def _download(server, client, table, compression):
+    descriptor = pyarrow.flight.FlightDescriptor.for_path("benchmark")
+    server.flights[FlightServer.descriptor_to_key(descriptor)] = table
+    options = pyarrow.flight.FlightCallOptions(
+        headers=[(COMPRESSION_HEADER.encode(), compression.encode())]
+    )
+    info = client.get_flight_info(descriptor)
+    client.do_get(info.endpoints[0].ticket, options).read_all()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rows", type=int, default=1000000)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--bandwidth-mbps", type=float, default=1000)
+    args = parser.parse_args()
+
+    server = FlightServer("localhost", "grpc+tcp://localhost:0")
+    threading.Thread(target=server.serve, daemon=True).start()
+    client = pyarrow.flight.FlightClient(f"grpc+tcp://localhost:{server.port}")
+
+    bytes_per_second = args.bandwidth_mbps * 1000 * 1000 / 8
+    print(
+        f"{'table':>8} {'codec':>10} {'stream size':>14} {'ratio':>6} "
+        f"{'loopback':>10} {f'{args.bandwidth_mbps:g} Mbps':>12}"
+    )
+    try:
+        for name, table in _make_tables(args.rows).items():
+            uncompressed = _stream_size(table, "none")
+            for compression in COMPRESSION_CODECS:
+                size = _stream_size(table, compression)
+                latency = min(
+                    timeit.repeat(
+                        lambda: _download(server, client, table, compression),
+                        number=1,
+                        repeat=args.repeat,
+                    )
+                )
+                on_link = latency + size / bytes_per_second
+                print(
+                    f"{name:>8} {compression:>10} {size / 2**20:>11.1f} MB "
+                    f"{uncompressed / size:>6.2f} {latency * 1000:>8.1f}ms "
+                    f"{on_link * 1000:>10.1f}ms"
+                )
+    finally:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
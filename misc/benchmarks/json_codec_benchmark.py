@@ -0,0 +1,68 @@
+"""
+Compares JSON codecs available to TabPy on /evaluate-like payloads.
+
+Usage:
+    python misc/benchmarks/json_codec_benchmark.py [--sizes 100000 1000000]
+
+For every payload size the script times decoding a request body with
+two float and one string argument columns, and encoding a float result
+list (with NaN values) and the same result as a NumPy array.
+"""
+
+import argparse
+import json
+import random
+import string
+import timeit
+
+import numpy as np
+
+from tabpy.tabpy_server.common import json_codec
+
+
+def _make_payloads(size):
+    rnd = random.Random(42)
+    words = ["".join(rnd.choices(string.ascii_lowercase, k=8)) for _ in range(1000)]
+    request = {
+        "data": {
+            "_arg1": [rnd.random() for _ in range(size)],
+            "_arg2": [rnd.randint(-1000, 1000) for _ in range(size)],
+            "_arg3": [words[i % len(words)] for i in range(size)],
+        },
+        "script": "return [x * y for x, y in zip(_arg1, _arg2)]",
+    }
+    result = [rnd.random() if i % 100 else float("nan") for i in range(size)]
+    return json.dumps(request).encode("utf-8"), result, np.array(result)
+
+
+def _best(fn, repeat):
+    return min(timeit.repeat(fn, number=1, repeat=repeat))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100000, 1000000])
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    codecs = [json_codec.StdlibCodec()]
+    if json_codec.orjson is not None:
+        codecs.append(json_codec.OrjsonCodec())
+    else:
+        print("orjson is not installed, only the stdlib codec is measured")
+
+    print(f"{'values':>10} {'codec':>8} {'loads':>10} {'dumps list':>12} {'dumps array':>12}")
+    for size in args.sizes:
+        body, result, array = _make_payloads(size)
+        for codec in codecs:
+            loads = _best(lambda: codec.loads(body), args.repeat)
+            dumps_list = _best(lambda: codec.dumps(result), args.repeat)
+            dumps_array = _best(lambda: codec.dumps(array), args.repeat)
+            print(
+                f"{size:>10} {codec.name:>8} {loads * 1000:>8.1f}ms "
+                f"{dumps_list * 1000:>10.1f}ms {dumps_array * 1000:>10.1f}ms"
+            )
+
+
+if __name__ == "__main__":
+    main()
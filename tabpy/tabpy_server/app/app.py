@@ -1,4 +1,3 @@
-import concurrent.futures
 import configparser
 import logging
 import multiprocessing
@@ -9,6 +8,7 @@ import ssl
 import sys
 import _thread
 
+import pyarrow
 import tornado
 from tornado.http1connection import HTTP1Connection
 
@@ -16,7 +16,14 @@ import tabpy
 import tabpy.tabpy_server.app.arrow_server as pa
 from tabpy.tabpy import __version__
 from tabpy.tabpy_server.app.app_parameters import ConfigParameters, SettingsParameters
+from tabpy.tabpy_server.app.process_pool import ProcessPool
+from tabpy.tabpy_server.app.stream_evaluator import StreamEvaluator
+from tabpy.tabpy_server.app.thread_pool import ThreadPool
 from tabpy.tabpy_server.app.util import parse_pwd_file
+from tabpy.tabpy_server.common.admission_control import AdmissionControl
+from tabpy.tabpy_server.common.result_cache import ResultCache
+from tabpy.tabpy_server.common.script_cache import ScriptCache, init_process_script_cache
+from tabpy.tabpy_server.common.single_flight import SingleFlight
 from tabpy.tabpy_server.handlers.basic_auth_server_middleware_factory import BasicAuthServerMiddlewareFactory
 from tabpy.tabpy_server.handlers.no_op_auth_handler import NoOpAuthHandler
 from tabpy.tabpy_server.management.state import TabPyState
@@ -28,6 +35,8 @@ from tabpy.tabpy_server.handlers import (
     EndpointsHandler,
     EvaluationPlaneHandler,
     EvaluationPlaneDisabledHandler,
+    MetricsHandler,
+    QueryBatchHandler,
     QueryPlaneHandler,
     ServiceInfoHandler,
     StatusHandler,
@@ -67,6 +76,14 @@ class TabPyApp:
     credentials = {}
     arrow_server = None
     max_request_size = None
+    script_cache = None
+    result_cache = None
+    evaluate_single_flight = None
+    query_single_flight = None
+    evaluate_executor = None
+    admission_control = None
+    query_executor = None
+    query_admission = None
 
     def __init__(self, config_file, disable_auth_warning=True):
         self.disable_auth_warning = disable_auth_warning
@@ -129,13 +146,29 @@ class TabPyApp:
         if "authentication" in config[SettingsParameters.ApiVersions]["v1"]["features"]:
             _, creds = parse_pwd_file(config[ConfigParameters.TABPY_PWD_FILE])
             auth_middleware = {
-                "basic": BasicAuthServerMiddlewareFactory(creds)
+                "basic": BasicAuthServerMiddlewareFactory(
+                    creds, token_ttl=config[SettingsParameters.ArrowFlightTokenTTL])
             }
 
         server = pa.FlightServer(host, location,
                             tls_certificates=tls_certificates,
                             verify_client=verify_client, auth_handler=NoOpAuthHandler(),
-                            middleware=auth_middleware)
+                            middleware=auth_middleware,
+                            max_flight_bytes=int(
+                                config[SettingsParameters.ArrowFlightMaxSizeInMb] * 1024 * 1024),
+                            flight_ttl=config[SettingsParameters.ArrowFlightTTL],
+                            spill_dir=config.get(SettingsParameters.ArrowFlightSpillDir),
+                            spill_threshold=int(
+                                config[SettingsParameters.ArrowFlightSpillThresholdInMb]
+                                * 1024 * 1024),
+                            max_spill_bytes=int(
+                                config[SettingsParameters.ArrowFlightSpillMaxSizeInMb]
+                                * 1024 * 1024),
+                            stream_evaluator=StreamEvaluator(self),
+                            compression=config[SettingsParameters.ArrowFlightCompression],
+                            compression_threshold=int(
+                                config[SettingsParameters.ArrowFlightCompressionThresholdInKb]
+                                * 1024))
         return server
 
     def run(self):
@@ -200,14 +233,37 @@ class TabPyApp:
         )
         logger.info("Done initializing TabPy.")
 
-        executor = concurrent.futures.ThreadPoolExecutor(
-            max_workers=multiprocessing.cpu_count()
+        self.script_cache = ScriptCache(
+            self.settings[SettingsParameters.EvaluateScriptCacheSize]
         )
+        result_cache_size_mb = self.settings[SettingsParameters.EvaluateResultCacheSizeInMb]
+        if result_cache_size_mb > 0:
+            self.result_cache = ResultCache(
+                max_bytes=int(result_cache_size_mb * 1024 * 1024),
+                ttl=self.settings[SettingsParameters.EvaluateResultCacheTTL],
+            )
+        if self.settings[SettingsParameters.CoalesceRequests]:
+            self.evaluate_single_flight = SingleFlight()
+            self.query_single_flight = SingleFlight()
+        executor = self._create_evaluate_executor()
+        self.admission_control = AdmissionControl(
+            max_in_flight=self.settings[SettingsParameters.EvaluateMaxInFlight],
+            max_queue_depth=self.settings[SettingsParameters.EvaluateMaxQueueDepth],
+        )
+        self.query_executor = ThreadPool(
+            max_workers=self.settings[SettingsParameters.QueryWorkers]
+        )
+        self.query_admission = {}
 
         # initialize Tornado application
         _init_asyncio_patch()
         application = TabPyTornadoApp(
             [
+                (
+                    self.subdirectory + r"/query/([^/]+)/batch",
+                    QueryBatchHandler,
+                    dict(app=self),
+                ),
                 (
                     self.subdirectory + r"/query/([^/]+)",
                     QueryPlaneHandler,
@@ -215,6 +271,7 @@ class TabPyApp:
                 ),
                 (self.subdirectory + r"/status", StatusHandler, dict(app=self)),
                 (self.subdirectory + r"/info", ServiceInfoHandler, dict(app=self)),
+                (self.subdirectory + r"/metrics", MetricsHandler, dict(app=self)),
                 (self.subdirectory + r"/endpoints", EndpointsHandler, dict(app=self)),
                 (
                     self.subdirectory + r"/endpoints/([^/]+)?",
@@ -253,6 +310,86 @@ class TabPyApp:
 
         return application
 
+    def _create_evaluate_executor(self):
+        """
+        Creates executor for ad-hoc scripts provided to the /evaluate
+        method, as configured with TABPY_EVALUATE_EXECUTOR.
+        """
+        max_workers = self.settings[SettingsParameters.EvaluateWorkers]
+        if self.settings[SettingsParameters.EvaluateExecutor] == "process":
+            logger.info(f"Using process pool with {max_workers} workers for /evaluate")
+            executor = ProcessPool(
+                max_workers=max_workers,
+                initializer=init_process_script_cache,
+                initargs=(self.settings[SettingsParameters.EvaluateScriptCacheSize],),
+            )
+        else:
+            logger.info(f"Using thread pool with {max_workers} workers for /evaluate")
+            executor = ThreadPool(max_workers=max_workers)
+
+        self.evaluate_executor = executor
+        return executor
+
+    def get_query_admission_control(self, endpoint_name):
+        """
+        Returns admission control limiting the number of queries of the
+        endpoint running at the same time, or None if they are not limited.
+        """
+        max_in_flight = self.settings[SettingsParameters.QueryMaxInFlightPerEndpoint]
+        if max_in_flight <= 0:
+            return None
+        admission_control = self.query_admission.get(endpoint_name)
+        if admission_control is None:
+            admission_control = AdmissionControl(
+                max_in_flight=max_in_flight, max_queue_depth=0
+            )
+            self.query_admission[endpoint_name] = admission_control
+        return admission_control
+
+    def get_metrics(self):
+        """
+        Collects runtime statistics of TabPy components.
+
+        Returns
+        -------
+        dict
+            Statistics grouped by component name.
+        """
+        metrics = {}
+        if self.script_cache is not None:
+            metrics["evaluate_script_cache"] = self.script_cache.get_stats()
+        if self.result_cache is not None:
+            metrics["evaluate_result_cache"] = self.result_cache.get_stats()
+        if self.evaluate_single_flight is not None:
+            metrics["evaluate_single_flight"] = self.evaluate_single_flight.get_stats()
+        if self.query_single_flight is not None:
+            metrics["query_single_flight"] = self.query_single_flight.get_stats()
+        if self.evaluate_executor is not None:
+            metrics["evaluate_executor"] = self.evaluate_executor.get_stats()
+        if self.admission_control is not None:
+            metrics["evaluate_admission"] = self.admission_control.get_stats()
+        if self.query_executor is not None:
+            metrics["query_executor"] = self.query_executor.get_stats()
+        if self.query_admission:
+            metrics["query_admission"] = {
+                name: admission_control.get_stats()
+                for name, admission_control in self.query_admission.items()
+            }
+        if self.python_service is not None:
+            if self.python_service.ps.result_cache is not None:
+                metrics["query_result_cache"] = (
+                    self.python_service.ps.result_cache.get_stats()
+                )
+            query_batching = self.python_service.ps.get_batching_stats()
+            if query_batching:
+                metrics["query_batching"] = query_batching
+        if self.arrow_server is not None:
+            metrics["arrow_flights"] = self.arrow_server.flights.get_stats()
+            if self.arrow_server.stream_evaluator is not None:
+                metrics["arrow_streams"] = self.arrow_server.stream_evaluator.get_stats()
+
+        return metrics
+
     def _set_parameter(self, parser, settings_key, config_key, default_val, parse_function):
         key_is_set = False
 
@@ -337,6 +474,30 @@ class TabPyApp:
              True, parser.getboolean),
             (SettingsParameters.EvaluateTimeout, ConfigParameters.TABPY_EVALUATE_TIMEOUT,
              30, parser.getfloat),
+            (SettingsParameters.EvaluateScriptCacheSize,
+             ConfigParameters.TABPY_EVALUATE_SCRIPT_CACHE_SIZE, 128, parser.getint),
+            (SettingsParameters.EvaluateExecutor, ConfigParameters.TABPY_EVALUATE_EXECUTOR,
+             "thread", None),
+            (SettingsParameters.EvaluateWorkers, ConfigParameters.TABPY_EVALUATE_WORKERS,
+             multiprocessing.cpu_count(), parser.getint),
+            (SettingsParameters.EvaluateMaxInFlight,
+             ConfigParameters.TABPY_EVALUATE_MAX_IN_FLIGHT, None, parser.getint),
+            (SettingsParameters.EvaluateMaxQueueDepth,
+             ConfigParameters.TABPY_EVALUATE_MAX_QUEUE_DEPTH, 0, parser.getint),
+            (SettingsParameters.EvaluateArgumentFormat,
+             ConfigParameters.TABPY_EVALUATE_ARGUMENT_FORMAT, "list", None),
+            (SettingsParameters.EvaluateResultCacheSizeInMb,
+             ConfigParameters.TABPY_EVALUATE_RESULT_CACHE_SIZE_MB, 0, parser.getfloat),
+            (SettingsParameters.EvaluateResultCacheTTL,
+             ConfigParameters.TABPY_EVALUATE_RESULT_CACHE_TTL, 300, parser.getfloat),
+            (SettingsParameters.QueryWorkers, ConfigParameters.TABPY_QUERY_WORKERS,
+             multiprocessing.cpu_count(), parser.getint),
+            (SettingsParameters.QueryMaxInFlightPerEndpoint,
+             ConfigParameters.TABPY_QUERY_MAX_IN_FLIGHT_PER_ENDPOINT, 0, parser.getint),
+            (SettingsParameters.QueryBatchParallelism,
+             ConfigParameters.TABPY_QUERY_BATCH_PARALLELISM, 4, parser.getint),
+            (SettingsParameters.QueryResultCacheSizeInMb,
+             ConfigParameters.TABPY_QUERY_RESULT_CACHE_SIZE_MB, 64, parser.getfloat),
             (SettingsParameters.UploadDir, ConfigParameters.TABPY_QUERY_OBJECT_PATH,
              os.path.join(pkg_path, "tmp", "query_objects"), None),
             (SettingsParameters.TransferProtocol, ConfigParameters.TABPY_TRANSFER_PROTOCOL,
@@ -355,10 +516,28 @@ class TabPyApp:
              "false", None),
             (SettingsParameters.MaxRequestSizeInMb, ConfigParameters.TABPY_MAX_REQUEST_SIZE_MB,
              100, None),
+            (SettingsParameters.CoalesceRequests, ConfigParameters.TABPY_COALESCE_REQUESTS,
+             False, parser.getboolean),
             (SettingsParameters.GzipEnabled, ConfigParameters.TABPY_GZIP_ENABLE,
              True, parser.getboolean),
             (SettingsParameters.ArrowEnabled, ConfigParameters.TABPY_ARROW_ENABLE, False, parser.getboolean), 
             (SettingsParameters.ArrowFlightPort, ConfigParameters.TABPY_ARROWFLIGHT_PORT, 13622, parser.getint),
+            (SettingsParameters.ArrowFlightTTL, ConfigParameters.TABPY_ARROWFLIGHT_TTL,
+             600, parser.getfloat),
+            (SettingsParameters.ArrowFlightMaxSizeInMb,
+             ConfigParameters.TABPY_ARROWFLIGHT_MAX_SIZE_MB, 0, parser.getfloat),
+            (SettingsParameters.ArrowFlightSpillDir,
+             ConfigParameters.TABPY_ARROWFLIGHT_SPILL_DIR, None, None),
+            (SettingsParameters.ArrowFlightSpillThresholdInMb,
+             ConfigParameters.TABPY_ARROWFLIGHT_SPILL_THRESHOLD_MB, 64, parser.getfloat),
+            (SettingsParameters.ArrowFlightSpillMaxSizeInMb,
+             ConfigParameters.TABPY_ARROWFLIGHT_SPILL_MAX_SIZE_MB, 0, parser.getfloat),
+            (SettingsParameters.ArrowFlightCompression,
+             ConfigParameters.TABPY_ARROWFLIGHT_COMPRESSION, "none", None),
+            (SettingsParameters.ArrowFlightCompressionThresholdInKb,
+             ConfigParameters.TABPY_ARROWFLIGHT_COMPRESSION_THRESHOLD_KB, 64, parser.getfloat),
+            (SettingsParameters.ArrowFlightTokenTTL,
+             ConfigParameters.TABPY_ARROWFLIGHT_TOKEN_TTL, 600, parser.getfloat),
         ]
 
         for setting, parameter, default_val, parse_function in settings_parameters:
@@ -373,6 +552,20 @@ class TabPyApp:
         ].lower()
 
         self._validate_transfer_protocol_settings()
+
+        self._validate_evaluate_executor_settings()
+
+        self._validate_arrow_compression_settings()
+
+        for setting, config in (
+            (SettingsParameters.QueryWorkers, ConfigParameters.TABPY_QUERY_WORKERS),
+            (SettingsParameters.QueryBatchParallelism,
+             ConfigParameters.TABPY_QUERY_BATCH_PARALLELISM),
+        ):
+            if self.settings[setting] <= 0:
+                msg = f"{config} must be greater than 0"
+                logger.critical(msg)
+                raise RuntimeError(msg)
         
         # Set max request size in bytes
         self.max_request_size = (
@@ -389,7 +582,16 @@ class TabPyApp:
         )
         state_config, self.tabpy_state = self._build_tabpy_state()
 
-        self.python_service = PythonServiceHandler(PythonService())
+        query_result_cache = None
+        query_result_cache_size_mb = self.settings[
+            SettingsParameters.QueryResultCacheSizeInMb]
+        if query_result_cache_size_mb > 0:
+            query_result_cache = ResultCache(
+                max_bytes=int(query_result_cache_size_mb * 1024 * 1024), ttl=0
+            )
+        self.python_service = PythonServiceHandler(
+            PythonService(result_cache=query_result_cache)
+        )
         self.settings["compress_response"] = True
         self.settings[SettingsParameters.StaticPath] = os.path.abspath(
             self.settings[SettingsParameters.StaticPath]
@@ -458,6 +660,51 @@ class TabPyApp:
         )
         tabpy.tabpy_server.app.util.validate_cert(cert)
 
+    def _validate_evaluate_executor_settings(self):
+        executor = self.settings[SettingsParameters.EvaluateExecutor].lower()
+        if executor not in ("thread", "process"):
+            msg = f"Unsupported evaluate executor: {executor}"
+            logger.critical(msg)
+            raise RuntimeError(msg)
+        self.settings[SettingsParameters.EvaluateExecutor] = executor
+
+        if self.settings[SettingsParameters.EvaluateWorkers] <= 0:
+            msg = (
+                f"{ConfigParameters.TABPY_EVALUATE_WORKERS} must be greater than 0"
+            )
+            logger.critical(msg)
+            raise RuntimeError(msg)
+
+        if self.settings.get(SettingsParameters.EvaluateMaxInFlight) is None:
+            self.settings[SettingsParameters.EvaluateMaxInFlight] = self.settings[
+                SettingsParameters.EvaluateWorkers
+            ]
+        if self.settings[SettingsParameters.EvaluateMaxInFlight] <= 0:
+            msg = (
+                f"{ConfigParameters.TABPY_EVALUATE_MAX_IN_FLIGHT} must be greater than 0"
+            )
+            logger.critical(msg)
+            raise RuntimeError(msg)
+
+        argument_format = self.settings[SettingsParameters.EvaluateArgumentFormat].lower()
+        if argument_format not in ("list", "numpy", "pandas", "arrow"):
+            msg = f"Unsupported evaluate argument format: {argument_format}"
+            logger.critical(msg)
+            raise RuntimeError(msg)
+        self.settings[SettingsParameters.EvaluateArgumentFormat] = argument_format
+
+    def _validate_arrow_compression_settings(self):
+        compression = self.settings[SettingsParameters.ArrowFlightCompression].lower()
+        if compression not in pa.COMPRESSION_CODECS:
+            msg = f"Unsupported Arrow Flight compression: {compression}"
+            logger.critical(msg)
+            raise RuntimeError(msg)
+        if compression != "none" and not pyarrow.Codec.is_available(compression):
+            msg = f"Arrow Flight compression {compression} is not available"
+            logger.critical(msg)
+            raise RuntimeError(msg)
+        self.settings[SettingsParameters.ArrowFlightCompression] = compression
+
     @staticmethod
     def _validate_cert_key_state(msg, cert_valid, key_valid):
         cert_and_key_param = (
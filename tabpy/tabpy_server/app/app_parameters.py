@@ -16,11 +16,32 @@ class ConfigParameters:
     TABPY_MAX_REQUEST_SIZE_MB = "TABPY_MAX_REQUEST_SIZE_MB"
     TABPY_EVALUATE_ENABLE = "TABPY_EVALUATE_ENABLE"
     TABPY_EVALUATE_TIMEOUT = "TABPY_EVALUATE_TIMEOUT"
+    TABPY_EVALUATE_SCRIPT_CACHE_SIZE = "TABPY_EVALUATE_SCRIPT_CACHE_SIZE"
+    TABPY_EVALUATE_EXECUTOR = "TABPY_EVALUATE_EXECUTOR"
+    TABPY_EVALUATE_WORKERS = "TABPY_EVALUATE_WORKERS"
+    TABPY_EVALUATE_MAX_IN_FLIGHT = "TABPY_EVALUATE_MAX_IN_FLIGHT"
+    TABPY_EVALUATE_MAX_QUEUE_DEPTH = "TABPY_EVALUATE_MAX_QUEUE_DEPTH"
+    TABPY_EVALUATE_ARGUMENT_FORMAT = "TABPY_EVALUATE_ARGUMENT_FORMAT"
+    TABPY_EVALUATE_RESULT_CACHE_SIZE_MB = "TABPY_EVALUATE_RESULT_CACHE_SIZE_MB"
+    TABPY_EVALUATE_RESULT_CACHE_TTL = "TABPY_EVALUATE_RESULT_CACHE_TTL"
+    TABPY_QUERY_WORKERS = "TABPY_QUERY_WORKERS"
+    TABPY_QUERY_MAX_IN_FLIGHT_PER_ENDPOINT = "TABPY_QUERY_MAX_IN_FLIGHT_PER_ENDPOINT"
+    TABPY_QUERY_BATCH_PARALLELISM = "TABPY_QUERY_BATCH_PARALLELISM"
+    TABPY_QUERY_RESULT_CACHE_SIZE_MB = "TABPY_QUERY_RESULT_CACHE_SIZE_MB"
+    TABPY_COALESCE_REQUESTS = "TABPY_COALESCE_REQUESTS"
     TABPY_GZIP_ENABLE = "TABPY_GZIP_ENABLE"
 
     # Arrow specific settings
     TABPY_ARROW_ENABLE = "TABPY_ARROW_ENABLE"
     TABPY_ARROWFLIGHT_PORT = "TABPY_ARROWFLIGHT_PORT"
+    TABPY_ARROWFLIGHT_TTL = "TABPY_ARROWFLIGHT_TTL"
+    TABPY_ARROWFLIGHT_MAX_SIZE_MB = "TABPY_ARROWFLIGHT_MAX_SIZE_MB"
+    TABPY_ARROWFLIGHT_SPILL_DIR = "TABPY_ARROWFLIGHT_SPILL_DIR"
+    TABPY_ARROWFLIGHT_SPILL_THRESHOLD_MB = "TABPY_ARROWFLIGHT_SPILL_THRESHOLD_MB"
+    TABPY_ARROWFLIGHT_SPILL_MAX_SIZE_MB = "TABPY_ARROWFLIGHT_SPILL_MAX_SIZE_MB"
+    TABPY_ARROWFLIGHT_COMPRESSION = "TABPY_ARROWFLIGHT_COMPRESSION"
+    TABPY_ARROWFLIGHT_TOKEN_TTL = "TABPY_ARROWFLIGHT_TOKEN_TTL"
+    TABPY_ARROWFLIGHT_COMPRESSION_THRESHOLD_KB = "TABPY_ARROWFLIGHT_COMPRESSION_THRESHOLD_KB"
 
 
 class SettingsParameters:
@@ -42,8 +63,29 @@ class SettingsParameters:
     MaxRequestSizeInMb = "max_request_size_in_mb"
     EvaluateTimeout = "evaluate_timeout"
     EvaluateEnabled = "evaluate_enabled"
+    EvaluateScriptCacheSize = "evaluate_script_cache_size"
+    EvaluateExecutor = "evaluate_executor"
+    EvaluateWorkers = "evaluate_workers"
+    EvaluateMaxInFlight = "evaluate_max_in_flight"
+    EvaluateMaxQueueDepth = "evaluate_max_queue_depth"
+    EvaluateArgumentFormat = "evaluate_argument_format"
+    EvaluateResultCacheSizeInMb = "evaluate_result_cache_size_in_mb"
+    EvaluateResultCacheTTL = "evaluate_result_cache_ttl"
+    QueryWorkers = "query_workers"
+    QueryMaxInFlightPerEndpoint = "query_max_in_flight_per_endpoint"
+    QueryBatchParallelism = "query_batch_parallelism"
+    QueryResultCacheSizeInMb = "query_result_cache_size_in_mb"
+    CoalesceRequests = "coalesce_requests"
     GzipEnabled = "gzip_enabled"
 
     # Arrow specific settings
     ArrowEnabled = "arrow_enabled"
     ArrowFlightPort = "arrowflight_port"
+    ArrowFlightTTL = "arrowflight_ttl"
+    ArrowFlightMaxSizeInMb = "arrowflight_max_size_in_mb"
+    ArrowFlightSpillDir = "arrowflight_spill_dir"
+    ArrowFlightSpillThresholdInMb = "arrowflight_spill_threshold_in_mb"
+    ArrowFlightSpillMaxSizeInMb = "arrowflight_spill_max_size_in_mb"
+    ArrowFlightCompression = "arrowflight_compression"
+    ArrowFlightTokenTTL = "arrowflight_token_ttl"
+    ArrowFlightCompressionThresholdInKb = "arrowflight_compression_threshold_in_kb"
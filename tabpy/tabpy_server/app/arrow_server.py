@@ -24,18 +24,62 @@ import uuid
 
 import pyarrow
 import pyarrow.flight
+import pyarrow.ipc
+
+from tabpy.tabpy_server.app.flight_store import FlightStore
+from tabpy.tabpy_server.common import json_codec
 
 
 logger = logging.getLogger('__main__.' + __name__)
 
+# Request header selecting compression of the response stream ("none",
+# "lz4_frame" or "zstd"), overrides the server default
+COMPRESSION_HEADER = "x-tabpy-compression"
+
+COMPRESSION_CODECS = ("none", "lz4_frame", "zstd")
+
+
+class CompressionMiddleware(pyarrow.flight.ServerMiddleware):
+    def __init__(self, compression):
+        self.compression = compression
+
+
+class CompressionMiddlewareFactory(pyarrow.flight.ServerMiddlewareFactory):
+    """
+    Makes compression requested with the COMPRESSION_HEADER available to
+    the server methods through context.get_middleware("compression").
+    """
+
+    def start_call(self, info, headers):
+        for header in headers:
+            if header.lower() == COMPRESSION_HEADER:
+                compression = headers[header][0].lower()
+                if compression not in COMPRESSION_CODECS:
+                    raise pyarrow.flight.FlightServerError(
+                        f"Unsupported compression: {compression}.")
+                return CompressionMiddleware(compression)
+        return None
+
+
 class FlightServer(pyarrow.flight.FlightServerBase):
     def __init__(self, host="localhost", location=None,
                  tls_certificates=None, verify_client=False,
-                 root_certificates=None, auth_handler=None, middleware=None):
+                 root_certificates=None, auth_handler=None, middleware=None,
+                 max_flight_bytes=0, flight_ttl=0, spill_dir=None,
+                 spill_threshold=0, max_spill_bytes=0, stream_evaluator=None,
+                 compression=None, compression_threshold=0):
+        middleware = dict(middleware or {})
+        middleware["compression"] = CompressionMiddlewareFactory()
         super(FlightServer, self).__init__(
             location, auth_handler, tls_certificates, verify_client,
             root_certificates, middleware)
-        self.flights = {}
+        self.flights = FlightStore(max_bytes=max_flight_bytes, ttl=flight_ttl,
+                                   spill_dir=spill_dir,
+                                   spill_threshold=spill_threshold,
+                                   max_spill_bytes=max_spill_bytes)
+        self.stream_evaluator = stream_evaluator
+        self.compression = compression
+        self.compression_threshold = compression_threshold
         self.host = host
         self.tls_certificates = tls_certificates
         self.location = location
@@ -45,7 +89,7 @@ class FlightServer(pyarrow.flight.FlightServerBase):
         return (descriptor.descriptor_type.value, descriptor.command,
                 tuple(descriptor.path or tuple()))
 
-    def _make_flight_info(self, key, descriptor, table):
+    def _make_flight_info(self, key, descriptor, table, data_size):
         if self.tls_certificates:
             location = pyarrow.flight.Location.for_grpc_tls(
                 self.host, self.port)
@@ -54,49 +98,119 @@ class FlightServer(pyarrow.flight.FlightServerBase):
                 self.host, self.port)
         endpoints = [pyarrow.flight.FlightEndpoint(repr(key), [location]), ]
 
-        mock_sink = pyarrow.MockOutputStream()
-        stream_writer = pyarrow.RecordBatchStreamWriter(
-            mock_sink, table.schema)
-        stream_writer.write_table(table)
-        stream_writer.close()
-        data_size = mock_sink.size()
-
         return pyarrow.flight.FlightInfo(table.schema,
                                          descriptor, endpoints,
                                          table.num_rows, data_size)
 
     def list_flights(self, context, criteria):
-        for key, table in self.flights.items():
+        for key, table, data_size in self.flights.items_with_size():
             if key[1] is not None:
                 descriptor = \
                     pyarrow.flight.FlightDescriptor.for_command(key[1])
             else:
                 descriptor = pyarrow.flight.FlightDescriptor.for_path(*key[2])
 
-            yield self._make_flight_info(key, descriptor, table)
+            yield self._make_flight_info(key, descriptor, table, data_size)
 
     def get_flight_info(self, context, descriptor):
         key = FlightServer.descriptor_to_key(descriptor)
         logger.info(f"get_flight_info: key={key}")
-        if key in self.flights:
-            table = self.flights[key]
-            return self._make_flight_info(key, descriptor, table)
-        raise KeyError('Flight not found.')
+        try:
+            table, data_size = self.flights.get_with_size(key)
+        except KeyError:
+            raise KeyError('Flight not found.')
+        return self._make_flight_info(key, descriptor, table, data_size)
 
     def do_put(self, context, descriptor, reader, writer):
         key = FlightServer.descriptor_to_key(descriptor)
         logger.info(f"do_put: key={key}")
-        self.flights[key] = reader.read_all()
+        if descriptor.descriptor_type == pyarrow.flight.DescriptorType.CMD:
+            self._evaluate_stream(context, descriptor, reader, writer)
+            return
+        self.flights.put_reader(key, reader.to_reader())
+
+    def _evaluate_stream(self, context, descriptor, reader, writer):
+        """
+        Runs the script from the command descriptor on every uploaded
+        batch. The first batch is read and evaluated to get the output
+        schema, then the path of the output flight is sent back in the put
+        metadata as {"outputDataPath": ...} and the rest of the upload is
+        read and evaluated.
+        """
+        if self.stream_evaluator is None:
+            raise pyarrow.flight.FlightUnavailableError(
+                "Streaming evaluation is disabled.")
+        output_data_id = str(uuid.uuid4())
+        output_batches = self.stream_evaluator.evaluate(
+            descriptor.command, reader.to_reader(), self._get_query_headers(context))
+        writer.write(pyarrow.py_buffer(
+            json_codec.dumps({"outputDataPath": output_data_id})))
+        output_descriptor = pyarrow.flight.FlightDescriptor.for_path(output_data_id)
+        self.flights.put_reader(
+            FlightServer.descriptor_to_key(output_descriptor), output_batches)
+        logger.info(f"do_put: streamed output to {output_data_id}")
+
+    def do_exchange(self, context, descriptor, reader, writer):
+        """
+        Single round-trip evaluation: the command descriptor carries the
+        streaming request (see _evaluate_stream), the client streams input
+        batches and output batches are streamed back on the same call,
+        without being stored in flights.
+        """
+        logger.info("do_exchange")
+        if descriptor.descriptor_type != pyarrow.flight.DescriptorType.CMD:
+            raise pyarrow.flight.FlightServerError(
+                "do_exchange requires a command descriptor.")
+        if self.stream_evaluator is None:
+            raise pyarrow.flight.FlightUnavailableError(
+                "Streaming evaluation is disabled.")
+        output_batches = self.stream_evaluator.evaluate(
+            descriptor.command, reader.to_reader(), self._get_query_headers(context))
+        # The size of the output is not known up front, the threshold does
+        # not apply to streams
+        writer.begin(output_batches.schema,
+                     options=self._get_write_options(context))
+        for batch in output_batches:
+            writer.write_batch(batch)
 
     def do_get(self, context, ticket):
         logger.info(f"do_get: ticket={ticket}")
         key = ast.literal_eval(ticket.ticket.decode())
-        if key not in self.flights:
+        flight = self.flights.pop(key, None)
+        if flight is None:
             logger.warn(f"do_get: key={key} not found")
             return None
         logger.info(f"do_get: returning key={key}")
-        flight = self.flights.pop(key)
-        return pyarrow.flight.RecordBatchStream(flight)
+        return pyarrow.flight.RecordBatchStream(
+            flight, options=self._get_write_options(context, flight.nbytes))
+
+    @staticmethod
+    def _get_query_headers(context):
+        """
+        Returns headers for /query calls made by scripts streamed on the
+        call, with the Basic credentials of the caller when it sent them.
+        """
+        auth = context.get_middleware("basic") if context is not None else None
+        if auth is None or auth.credentials is None:
+            return {}
+        return {"Authorization": auth.credentials}
+
+    def _get_write_options(self, context, nbytes=None):
+        """
+        Returns IPC write options for a response stream, compressing the
+        buffers with the codec requested by the client or the server
+        default, unless the response is smaller than the threshold.
+        """
+        compression = self.compression
+        if context is not None:
+            requested = context.get_middleware("compression")
+            if requested is not None:
+                compression = requested.compression
+        if compression in (None, "none"):
+            return None
+        if nbytes is not None and nbytes < self.compression_threshold:
+            return None
+        return pyarrow.ipc.IpcWriteOptions(compression=compression)
 
     def list_actions(self, context):
         return iter([
@@ -126,13 +240,14 @@ class FlightServer(pyarrow.flight.FlightServerBase):
 
     def _clear(self):
         """Clear the stored flights."""
-        self.flights = {}
+        self.flights.clear()
 
     def _shutdown(self):
         """Shut down after a delay."""
         logger.info("Server is shutting down...")
         time.sleep(2)
         self.shutdown()
+        self.flights.close()
 
 def start(server):
     logger.info(f"Serving on {server.location}")
@@ -0,0 +1,494 @@
+"""
+Bounded storage for tables uploaded to (or produced for) the Arrow Flight
+server.
+
+Flights are normally removed when they are consumed with do_get, but
+uploads abandoned by cancelled queries would otherwise stay in memory
+forever. FlightStore expires flights after a time to live and evicts the
+least recently used flights when the total size of stored tables exceeds
+the budget.
+
+Optionally flights larger than a threshold are spilled to Arrow IPC files
+and memory-mapped, so they do not count towards resident memory. Spill
+files have their own budget.
+
+The store is used from gRPC threads of the Flight server and from the
+IOLoop thread at the same time. Flights are spread over shards with
+a lock each, so operations on unrelated flights rarely wait for each
+other.
+"""
+
+from collections import OrderedDict
+import itertools
+import logging
+import os
+import shutil
+import tempfile
+import threading
+import time
+import uuid
+
+import pyarrow
+import pyarrow.ipc
+
+
+logger = logging.getLogger(__name__)
+
+# Maximum time in seconds between sweeps of all shards for expired flights
+_PURGE_INTERVAL = 1.0
+
+
+class FlightTooLargeError(Exception):
+    """
+    Raised when a single table is larger than the store budget.
+    """
+
+
+class _FlightEntry:
+    __slots__ = ("table", "nbytes", "expires", "spill_path", "spill_bytes", "last_used")
+
+    def __init__(self, table, nbytes, expires, spill_path=None, spill_bytes=0):
+        self.table = table
+        # resident size, 0 for spilled flights
+        self.nbytes = nbytes
+        self.expires = expires
+        self.spill_path = spill_path
+        self.spill_bytes = spill_bytes
+        # tick of the store clock when the flight was last used
+        self.last_used = 0
+
+    @property
+    def data_size(self):
+        # Computed when the flight is stored, so metadata requests never
+        # have to serialize the table
+        return self.spill_bytes if self.spill_path is not None else self.nbytes
+
+
+class _FlightShard:
+    """
+    Part of the store guarded by its own lock. Entries are kept in least
+    recently used order.
+    """
+
+    def __init__(self, ttl):
+        self.ttl = ttl
+        self.lock = threading.Lock()
+        self.entries = OrderedDict()
+        self.size_bytes = 0
+        self.spilled_bytes = 0
+        self.spills = 0
+        self.evictions = 0
+        self.expirations = 0
+        # spill files which could not be deleted yet
+        self.undeleted = []
+
+    def add(self, key, entry):
+        if key in self.entries:
+            self.remove(key)
+        self.entries[key] = entry
+        self.size_bytes += entry.nbytes
+        if entry.spill_path is not None:
+            self.spilled_bytes += entry.spill_bytes
+            self.spills += 1
+
+    def get(self, key):
+        entry = self.entries.get(key)
+        if entry is not None and _expired(entry, time.monotonic()):
+            self.expire(key)
+            return None
+        return entry
+
+    def remove(self, key):
+        entry = self.entries.pop(key)
+        self.size_bytes -= entry.nbytes
+        if entry.spill_path is not None:
+            self.spilled_bytes -= entry.spill_bytes
+            if not _delete_spill_file(entry.spill_path):
+                logger.info(f"Deferring deletion of spill file {entry.spill_path}")
+                self.undeleted.append(entry.spill_path)
+        return entry
+
+    def delete_undeleted(self):
+        self.undeleted = [p for p in self.undeleted if not _delete_spill_file(p)]
+
+    def expire(self, key):
+        self.remove(key)
+        self.expirations += 1
+        logger.info(f"Flight {key} expired")
+
+    def purge_expired(self):
+        if self.undeleted:
+            self.delete_undeleted()
+        if self.ttl <= 0:
+            return
+        now = time.monotonic()
+        expired = [k for k, e in self.entries.items() if _expired(e, now)]
+        for key in expired:
+            self.expire(key)
+
+
+def _expired(entry, now):
+    return entry.expires is not None and entry.expires <= now
+
+
+def _oldest(shard, spilled):
+    """
+    Returns the least recently used (key, entry) of the shard which is
+    spilled (or resident), or None.
+    """
+    for key, entry in shard.entries.items():
+        if (entry.spill_path is not None) == spilled:
+            return key, entry
+    return None
+
+
+def _delete_spill_file(path):
+    """
+    Returns False if the file could not be deleted yet.
+
+    On POSIX systems tables mapped from the file stay readable after it is
+    deleted. Windows does not delete files which are still mapped, e.g. by
+    a table being sent to a client, so deletion is retried later.
+    """
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+    except OSError:
+        return False
+    return True
+
+
+class FlightStore:
+    """
+    Thread-safe mapping of flight keys to pyarrow Tables with TTL expiry and
+    LRU eviction by total Table.nbytes.
+
+    Supports the subset of the dict interface used by the Flight server and
+    the /evaluate handler: `in`, `[]`, `pop()`, `items()`, `len()` and
+    `clear()`.
+    """
+
+    def __init__(self, max_bytes=0, ttl=0, spill_dir=None, spill_threshold=0,
+                 max_spill_bytes=0, shards=16):
+        """
+        Parameters
+        ----------
+        max_bytes : int
+            Maximum total size of tables kept in memory. 0 or less means
+            the size is not limited.
+
+        ttl : float
+            Time in seconds after which a flight expires. 0 or less means
+            flights never expire.
+
+        spill_dir : str, optional
+            Directory for spill files. If not set flights are always kept
+            in memory.
+
+        spill_threshold : int
+            Flights larger than this number of bytes are spilled to
+            spill_dir.
+
+        max_spill_bytes : int
+            Maximum total size of spill files. When it is exceeded the least
+            recently used spilled flights are evicted. 0 or less means the
+            size is not limited.
+
+        shards : int
+            Number of independently locked parts of the store.
+        """
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.spill_threshold = spill_threshold
+        self.max_spill_bytes = max_spill_bytes
+        self._shards = [_FlightShard(ttl) for _ in range(max(1, shards))]
+        # Ticks ordering uses of flights across shards, next() on
+        # itertools.count is atomic
+        self._clock = itertools.count(1)
+        # Only one thread evicts at a time, so concurrent puts do not
+        # evict more flights than needed
+        self._evict_lock = threading.Lock()
+        self._purge_lock = threading.Lock()
+        self._purge_interval = min(ttl, _PURGE_INTERVAL) if ttl > 0 else _PURGE_INTERVAL
+        self._next_purge = 0
+        self._spill_dir = None
+        if spill_dir is not None:
+            os.makedirs(spill_dir, exist_ok=True)
+            # Own subdirectory, so files of other processes are never touched
+            self._spill_dir = tempfile.mkdtemp(prefix="tabpy_flights_", dir=spill_dir)
+
+    def _get_shard(self, key):
+        return self._shards[hash(key) % len(self._shards)]
+
+    @property
+    def size_bytes(self):
+        return sum(shard.size_bytes for shard in self._shards)
+
+    @property
+    def spilled_bytes(self):
+        return sum(shard.spilled_bytes for shard in self._shards)
+
+    def _new_spill_path(self):
+        return os.path.join(self._spill_dir, f"{uuid.uuid4().hex}.arrow")
+
+    def put_reader(self, key, reader):
+        """
+        Stores all record batches from the reader (e.g. a Flight stream
+        reader). If the data grows over the spill threshold it is streamed
+        to a spill file instead of being collected in memory.
+        """
+        if self._spill_dir is None:
+            # The budget is checked while reading, so an upload larger than
+            # the store is rejected before it is all in memory
+            batches = []
+            size = 0
+            for batch in reader:
+                size += batch.nbytes
+                self._check_size(size)
+                batches.append(batch)
+            self[key] = pyarrow.Table.from_batches(batches, schema=reader.schema)
+            return
+
+        batches = []
+        size = 0
+        for batch in reader:
+            batches.append(batch)
+            size += batch.nbytes
+            if size > self.spill_threshold:
+                break
+        else:
+            self[key] = pyarrow.Table.from_batches(batches, schema=reader.schema)
+            return
+
+        path = self._new_spill_path()
+        try:
+            with pyarrow.ipc.new_file(path, reader.schema) as writer:
+                for batch in batches:
+                    writer.write_batch(batch)
+                batches = None
+                for batch in reader:
+                    writer.write_batch(batch)
+            self._put_spilled(key, path)
+        except BaseException:
+            _delete_spill_file(path)
+            raise
+
+    def __setitem__(self, key, table):
+        nbytes = table.nbytes
+        if self._spill_dir is not None and nbytes > self.spill_threshold:
+            path = self._new_spill_path()
+            try:
+                with pyarrow.ipc.new_file(path, table.schema) as writer:
+                    writer.write_table(table)
+                self._put_spilled(key, path)
+            except BaseException:
+                _delete_spill_file(path)
+                raise
+            return
+
+        self._check_size(nbytes)
+        self._put(key, _FlightEntry(table, nbytes, self._get_expiration()))
+
+    def _check_size(self, nbytes):
+        if self.max_bytes > 0 and nbytes > self.max_bytes:
+            raise FlightTooLargeError(
+                f"Flight of {nbytes} bytes exceeds the store budget "
+                f"of {self.max_bytes} bytes"
+            )
+
+    def _put_spilled(self, key, path):
+        spill_bytes = os.path.getsize(path)
+        if self.max_spill_bytes > 0 and spill_bytes > self.max_spill_bytes:
+            raise FlightTooLargeError(
+                f"Spilled flight of {spill_bytes} bytes exceeds the spill budget "
+                f"of {self.max_spill_bytes} bytes"
+            )
+        # Buffers of the table reference the memory map, which stays valid
+        # after the file is closed. The mapping itself is released when the
+        # last buffer is.
+        with pyarrow.memory_map(path) as source:
+            table = pyarrow.ipc.open_file(source).read_all()
+        logger.info(f"Flight {key} spilled to {path}")
+        self._put(
+            key, _FlightEntry(table, 0, self._get_expiration(), path, spill_bytes)
+        )
+
+    def _get_expiration(self):
+        return time.monotonic() + self.ttl if self.ttl > 0 else None
+
+    def _put(self, key, new_entry):
+        shard = self._get_shard(key)
+        with shard.lock:
+            shard.purge_expired()
+            new_entry.last_used = next(self._clock)
+            shard.add(key, new_entry)
+        self._purge_expired()
+        if new_entry.spill_path is not None:
+            if self.max_spill_bytes > 0:
+                self._evict(spilled=True)
+        elif self.max_bytes > 0 and new_entry.nbytes > 0:
+            self._evict(spilled=False)
+
+    def _purge_expired(self):
+        """
+        Expires flights of all shards, so flights abandoned in shards which
+        are not written to anymore do not outlive their TTL. Runs at most
+        once per purge interval and puts never wait for another sweep.
+        """
+        now = time.monotonic()
+        if now < self._next_purge or not self._purge_lock.acquire(blocking=False):
+            return
+        try:
+            self._next_purge = now + self._purge_interval
+            for shard in self._shards:
+                with shard.lock:
+                    shard.purge_expired()
+        finally:
+            self._purge_lock.release()
+
+    def _evict(self, spilled):
+        """
+        Evicts least recently used flights of all shards until the total
+        size of resident flights (or of spill files) fits the budget.
+        """
+        if spilled:
+            def over_budget():
+                return self.spilled_bytes > self.max_spill_bytes
+        else:
+            def over_budget():
+                return self.size_bytes > self.max_bytes
+
+        with self._evict_lock:
+            while over_budget():
+                oldest_shard = None
+                oldest_tick = None
+                for shard in self._shards:
+                    with shard.lock:
+                        entry = _oldest(shard, spilled)
+                        if entry is None:
+                            continue
+                        tick = entry[1].last_used
+                    if oldest_tick is None or tick < oldest_tick:
+                        oldest_shard, oldest_tick = shard, tick
+                if oldest_shard is None:
+                    return
+
+                with oldest_shard.lock:
+                    entry = _oldest(oldest_shard, spilled)
+                    if entry is None:
+                        continue
+                    evicted_key = entry[0]
+                    oldest_shard.remove(evicted_key)
+                    oldest_shard.evictions += 1
+                logger.warning(f"Evicted flight {evicted_key}")
+
+    def _touch(self, shard, key):
+        entry = shard.get(key)
+        if entry is None:
+            raise KeyError(key)
+        entry.last_used = next(self._clock)
+        shard.entries.move_to_end(key)
+        return entry
+
+    def __getitem__(self, key):
+        shard = self._get_shard(key)
+        with shard.lock:
+            return self._touch(shard, key).table
+
+    def get_with_size(self, key):
+        """
+        Returns (table, data_size) pair for the key, data_size is the size
+        of the table buffers (or of the spill file) in bytes.
+        """
+        shard = self._get_shard(key)
+        with shard.lock:
+            entry = self._touch(shard, key)
+            return entry.table, entry.data_size
+
+    def __contains__(self, key):
+        shard = self._get_shard(key)
+        with shard.lock:
+            return shard.get(key) is not None
+
+    def __len__(self):
+        count = 0
+        for shard in self._shards:
+            with shard.lock:
+                shard.purge_expired()
+                count += len(shard.entries)
+        return count
+
+    def pop(self, key, *default):
+        shard = self._get_shard(key)
+        with shard.lock:
+            entry = shard.get(key)
+            if entry is None:
+                if default:
+                    return default[0]
+                raise KeyError(key)
+            shard.remove(key)
+            return entry.table
+
+    def items(self):
+        """
+        Returns list of (key, table) pairs of stored flights.
+        """
+        return [(key, table) for key, table, _ in self.items_with_size()]
+
+    def items_with_size(self):
+        """
+        Returns list of (key, table, data_size) tuples of stored flights.
+        """
+        items = []
+        for shard in self._shards:
+            with shard.lock:
+                shard.purge_expired()
+                items.extend(
+                    (key, entry.table, entry.data_size)
+                    for key, entry in shard.entries.items()
+                )
+        return items
+
+    def clear(self):
+        for shard in self._shards:
+            with shard.lock:
+                for key in list(shard.entries):
+                    shard.remove(key)
+
+    def close(self):
+        """
+        Removes all flights and the spill directory.
+        """
+        self.clear()
+        for shard in self._shards:
+            with shard.lock:
+                shard.delete_undeleted()
+        if self._spill_dir is not None:
+            shutil.rmtree(self._spill_dir, ignore_errors=True)
+
+    def get_stats(self):
+        """
+        Returns dictionary with store statistics.
+        """
+        stats = {
+            "flights": 0,
+            "size_bytes": 0,
+            "max_bytes": self.max_bytes,
+            "spilled_bytes": 0,
+            "max_spill_bytes": self.max_spill_bytes,
+            "spills": 0,
+            "ttl": self.ttl,
+            "evictions": 0,
+            "expirations": 0,
+        }
+        for shard in self._shards:
+            with shard.lock:
+                shard.purge_expired()
+                stats["flights"] += len(shard.entries)
+                stats["size_bytes"] += shard.size_bytes
+                stats["spilled_bytes"] += shard.spilled_bytes
+                stats["spills"] += shard.spills
+                stats["evictions"] += shard.evictions
+                stats["expirations"] += shard.expirations
+        return stats
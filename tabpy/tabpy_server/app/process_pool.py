@@ -0,0 +1,298 @@
+"""
+Pool of long-lived worker processes for running /evaluate scripts.
+
+Scripts executed in a thread pool share one GIL, so CPU bound pure Python
+scripts can only keep a single core busy. ProcessPool implements
+concurrent.futures.Executor interface on top of worker processes and can
+be used in place of ThreadPoolExecutor.
+
+Calls and results are pickled with protocol 5 and large buffers (NumPy
+arrays, Arrow buffers, etc.) are sent out-of-band, avoiding extra copies
+of the data when shipping it between processes.
+"""
+
+import concurrent.futures
+from concurrent.futures.process import BrokenProcessPool
+import logging
+import multiprocessing
+import pickle
+import queue
+import signal
+import struct
+import threading
+
+
+logger = logging.getLogger(__name__)
+
+_PICKLE_PROTOCOL = 5
+
+
+def _send(conn, obj):
+    buffers = []
+    payload = pickle.dumps(obj, protocol=_PICKLE_PROTOCOL, buffer_callback=buffers.append)
+    raw_buffers = [b.raw() for b in buffers]
+    sizes = [b.nbytes for b in raw_buffers]
+    conn.send_bytes(struct.pack(f"!I{len(sizes)}Q", len(sizes), *sizes))
+    conn.send_bytes(payload)
+    for b in raw_buffers:
+        conn.send_bytes(b)
+
+
+def _recv(conn):
+    header = conn.recv_bytes()
+    (n,) = struct.unpack_from("!I", header)
+    sizes = struct.unpack_from(f"!{n}Q", header, 4)
+    payload = conn.recv_bytes()
+    buffers = []
+    for size in sizes:
+        # bytearray keeps received arrays writable
+        buf = bytearray(size)
+        conn.recv_bytes_into(buf)
+        buffers.append(buf)
+    return pickle.loads(payload, buffers=buffers)
+
+
+class _RemoteExceptionInfo:
+    """
+    Replacement for exceptions raised in a worker which cannot be pickled.
+    """
+
+    def __init__(self, e):
+        self.class_name = e.__class__.__name__
+        self.message = str(e)
+
+    def to_exception(self):
+        return type(self.class_name, (Exception,), {})(self.message)
+
+
+def _worker_main(conn, initializer, initargs):
+    # Ctrl+C is handled by the parent process
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+    if initializer is not None:
+        initializer(*initargs)
+
+    while True:
+        try:
+            task = _recv(conn)
+        except (EOFError, OSError):
+            break
+        except Exception as e:
+            # The call could not be unpickled in the worker
+            _send(conn, (False, _RemoteExceptionInfo(e)))
+            continue
+
+        if task is None:
+            break
+
+        fn, args, kwargs = task
+        try:
+            result = (True, fn(*args, **kwargs))
+        except BaseException as e:
+            result = (False, e)
+
+        try:
+            _send(conn, result)
+        except Exception as e:
+            # Either the result or the exception is not picklable
+            if result[0]:
+                result = (False, _RemoteExceptionInfo(e))
+            else:
+                result = (False, _RemoteExceptionInfo(result[1]))
+            _send(conn, result)
+
+
+class _Worker:
+    def __init__(self, ctx, initializer, initargs):
+        self.conn, child_conn = ctx.Pipe()
+        self.process = ctx.Process(
+            target=_worker_main,
+            args=(child_conn, initializer, initargs),
+            daemon=True,
+        )
+        self.process.start()
+        child_conn.close()
+        self.reclaimed = False
+
+    def stop(self):
+        try:
+            _send(self.conn, None)
+        except (OSError, ValueError):
+            pass
+        self.process.join(timeout=1)
+        if self.process.is_alive():
+            self.process.terminate()
+        self.conn.close()
+
+
+class ProcessPool(concurrent.futures.Executor):
+    """
+    Executor running submitted calls in a pool of long-lived processes.
+
+    Every worker process is served by a dedicated thread in the current
+    process, which takes calls from the shared queue, sends them to the
+    worker and waits for the result. Callables and arguments have to be
+    picklable.
+    """
+
+    def __init__(self, max_workers, initializer=None, initargs=()):
+        """
+        Parameters
+        ----------
+        max_workers : int
+            Number of worker processes.
+
+        initializer : callable, optional
+            Called in every worker process when it starts.
+
+        initargs : tuple, optional
+            Arguments for initializer.
+        """
+        if max_workers <= 0:
+            raise ValueError("max_workers must be greater than 0")
+
+        self.max_workers = max_workers
+        self._ctx = multiprocessing.get_context("spawn")
+        self._initializer = initializer
+        self._initargs = initargs
+        self._tasks = queue.SimpleQueue()
+        # future -> worker process running the call
+        self._running = {}
+        self._running_lock = threading.Lock()
+        self.reclaimed_workers = 0
+        self._shutdown = False
+        self._shutdown_lock = threading.Lock()
+        self._threads = []
+
+        logger.info(f"Starting {max_workers} worker processes...")
+        for i in range(max_workers):
+            t = threading.Thread(
+                target=self._serve_worker, name=f"ProcessPool-{i}", daemon=True
+            )
+            t.start()
+            self._threads.append(t)
+
+    def _start_worker(self):
+        return _Worker(self._ctx, self._initializer, self._initargs)
+
+    def _serve_worker(self):
+        worker = self._start_worker()
+        while True:
+            task = self._tasks.get()
+            if task is None:
+                break
+
+            future, fn, args, kwargs = task
+            if not future.set_running_or_notify_cancel():
+                continue
+
+            with self._running_lock:
+                self._running[future] = worker
+            try:
+                _send(worker.conn, (fn, args, kwargs))
+                ok, value = _recv(worker.conn)
+            except (EOFError, OSError) as e:
+                with self._running_lock:
+                    self._running.pop(future, None)
+                if worker.reclaimed:
+                    future.set_exception(
+                        TimeoutError("Worker process was terminated by reclaim()")
+                    )
+                else:
+                    logger.error(f"Worker process {worker.process.pid} died: {e}")
+                    future.set_exception(
+                        BrokenProcessPool("Worker process terminated abruptly")
+                    )
+                worker.stop()
+                worker = self._start_worker()
+                continue
+            except Exception as e:
+                # Failed to pickle the call, the worker is still usable
+                with self._running_lock:
+                    self._running.pop(future, None)
+                future.set_exception(e)
+                continue
+
+            with self._running_lock:
+                self._running.pop(future, None)
+            if worker.reclaimed:
+                # The result arrived just before the worker was killed
+                worker.stop()
+                worker = self._start_worker()
+
+            if ok:
+                future.set_result(value)
+            elif isinstance(value, _RemoteExceptionInfo):
+                future.set_exception(value.to_exception())
+            else:
+                future.set_exception(value)
+
+        worker.stop()
+
+    def reclaim(self, future):
+        """
+        Kills the worker process running the call for the future, a new
+        worker process is started in its place. Calls which have not
+        started yet are cancelled.
+
+        Returns
+        -------
+        bool
+            True if the call was cancelled or its worker was killed.
+        """
+        if future.cancel():
+            return True
+
+        with self._running_lock:
+            worker = self._running.get(future)
+            if worker is None or worker.reclaimed:
+                return False
+            # Killed while holding the lock, so the worker cannot pick
+            # up the next call in the meantime.
+            worker.reclaimed = True
+            worker.process.kill()
+            self.reclaimed_workers += 1
+
+        logger.warning(f"Killed worker process {worker.process.pid} running timed out call")
+        return True
+
+    def get_stats(self):
+        """
+        Returns dictionary with executor statistics.
+        """
+        return {
+            "type": "process",
+            "workers": self.max_workers,
+            "reclaimed_workers": self.reclaimed_workers,
+        }
+
+    def submit(self, fn, /, *args, **kwargs):
+        with self._shutdown_lock:
+            if self._shutdown:
+                raise RuntimeError("cannot schedule new futures after shutdown")
+
+            future = concurrent.futures.Future()
+            self._tasks.put((future, fn, args, kwargs))
+            return future
+
+    def shutdown(self, wait=True, *, cancel_futures=False):
+        with self._shutdown_lock:
+            if self._shutdown:
+                return
+            self._shutdown = True
+
+        if cancel_futures:
+            while True:
+                try:
+                    task = self._tasks.get_nowait()
+                except queue.Empty:
+                    break
+                if task is not None:
+                    task[0].cancel()
+
+        for _ in self._threads:
+            self._tasks.put(None)
+
+        if wait:
+            for t in self._threads:
+                t.join()
@@ -0,0 +1,231 @@
+"""
+Streaming evaluation of scripts and deployed endpoints over Arrow Flight
+uploads.
+
+Regular Arrow requests upload the whole table with do_put and run the
+script only after the upload is complete. For row-wise or batch-wise
+scripts (scoring, text cleanup) StreamEvaluator runs the script on every
+record batch as it arrives and yields output batches right away, so peak
+memory is one batch rather than the whole dataset and compute overlaps
+with the network transfer. Deployed endpoints can be queried the same
+way, so batch scoring against deployed models avoids JSON entirely.
+"""
+
+from concurrent.futures import TimeoutError
+import logging
+import threading
+import uuid
+
+import pyarrow
+import pyarrow.flight
+
+from tabpy.tabpy_server.app.app_parameters import SettingsParameters
+from tabpy.tabpy_server.common import json_codec
+from tabpy.tabpy_server.common.messages import QuerySuccessful
+from tabpy.tabpy_server.handlers import evaluation_plane_handler
+from tabpy.tabpy_server.handlers.evaluation_plane_handler import (
+    RestrictedTabPy,
+    to_arrow_table,
+)
+
+
+logger = logging.getLogger(__name__)
+
+_SCRIPT_ARGUMENT_FORMATS = ("pandas", "numpy", "arrow")
+
+_QUERY_ARGUMENT_FORMATS = ("list", "numpy", "arrow")
+
+
+class StreamEvaluator:
+    """
+    Runs ad-hoc scripts with the /evaluate executor, or deployed endpoints,
+    on streams of record batches.
+
+    Streaming requests are Flight uploads to a command descriptor with
+    a JSON body, either with a script:
+
+        {"script": "...", "argumentFormat": "arrow"}
+
+    or with the name of a deployed endpoint:
+
+        {"endpoint": "...", "argumentFormat": "numpy"}
+
+    Every batch is passed to the script as _arg1 (a DataFrame, a
+    RecordBatch with "arrow" or NumPy arrays _arg1, _arg2, ... with "numpy")
+    and the script is run once per batch, with TABPY_EVALUATE_TIMEOUT
+    applied to each run.
+
+    Endpoints are queried once per batch with a value per column (a list,
+    a NumPy array with "numpy" or an Arrow array with "arrow"). Columns
+    named _arg1, _arg2, ... are passed as positional arguments, other
+    columns as keyword arguments named after the columns.
+    """
+
+    def __init__(self, app):
+        self.executor = app.evaluate_executor
+        self.script_cache = app.script_cache
+        self.python_service = app.python_service
+        self.evaluate_enabled = app.settings[SettingsParameters.EvaluateEnabled]
+        self.protocol = app.settings[SettingsParameters.TransferProtocol]
+        self.port = app.settings[SettingsParameters.Port]
+        self.eval_timeout = app.settings[SettingsParameters.EvaluateTimeout]
+        self.streams = 0
+        self.batches = 0
+        self._lock = threading.Lock()
+
+    def parse_command(self, command):
+        """
+        Validates streaming request body.
+
+        Returns
+        -------
+        dict
+            Request with the argumentFormat key set.
+
+        Raises
+        ------
+        pyarrow.flight.FlightServerError
+            If the request is not valid.
+        """
+        try:
+            request = json_codec.loads(command)
+        except ValueError:
+            raise pyarrow.flight.FlightServerError("Invalid streaming request.")
+        if not isinstance(request, dict):
+            raise pyarrow.flight.FlightServerError("Invalid streaming request.")
+
+        if "endpoint" in request:
+            argument_formats = _QUERY_ARGUMENT_FORMATS
+        elif "script" in request:
+            argument_formats = _SCRIPT_ARGUMENT_FORMATS
+        else:
+            raise pyarrow.flight.FlightServerError("Script is empty.")
+
+        argument_format = request.setdefault("argumentFormat", argument_formats[0])
+        if argument_format not in argument_formats:
+            raise pyarrow.flight.FlightServerError(
+                f"Unsupported argument format: {argument_format}. "
+                f"Supported formats are {', '.join(argument_formats)}."
+            )
+        return request
+
+    def evaluate(self, command, reader, headers=None):
+        """
+        Returns RecordBatchReader with output of the script (or endpoint)
+        run on every batch of the reader. Batches are read and evaluated
+        lazily, while the returned reader is consumed.
+
+        headers are sent with tabpy.query() calls of the script which go
+        through the /query method, i.e. from worker processes.
+        """
+        request = self.parse_command(command)
+        if "endpoint" in request:
+            run = self._get_query_runner(request, reader.schema)
+        else:
+            run = self._get_script_runner(request, reader.schema, headers or {})
+        with self._lock:
+            self.streams += 1
+
+        # The output schema is only known once the script returned
+        first = next((run(batch) for batch in reader), None)
+        if first is None:
+            first = run(pyarrow.RecordBatch.from_pylist([], schema=reader.schema))
+        schema = first.schema
+
+        def output_batches():
+            yield from first.to_batches()
+            for batch in reader:
+                table = run(batch)
+                if not table.schema.equals(schema):
+                    table = table.cast(schema)
+                yield from table.to_batches()
+
+        return pyarrow.RecordBatchReader.from_batches(schema, output_batches())
+
+    def _get_script_runner(self, request, schema, headers):
+        if not self.evaluate_enabled:
+            raise pyarrow.flight.FlightUnavailableError(
+                "Ad-hoc scripts have been disabled on this analytics extension.")
+
+        argument_format = request["argumentFormat"]
+        if argument_format == "numpy":
+            arg_names = [f"_arg{i + 1}" for i in range(len(schema))]
+        else:
+            arg_names = ["_arg1"]
+        user_script, _ = self.script_cache.get_function(
+            request["script"], arg_names, vars(evaluation_plane_handler)
+        )
+        restricted_tabpy = RestrictedTabPy(
+            self.protocol, self.port, logger, self.eval_timeout, headers, self.python_service
+        )
+
+        def run(batch):
+            arguments = self._convert_batch(batch, argument_format)
+            future = self.executor.submit(user_script, restricted_tabpy, **arguments)
+            try:
+                result = future.result(timeout=self.eval_timeout)
+            except TimeoutError:
+                self.executor.reclaim(future)
+                raise pyarrow.flight.FlightTimedOutError(
+                    f"User defined script timed out. "
+                    f"Timeout is set to {self.eval_timeout} s."
+                )
+            with self._lock:
+                self.batches += 1
+            return to_arrow_table(result)
+
+        return run
+
+    def _get_query_runner(self, request, schema):
+        if self.python_service is None:
+            raise pyarrow.flight.FlightUnavailableError(
+                "Deployed endpoints are not available.")
+
+        ps = self.python_service.ps
+        name = request["endpoint"]
+        try:
+            (po_name, _) = ps.get_actual_model(name)
+        except RuntimeError as e:
+            raise pyarrow.flight.FlightServerError(f"Unknown endpoint type: {e}")
+        if not po_name:
+            raise pyarrow.flight.FlightServerError(f"Endpoint '{name}' does not exist.")
+
+        argument_format = request["argumentFormat"]
+        positional = schema.names == [f"_arg{i + 1}" for i in range(len(schema))]
+
+        def run(batch):
+            if argument_format == "arrow":
+                values = batch.columns
+            elif argument_format == "numpy":
+                values = [c.to_numpy(zero_copy_only=False) for c in batch.columns]
+            else:
+                values = [c.to_pylist() for c in batch.columns]
+            params = values if positional else dict(zip(batch.schema.names, values))
+            response = ps.query(po_name, params, str(uuid.uuid4()))
+            if not isinstance(response, QuerySuccessful):
+                raise pyarrow.flight.FlightServerError(
+                    f"Error querying endpoint '{po_name}': {response.for_json()}"
+                )
+            with self._lock:
+                self.batches += 1
+            return to_arrow_table(response.response)
+
+        return run
+
+    @staticmethod
+    def _convert_batch(batch, argument_format):
+        if argument_format == "arrow":
+            return {"_arg1": batch}
+        if argument_format == "numpy":
+            return {
+                f"_arg{i + 1}": column.to_numpy(zero_copy_only=False)
+                for i, column in enumerate(batch.columns)
+            }
+        return {"_arg1": batch.to_pandas()}
+
+    def get_stats(self):
+        """
+        Returns dictionary with streaming statistics.
+        """
+        with self._lock:
+            return {"streams": self.streams, "batches": self.batches}
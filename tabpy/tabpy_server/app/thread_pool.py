@@ -0,0 +1,145 @@
+"""
+Thread pool for running /evaluate scripts which can interrupt calls
+that are not needed anymore (e.g. timed out).
+"""
+
+import concurrent.futures
+import ctypes
+import logging
+import threading
+
+
+logger = logging.getLogger(__name__)
+
+
+class ScriptTimeoutError(BaseException):
+    """
+    Raised in a worker thread running a call reclaimed by ThreadPool.
+
+    Like KeyboardInterrupt it does not derive from Exception, so scripts
+    handling errors with `except Exception` do not catch it.
+    """
+
+
+def _set_async_exc(thread_id, exc):
+    return ctypes.pythonapi.PyThreadState_SetAsyncExc(
+        ctypes.c_ulong(thread_id), ctypes.py_object(exc) if exc is not None else None
+    )
+
+
+class _Call:
+    def __init__(self, fn, args, kwargs, on_reclaimed):
+        self.fn = fn
+        self.args = args
+        self.kwargs = kwargs
+        self.on_reclaimed = on_reclaimed
+        self.thread_id = None
+        self.interrupted = False
+        self.lock = threading.Lock()
+
+    def __call__(self):
+        with self.lock:
+            self.thread_id = threading.get_ident()
+        try:
+            return self.fn(*self.args, **self.kwargs)
+        except ScriptTimeoutError:
+            if not self.interrupted:
+                raise
+            # The call was ended by the interrupt, not by the script
+            self.on_reclaimed()
+            # Done callbacks of the future (e.g. Tornado's) only expect
+            # exceptions derived from Exception
+            raise TimeoutError("Call was interrupted by ThreadPool.reclaim()") from None
+        finally:
+            with self.lock:
+                self.thread_id = None
+                if self.interrupted:
+                    # Drop the exception if it was not delivered yet,
+                    # it must not escape to the executor's own code.
+                    _set_async_exc(threading.get_ident(), None)
+
+    def interrupt(self):
+        with self.lock:
+            if self.thread_id is None or self.interrupted:
+                return False
+            self.interrupted = True
+            _set_async_exc(self.thread_id, ScriptTimeoutError)
+            return True
+
+
+class ThreadPool(concurrent.futures.ThreadPoolExecutor):
+    """
+    ThreadPoolExecutor which can reclaim worker threads running calls
+    whose results are not needed anymore.
+
+    Threads cannot be killed, so reclaiming raises ScriptTimeoutError in
+    the thread running the call, the future of the call then fails with
+    TimeoutError. This is best effort: the exception is delivered only when
+    the thread executes Python code, so calls blocked in native code (e.g.
+    time.sleep(), I/O or long NumPy operations) keep their thread until
+    they return. Scripts with a bare `except:` or `except BaseException`
+    keep it for as long as they run, `except Exception` does not catch the
+    interrupt. Such threads are reported as interrupted_workers until the
+    call ends, reclaimed_workers counts only calls which were ended by the
+    interrupt. Use ProcessPool for hard cancellation.
+    """
+
+    def __init__(self, max_workers):
+        super().__init__(max_workers=max_workers)
+        self.reclaimed_workers = 0
+        self._calls = {}
+        self._calls_lock = threading.Lock()
+
+    def submit(self, fn, /, *args, **kwargs):
+        call = _Call(fn, args, kwargs, self._count_reclaimed)
+        future = super().submit(call)
+        with self._calls_lock:
+            self._calls[future] = call
+        future.add_done_callback(self._forget)
+        return future
+
+    def _forget(self, future):
+        with self._calls_lock:
+            self._calls.pop(future, None)
+
+    def _count_reclaimed(self):
+        with self._calls_lock:
+            self.reclaimed_workers += 1
+
+    def reclaim(self, future):
+        """
+        Cancels the pending call for the future or interrupts the running
+        one.
+
+        Returns
+        -------
+        bool
+            True if the call was cancelled or an interrupt was requested.
+            An interrupted call may keep running, see the class docstring.
+        """
+        with self._calls_lock:
+            call = self._calls.get(future)
+        if call is None:
+            return False
+
+        if future.cancel():
+            return True
+
+        if not call.interrupt():
+            return False
+
+        logger.warning("Interrupting worker thread running timed out call")
+        return True
+
+    def get_stats(self):
+        """
+        Returns dictionary with executor statistics.
+        """
+        with self._calls_lock:
+            interrupted = sum(1 for call in self._calls.values() if call.interrupted)
+        return {
+            "type": "thread",
+            "workers": self._max_workers,
+            "reclaimed_workers": self.reclaimed_workers,
+            "interrupted_workers": interrupted,
+        }
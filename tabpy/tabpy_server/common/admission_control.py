@@ -0,0 +1,153 @@
+"""
+Admission control for the /evaluate executor.
+
+Without a bound on the number of queued scripts a spike of requests makes
+every request slower until all of them time out. AdmissionControl limits
+the number of scripts running at the same time and the number of requests
+waiting for their turn; requests over the limit are rejected right away so
+the client can retry later.
+"""
+
+from datetime import timedelta
+import math
+import time
+
+from tornado import gen, locks
+
+
+class AdmissionRejected(Exception):
+    """
+    Raised when a request can not be admitted.
+
+    Attributes
+    ----------
+    retry_after : int
+        Suggested number of seconds to wait before retrying.
+    """
+
+    def __init__(self, message, retry_after):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class AdmissionControl:
+    """
+    Limits the number of scripts in flight and the depth of the queue of
+    requests waiting to run a script.
+
+    Not thread-safe, meant to be used from the IOLoop thread only.
+    """
+
+    def __init__(self, max_in_flight, max_queue_depth):
+        """
+        Parameters
+        ----------
+        max_in_flight : int
+            Maximum number of scripts running at the same time.
+
+        max_queue_depth : int
+            Maximum number of requests waiting to run a script. If 0 or
+            less the queue is not bounded.
+        """
+        self.max_in_flight = max_in_flight
+        self.max_queue_depth = max_queue_depth
+        self.in_flight = 0
+        self.queued = 0
+        self.admitted = 0
+        self.rejected = 0
+        self.completed = 0
+        self.queue_wait_seconds_total = 0.0
+        self.queue_wait_seconds_max = 0.0
+        self.execution_seconds_total = 0.0
+        self._semaphore = locks.Semaphore(max_in_flight)
+
+    def retry_after(self):
+        """
+        Estimates in how many seconds the queue has room for new requests,
+        based on the average execution time.
+        """
+        if self.completed == 0:
+            return 1
+        average = self.execution_seconds_total / self.completed
+        return max(1, math.ceil(average * (self.queued + 1) / self.max_in_flight))
+
+    @gen.coroutine
+    def acquire(self, timeout):
+        """
+        Waits for a free slot to run a script.
+
+        Parameters
+        ----------
+        timeout : float
+            Maximum time in seconds to wait in the queue.
+
+        Returns
+        -------
+        float
+            Time in seconds spent in the queue.
+
+        Raises
+        ------
+        AdmissionRejected
+            If the queue is full or the request waited too long.
+        """
+        if (
+            self.in_flight >= self.max_in_flight
+            and self.max_queue_depth > 0
+            and self.queued >= self.max_queue_depth
+        ):
+            self.rejected += 1
+            raise AdmissionRejected(
+                f"Too many requests in queue ({self.queued})", self.retry_after()
+            )
+
+        start = time.monotonic()
+        self.queued += 1
+        try:
+            yield self._semaphore.acquire(timeout=timedelta(seconds=timeout))
+        except gen.TimeoutError:
+            self.rejected += 1
+            raise AdmissionRejected(
+                f"Request waited in queue for more than {timeout} s",
+                self.retry_after(),
+            )
+        finally:
+            self.queued -= 1
+
+        queue_wait = time.monotonic() - start
+        self.in_flight += 1
+        self.admitted += 1
+        self.queue_wait_seconds_total += queue_wait
+        self.queue_wait_seconds_max = max(self.queue_wait_seconds_max, queue_wait)
+        raise gen.Return(queue_wait)
+
+    def release(self, execution_time):
+        """
+        Frees the slot taken by acquire().
+
+        Parameters
+        ----------
+        execution_time : float
+            Time in seconds the script was running.
+        """
+        self.in_flight -= 1
+        self.completed += 1
+        self.execution_seconds_total += execution_time
+        self._semaphore.release()
+
+    def get_stats(self):
+        """
+        Returns dictionary with admission statistics.
+        """
+        return {
+            "in_flight": self.in_flight,
+            "queued": self.queued,
+            "max_in_flight": self.max_in_flight,
+            "max_queue_depth": self.max_queue_depth,
+            "admitted": self.admitted,
+            "rejected": self.rejected,
+            "completed": self.completed,
+            "queue_wait_seconds_total": self.queue_wait_seconds_total,
+            "queue_wait_seconds_max": self.queue_wait_seconds_max,
+            "execution_seconds_total": self.execution_seconds_total,
+        }
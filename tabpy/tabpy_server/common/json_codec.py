@@ -0,0 +1,125 @@
+"""
+JSON codec used for request and response bodies on the hot path.
+
+Parsing and writing large /evaluate and /query payloads is dominated by
+JSON encoding and decoding. The codec uses orjson when it is installed
+and falls back to the standard library (decoding) and simplejson
+(encoding) otherwise. Both codecs:
+
+- accept request bodies as bytes, so no extra decode("utf-8") copy of
+  the body is needed;
+- write NaN (and infinity) as null;
+- serialize NumPy arrays and scalars.
+
+The codec in use can be checked or changed with get_codec() and
+set_codec().
+"""
+
+import json
+import logging
+
+import numpy
+import simplejson
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+logger = logging.getLogger(__name__)
+
+
+def _default(obj):
+    if isinstance(obj, numpy.ndarray):
+        return obj.tolist()
+    if isinstance(obj, numpy.generic):
+        return obj.item()
+    raise TypeError(f"Object of type {obj.__class__.__name__} is not JSON serializable")
+
+
+class StdlibCodec:
+    """
+    Codec based on the json module and simplejson, always available.
+    """
+
+    name = "stdlib"
+
+    def loads(self, data):
+        return json.loads(data)
+
+    def dumps(self, obj):
+        return simplejson.dumps(obj, ignore_nan=True, default=_default).encode("utf-8")
+
+
+class OrjsonCodec:
+    """
+    Codec based on orjson. Values orjson does not support (e.g. integers
+    wider than 64 bits or NaN literals in requests) are handled by
+    StdlibCodec.
+    """
+
+    name = "orjson"
+
+    def __init__(self):
+        if orjson is None:
+            raise RuntimeError("orjson is not installed")
+        self._options = orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS
+        self._fallback = StdlibCodec()
+
+    def loads(self, data):
+        try:
+            return orjson.loads(data)
+        except orjson.JSONDecodeError:
+            return self._fallback.loads(data)
+
+    def dumps(self, obj):
+        try:
+            return orjson.dumps(obj, default=_default, option=self._options)
+        except orjson.JSONEncodeError:
+            return self._fallback.dumps(obj)
+
+
+_CODECS = {
+    StdlibCodec.name: StdlibCodec,
+    OrjsonCodec.name: OrjsonCodec,
+}
+
+_codec = OrjsonCodec() if orjson is not None else StdlibCodec()
+
+
+def get_codec():
+    """
+    Returns the codec used by loads() and dumps().
+    """
+    return _codec
+
+
+def set_codec(name):
+    """
+    Selects the codec by name ("orjson" or "stdlib").
+
+    Raises
+    ------
+    RuntimeError
+        If the codec is unknown or its library is not installed.
+    """
+    global _codec
+    if name not in _CODECS:
+        raise RuntimeError(f"Unknown JSON codec: {name}")
+    _codec = _CODECS[name]()
+    logger.info(f"Using {name} JSON codec")
+
+
+def loads(data):
+    """
+    Parses JSON document from bytes or str.
+    """
+    return _codec.loads(data)
+
+
+def dumps(obj):
+    """
+    Serializes obj to UTF-8 encoded JSON bytes, writing NaN as null.
+    """
+    return _codec.dumps(obj)
@@ -71,7 +71,11 @@ class QuerySuccessful(
 
 
 class LoadObject(
-    namedtuple("LoadObject", ["uri", "url", "version", "is_update", "endpoint_type"]),
+    namedtuple(
+        "LoadObject",
+        ["uri", "url", "version", "is_update", "endpoint_type", "options"],
+        defaults=(None,),
+    ),
     Msg,
 ):
     __slots__ = ()
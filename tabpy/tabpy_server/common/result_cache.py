@@ -0,0 +1,170 @@
+"""
+Memory bounded cache of serialized results.
+
+Tableau sends identical requests (same script, same partition data) on
+every filter interaction and for every viewer session. Caching the
+serialized response lets TabPy answer repeated requests without running
+the script again.
+"""
+
+from collections import OrderedDict
+from hashlib import blake2b
+import threading
+import time
+
+
+def make_key(*parts):
+    """
+    Returns a short digest of the parts (bytes or str) to use as cache key.
+    """
+    h = blake2b(digest_size=16)
+    for part in parts:
+        if isinstance(part, str):
+            part = part.encode("utf-8")
+        h.update(len(part).to_bytes(8, "little"))
+        h.update(part)
+    return h.digest()
+
+
+class ResultCache:
+    """
+    LRU cache of bytes values bounded by their total size, entries expire
+    after the configured time to live.
+
+    Entries can be put in a group (e.g. the endpoint they were computed by)
+    to invalidate all of them at once.
+    """
+
+    def __init__(self, max_bytes, ttl):
+        """
+        Parameters
+        ----------
+        max_bytes : int
+            Maximum total size of cached values. Values larger than that
+            are never cached.
+
+        ttl : float
+            Time in seconds after which an entry expires. 0 or less means
+            entries never expire.
+        """
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.size_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        # key -> (value, expiration time, group)
+        self._entries = OrderedDict()
+        # group -> set of keys
+        self._groups = {}
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """
+        Returns cached value for the key or None.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+
+            value, expires, _ = entry
+            if expires is not None and expires <= time.monotonic():
+                self._remove(key)
+                self.expirations += 1
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key, value, ttl=None, group=None):
+        """
+        Caches the value, evicting least recently used entries if needed.
+
+        Parameters
+        ----------
+        key : bytes
+            Cache key, see make_key().
+
+        value : bytes
+            Value to cache.
+
+        ttl : float, optional
+            Time to live of the entry in seconds, overrides the time to live
+            of the cache. 0 or less means the entry never expires.
+
+        group : str, optional
+            Group of the entry, see invalidate_group().
+
+        Returns
+        -------
+        bool
+            True if the value was cached.
+        """
+        size = len(value)
+        if size > self.max_bytes:
+            return False
+
+        if ttl is None:
+            ttl = self.ttl
+        expires = time.monotonic() + ttl if ttl > 0 else None
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (value, expires, group)
+            if group is not None:
+                self._groups.setdefault(group, set()).add(key)
+            self.size_bytes += size
+            while self.size_bytes > self.max_bytes:
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+                self.evictions += 1
+        return True
+
+    def invalidate(self, key):
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+
+    def invalidate_group(self, group):
+        """
+        Removes all entries of the group.
+        """
+        with self._lock:
+            for key in self._groups.get(group, ()).copy():
+                self._remove(key)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._groups.clear()
+            self.size_bytes = 0
+
+    def _remove(self, key):
+        value, _, group = self._entries.pop(key)
+        self.size_bytes -= len(value)
+        if group is not None:
+            keys = self._groups[group]
+            keys.discard(key)
+            if not keys:
+                del self._groups[group]
+
+    def get_stats(self):
+        """
+        Returns dictionary with cache statistics.
+        """
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "size_bytes": self.size_bytes,
+                "max_bytes": self.max_bytes,
+                "ttl": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+            }
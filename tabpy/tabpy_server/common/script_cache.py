@@ -0,0 +1,193 @@
+"""
+Cache of compiled ad-hoc scripts submitted to the /evaluate method.
+
+Tableau tends to send the same script text over and over again (once per
+partition, once per dashboard refresh), so compiling the wrapped
+`_user_script` function only once per (script, arguments) pair saves
+a noticeable amount of work on the hot path.
+"""
+
+from collections import OrderedDict
+from hashlib import sha256
+import importlib
+import sys
+import threading
+import types
+
+
+_USER_SCRIPT_NAME = "_user_script"
+
+# Cache used to rebuild scripts shipped to worker processes,
+# see init_process_script_cache().
+_process_script_cache = None
+
+
+def build_function_source(user_code, arg_names):
+    """
+    Wraps user script into a function definition.
+
+    Parameters
+    ----------
+    user_code : str
+        Script body as sent by the client.
+
+    arg_names : list of str
+        Names of the arguments the script is called with
+        (e.g. ['_arg1', '_arg2']).
+
+    Returns
+    -------
+    str
+        Source of the `_user_script(tabpy, ...)` function.
+    """
+    arguments_str = "".join(", " + name for name in arg_names)
+    function_source = f"def {_USER_SCRIPT_NAME}(tabpy{arguments_str}):\n"
+    for u in user_code.splitlines():
+        function_source += " " + u + "\n"
+    return function_source
+
+
+def compile_function_source(function_source):
+    """
+    Compiles source produced by build_function_source and returns code
+    object for the `_user_script` function.
+    """
+    module_code = compile(function_source, "<string>", "exec")
+    for const in module_code.co_consts:
+        if isinstance(const, types.CodeType) and const.co_name == _USER_SCRIPT_NAME:
+            return const
+
+    raise SyntaxError(f"Script does not define {_USER_SCRIPT_NAME} function")
+
+
+class UserScript:
+    """
+    Callable wrapper around compiled user script.
+
+    Unlike plain function objects created from the script source it can be
+    pickled: only the script text, argument names and the name of the
+    module providing function globals are shipped, and the function is
+    rebuilt (through the process wide cache) on the receiving side. This
+    lets the same object be submitted to thread and process executors.
+    """
+
+    def __init__(self, function, user_code, arg_names):
+        self.function = function
+        self.user_code = user_code
+        self.arg_names = tuple(arg_names)
+
+    def __call__(self, *args, **kwargs):
+        return self.function(*args, **kwargs)
+
+    def __reduce__(self):
+        return (
+            _load_user_script,
+            (self.user_code, self.arg_names, self.function.__globals__["__name__"]),
+        )
+
+
+def _load_user_script(user_code, arg_names, module_name):
+    if module_name not in sys.modules:
+        importlib.import_module(module_name)
+    namespace = sys.modules[module_name].__dict__
+
+    cache = _process_script_cache or ScriptCache(0)
+    user_script, _ = cache.get_function(user_code, arg_names, namespace)
+    return user_script
+
+
+def init_process_script_cache(max_size):
+    """
+    Creates cache for scripts received by the current process, used by
+    worker processes of the process based /evaluate executor.
+    """
+    global _process_script_cache
+    _process_script_cache = ScriptCache(max_size)
+
+
+class ScriptCache:
+    """
+    Bounded LRU cache of compiled user scripts.
+
+    Entries are keyed by a hash of the script text and the names of the
+    arguments the script is called with. Only code objects are cached,
+    every call to get_function() returns a new function object, so
+    concurrent requests never share (or overwrite) the same function.
+    """
+
+    def __init__(self, max_size):
+        """
+        Parameters
+        ----------
+        max_size : int
+            Maximum number of compiled scripts to keep. If 0 or less
+            caching is disabled and every script is compiled on each call.
+        """
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _get_key(user_code, arg_names):
+        return (sha256(user_code.encode("utf-8")).digest(), tuple(arg_names))
+
+    def get_function(self, user_code, arg_names, namespace):
+        """
+        Returns function for the script, compiling it if needed.
+
+        Parameters
+        ----------
+        user_code : str
+            Script body as sent by the client.
+
+        arg_names : list of str
+            Names of the script arguments.
+
+        namespace : dict
+            Globals for the returned function.
+
+        Returns
+        -------
+        (UserScript, str)
+            New callable for the script and the source it was compiled from.
+        """
+        key = self._get_key(user_code, arg_names)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+            else:
+                self.misses += 1
+
+        if entry is None:
+            function_source = build_function_source(user_code, arg_names)
+            entry = (compile_function_source(function_source), function_source)
+            if self.max_size > 0:
+                with self._lock:
+                    self._entries[key] = entry
+                    self._entries.move_to_end(key)
+                    while len(self._entries) > self.max_size:
+                        self._entries.popitem(last=False)
+
+        code, function_source = entry
+        function = types.FunctionType(code, namespace, _USER_SCRIPT_NAME)
+        return UserScript(function, user_code, arg_names), function_source
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def get_stats(self):
+        """
+        Returns dictionary with cache statistics.
+        """
+        with self._lock:
+            return {
+                "size": len(self._entries),
+                "max_size": self.max_size,
+                "hits": self.hits,
+                "misses": self.misses,
+            }
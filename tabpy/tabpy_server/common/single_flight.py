@@ -0,0 +1,65 @@
+"""
+Coalescing of identical requests processed at the same time.
+
+When a dashboard is opened by many users at once TabPy receives many
+byte-identical requests within a short time. With SingleFlight only the
+first of them (the leader) is processed, the duplicates arriving while it
+is in flight wait for the leader and get a copy of its response.
+"""
+
+from tornado.concurrent import Future, future_set_exception_unless_cancelled
+from tornado.concurrent import future_set_result_unless_cancelled
+
+
+class SingleFlight:
+    """
+    Registry of in-flight calls keyed by request digest.
+
+    Not thread-safe, meant to be used from the IOLoop thread only.
+    """
+
+    def __init__(self):
+        self.leaders = 0
+        self.coalesced = 0
+        self._calls = {}
+
+    def join(self, key):
+        """
+        Returns future for the in-flight call with the key, or None if
+        there is no such call.
+        """
+        future = self._calls.get(key)
+        if future is not None:
+            self.coalesced += 1
+        return future
+
+    def lead(self, key):
+        """
+        Registers a call with the key, identical calls joining before
+        done() is called wait for its result.
+        """
+        self._calls[key] = Future()
+        self.leaders += 1
+
+    def done(self, key, result=None, exception=None):
+        """
+        Unregisters the call and hands its result (or exception) to all
+        the calls that joined it.
+        """
+        future = self._calls.pop(key)
+        if exception is not None:
+            future_set_exception_unless_cancelled(future, exception)
+            # Mark the exception as retrieved, nobody may be waiting
+            future.exception()
+        else:
+            future_set_result_unless_cancelled(future, result)
+
+    def get_stats(self):
+        """
+        Returns dictionary with coalescing statistics.
+        """
+        return {
+            "in_flight": len(self._calls),
+            "leaders": self.leaders,
+            "coalesced": self.coalesced,
+        }
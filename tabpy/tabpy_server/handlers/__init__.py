@@ -6,6 +6,8 @@ from tabpy.tabpy_server.handlers.endpoints_handler import EndpointsHandler
 from tabpy.tabpy_server.handlers.evaluation_plane_handler import EvaluationPlaneDisabledHandler
 from tabpy.tabpy_server.handlers.evaluation_plane_handler import EvaluationPlaneHandler
 from tabpy.tabpy_server.handlers.query_plane_handler import QueryPlaneHandler
+from tabpy.tabpy_server.handlers.query_batch_handler import QueryBatchHandler
+from tabpy.tabpy_server.handlers.metrics_handler import MetricsHandler
 from tabpy.tabpy_server.handlers.service_info_handler import ServiceInfoHandler
 from tabpy.tabpy_server.handlers.status_handler import StatusHandler
 from tabpy.tabpy_server.handlers.upload_destination_handler import (
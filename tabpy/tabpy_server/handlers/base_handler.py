@@ -4,6 +4,8 @@ import concurrent
 import json
 import logging
 import tornado.web
+from tornado import gen
+from tornado.escape import json_encode, utf8
 from tabpy.tabpy_server.app.app_parameters import SettingsParameters
 from tabpy.tabpy_server.handlers.util import hash_password
 from tabpy.tabpy_server.handlers.util import AuthErrorStates
@@ -12,6 +14,9 @@ import uuid
 
 STAGING_THREAD = concurrent.futures.ThreadPoolExecutor(max_workers=3)
 
+# Response headers copied to requests coalesced with an identical one
+_COALESCED_HEADERS = ("Content-Type", "Etag", "Retry-After")
+
 
 class ContextLoggerWrapper:
     """
@@ -135,6 +140,75 @@ class BaseHandler(tornado.web.RequestHandler):
         )
         self.logger.log(logging.DEBUG, "Checking if need to handle authentication")
         self.auth_error = self.handle_authentication("v1")
+        self._response_capture = None
+
+    def write(self, chunk):
+        if self._response_capture is not None:
+            if isinstance(chunk, dict):
+                self._response_capture.append(utf8(json_encode(chunk)))
+            else:
+                self._response_capture.append(utf8(chunk))
+        super().write(chunk)
+
+    @gen.coroutine
+    def _coalesce(self, single_flight, key, process):
+        """
+        Calls process(), which writes the response, unless an identical
+        request is already in flight. In this case waits for that request
+        and responds with a copy of its response.
+
+        Parameters
+        ----------
+        single_flight : SingleFlight
+            Registry of in-flight requests, None disables coalescing.
+
+        key : bytes
+            Digest identifying the request, None disables coalescing.
+
+        process : callable
+            Processes the request, may return a future.
+        """
+        # Requests asking for a fresh result are not served with the
+        # response of another request
+        fresh = not {"no-cache", "no-store"}.isdisjoint(
+            self._cache_control_directives()
+        )
+        if single_flight is None or key is None or fresh:
+            yield process()
+            return
+
+        in_flight = single_flight.join(key)
+        if in_flight is not None:
+            self.logger.log(logging.DEBUG, "Waiting for identical request in flight")
+            status, headers, body = yield in_flight
+            self.set_status(status)
+            for name, value in headers.items():
+                self.set_header(name, value)
+            self.write(body)
+            return
+
+        single_flight.lead(key)
+        self._response_capture = []
+        try:
+            yield process()
+        except Exception as e:
+            single_flight.done(key, exception=e)
+            raise
+        finally:
+            body = b"".join(self._response_capture)
+            self._response_capture = None
+
+        headers = {
+            name: self._headers[name]
+            for name in _COALESCED_HEADERS
+            if name in self._headers
+        }
+        status = self.get_status()
+        if status == 304:
+            # The full response was captured, followers check their own
+            # If-None-Match
+            status = 200
+        single_flight.done(key, result=(status, headers, body))
 
     def error_out(self, code, log_message, info=None):
         self.set_status(code)
@@ -147,6 +221,15 @@ class BaseHandler(tornado.web.RequestHandler):
             ),
         )
 
+    def _cache_bypassed(self):
+        # "Cache-Control: no-cache" runs the script (or model), the fresh
+        # result replaces the cached one
+        return "no-cache" in self._cache_control_directives()
+
+    def _cache_control_directives(self):
+        cache_control = self.request.headers.get("Cache-Control", "")
+        return {d.strip().lower() for d in cache_control.split(",")}
+
     def options(self):
         # add CORS headers if TabPy has a cors_origin specified
         self._add_CORS_header()
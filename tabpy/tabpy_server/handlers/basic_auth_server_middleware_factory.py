@@ -1,5 +1,8 @@
 import base64
+from collections import OrderedDict
 import secrets
+import threading
+import time
 
 from pyarrow.flight import ServerMiddlewareFactory, ServerMiddleware
 from pyarrow.flight import FlightUnauthenticatedError
@@ -7,16 +10,45 @@ from pyarrow.flight import FlightUnauthenticatedError
 from tabpy.tabpy_server.handlers.util import hash_password
 
 class BasicAuthServerMiddleware(ServerMiddleware):
-    def __init__(self, token):
+    def __init__(self, token, credentials=None):
         self.token = token
+        # Authorization header of calls authenticated with Basic
+        # credentials, None for calls using the token
+        self.credentials = credentials
 
     def sending_headers(self):
         return {"authorization": f"Bearer {self.token}"}
 
 class BasicAuthServerMiddlewareFactory(ServerMiddlewareFactory):
-    def __init__(self, creds):
+    """
+    Authenticates Flight calls with Basic credentials or with the Bearer
+    token issued for them.
+
+    Checking a password runs PBKDF2, so it is only done for Basic
+    credentials. The issued token is accepted on later calls until it
+    expires, so a put/get/evaluate sequence pays for hashing once.
+    """
+
+    def __init__(self, creds, token_ttl=600, max_tokens=10000):
+        """
+        Parameters
+        ----------
+        creds : dict
+            Password hashes by user name.
+
+        token_ttl : float
+            Time in seconds after which an issued token expires.
+
+        max_tokens : int
+            Maximum number of tokens kept, the oldest tokens are dropped
+            when it is exceeded.
+        """
         self.creds = creds
-        self.tokens = {}
+        self.token_ttl = token_ttl
+        self.max_tokens = max_tokens
+        # token -> (username, expiration time), oldest first
+        self.tokens = OrderedDict()
+        self._lock = threading.Lock()
 
     def is_valid_user(self, username, password):
         if username not in self.creds:
@@ -24,6 +56,30 @@ class BasicAuthServerMiddlewareFactory(ServerMiddlewareFactory):
         hashed_pwd = hash_password(username, password)
         return self.creds[username].lower() == hashed_pwd.lower()
 
+    def _issue_token(self, username):
+        token = secrets.token_urlsafe(32)
+        now = time.monotonic()
+        with self._lock:
+            # Tokens are issued with the same TTL, so the oldest expire first
+            while self.tokens and next(iter(self.tokens.values()))[1] <= now:
+                self.tokens.popitem(last=False)
+            self.tokens[token] = (username, now + self.token_ttl)
+            while len(self.tokens) > self.max_tokens:
+                self.tokens.popitem(last=False)
+        return token
+
+    def _is_valid_token(self, token):
+        with self._lock:
+            entry = self.tokens.get(token)
+            if entry is None:
+                return False
+            username, expires = entry
+            if expires <= time.monotonic():
+                del self.tokens[token]
+                return False
+            # Tokens of users removed from the password file are not valid
+            return username in self.creds
+
     def start_call(self, info, headers):
         auth_header = None
         for header in headers:
@@ -33,7 +89,7 @@ class BasicAuthServerMiddlewareFactory(ServerMiddlewareFactory):
 
         if not auth_header:
             raise FlightUnauthenticatedError("No credentials supplied")
-        
+
         auth_type, _, value = auth_header.partition(" ")
 
         if auth_type == "Basic":
@@ -41,8 +97,11 @@ class BasicAuthServerMiddlewareFactory(ServerMiddlewareFactory):
             username, _, password = decoded.partition(":")
             if not self.is_valid_user(username, password):
                 raise FlightUnauthenticatedError("Invalid credentials")
-            token = secrets.token_urlsafe(32)
-            self.tokens[token] = username
-            return BasicAuthServerMiddleware(token)
-        
+            return BasicAuthServerMiddleware(self._issue_token(username), auth_header)
+
+        if auth_type == "Bearer":
+            if not self._is_valid_token(value):
+                raise FlightUnauthenticatedError("Invalid or expired token")
+            return BasicAuthServerMiddleware(value)
+
         raise FlightUnauthenticatedError("No credentials supplied")
@@ -1,26 +1,62 @@
+import concurrent.futures
+import numpy
 import pandas
 import pyarrow
 import uuid
 
+from tabpy.tabpy_server.app.app_parameters import SettingsParameters
 from tabpy.tabpy_server.handlers import BaseHandler
 import json
-import simplejson
 import logging
+from tabpy.tabpy_server.common import json_codec
+from tabpy.tabpy_server.common.admission_control import AdmissionRejected
+from tabpy.tabpy_server.common.messages import QueryError, QuerySuccessful, UnknownURI
+from tabpy.tabpy_server.common.result_cache import make_key
 from tabpy.tabpy_server.common.util import format_exception
 import requests
+import time
+import urllib
 from tornado import gen
 from datetime import timedelta
 from tabpy.tabpy_server.handlers.util import AuthErrorStates
 
+
+_ARGUMENT_FORMATS = ("list", "numpy", "pandas", "arrow")
+
+
+def to_arrow_table(data):
+    """
+    Converts result of a script to pyarrow Table. Arrow tables returned
+    by scripts are used as is, without conversion.
+    """
+    if isinstance(data, pyarrow.Table):
+        return data
+    if isinstance(data, pyarrow.RecordBatch):
+        return pyarrow.Table.from_batches([data])
+    if isinstance(data, (pyarrow.Array, pyarrow.ChunkedArray, numpy.ndarray, list)):
+        return pyarrow.table({"result": data})
+    return pyarrow.table(data)
+
 class RestrictedTabPy:
-    def __init__(self, protocol, port, logger, timeout, headers):
+    def __init__(self, protocol, port, logger, timeout, headers, python_service=None):
         self.protocol = protocol
         self.port = port
         self.logger = logger
         self.timeout = timeout
         self.headers = headers
+        self.python_service = python_service
+
+    def __getstate__(self):
+        # Deployed models are not available in worker processes,
+        # queries from there go through the /query method.
+        state = self.__dict__.copy()
+        state["python_service"] = None
+        return state
 
     def query(self, name, *args, **kwargs):
+        if self.python_service is not None:
+            return self._query_in_process(name, args, kwargs)
+
         url = f"{self.protocol}://localhost:{self.port}/query/{name}"
         self.logger.log(logging.DEBUG, f"Querying {url}...")
         internal_data = {"data": args or kwargs}
@@ -29,7 +65,101 @@ class RestrictedTabPy:
         response = requests.post(
             url=url, data=data, headers=headers, timeout=self.timeout, verify=False
         )
-        return response.json()
+        return json_codec.loads(response.content)
+
+    def query_many(self, queries, max_workers=8):
+        """
+        Runs several queries concurrently.
+
+        Parameters
+        ----------
+        queries : list of tuple
+            Queries as (name, args, kwargs) tuples, args and kwargs
+            can be omitted.
+
+        max_workers : int, optional
+            Maximum number of queries running at the same time.
+
+        Returns
+        -------
+        list of dict
+            Responses in the same order as queries. A query which failed
+            with an exception gets a response with "message" and "info"
+            keys, like for errors reported by the deployed model.
+        """
+        queries = list(queries)
+        if not queries:
+            return []
+
+        executor = concurrent.futures.ThreadPoolExecutor(
+            max_workers=max(1, min(max_workers, len(queries)))
+        )
+        try:
+            futures = [executor.submit(self._query_item, q) for q in queries]
+            return [f.result() for f in futures]
+        finally:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def _query_item(self, item):
+        if isinstance(item, str):
+            item = (item,)
+        name = item[0]
+        args = item[1] if len(item) > 1 else ()
+        kwargs = item[2] if len(item) > 2 else {}
+        try:
+            return self.query(name, *args, **kwargs)
+        except Exception as e:
+            self.logger.log(logging.ERROR, f"Query {name} failed: {e}")
+            return {
+                "message": f"Error querying function '{name}'",
+                "info": f"{e.__class__.__name__} : {str(e)}",
+            }
+
+    def _query_in_process(self, name, args, kwargs):
+        """
+        Queries deployed model directly through PythonService, the returned
+        dictionary is the same QueryPlaneHandler responds with.
+        """
+        self.logger.log(logging.DEBUG, f"Querying {name} in process...")
+        ps = self.python_service.ps
+        name = urllib.parse.unquote(name)
+        try:
+            (po_name, _) = ps.get_actual_model(name)
+        except RuntimeError as e:
+            return {"message": "Unknown endpoint type", "info": str(e)}
+
+        if not po_name:
+            return {
+                "message": "UnknownURI",
+                "info": f"Endpoint '{name}' does not exist",
+            }
+
+        uid = str(uuid.uuid4())
+        response = ps.query(po_name, list(args) or kwargs, uid)
+
+        if isinstance(response, QuerySuccessful):
+            return {
+                "response": response.response,
+                "version": response.version,
+                "model": po_name,
+                "uuid": uid,
+            }
+
+        self.logger.log(logging.ERROR, f"Failed query, response: {response}")
+        if isinstance(response, UnknownURI):
+            return {
+                "message": "UnknownURI",
+                "info": (
+                    "No query object has been registered"
+                    f' with the name "{po_name}"'
+                ),
+            }
+        if isinstance(response, QueryError):
+            return {"message": "QueryError", "info": response.for_json()}
+        return {
+            "message": f"Error querying function '{po_name}'",
+            "info": response.for_json(),
+        }
 
 
 class EvaluationPlaneDisabledHandler(BaseHandler):
@@ -63,6 +193,11 @@ class EvaluationPlaneHandler(BaseHandler):
         super(EvaluationPlaneHandler, self).initialize(app)
         self.arrow_server = app.arrow_server
         self.executor = executor
+        self.script_cache = app.script_cache
+        self.result_cache = app.result_cache
+        self.single_flight = app.evaluate_single_flight
+        self.admission_control = app.admission_control
+        self.argument_format = self.settings[SettingsParameters.EvaluateArgumentFormat]
         self._error_message_timeout = (
             f"User defined script timed out. "
             f"Timeout is set to {self.eval_timeout} s."
@@ -70,20 +205,47 @@ class EvaluationPlaneHandler(BaseHandler):
 
     @gen.coroutine
     def _post_impl(self):
-        body = json.loads(self.request.body.decode("utf-8"))
+        # Cached results are found without decoding and converting the
+        # request data
+        cache_key = self._get_result_cache_key()
+        if cache_key is not None and not self._cache_bypassed():
+            cached = self.result_cache.get(cache_key)
+            if cached is not None:
+                self.logger.log(logging.DEBUG, "Responding with cached result")
+                self.write(cached)
+                self.finish()
+                return
+
+        body = json_codec.loads(self.request.body)
         self.logger.log(logging.DEBUG, f"Processing POST request...")
         if "script" not in body:
             self.error_out(400, "Script is empty.")
             return
 
+        if "dataPath" in body:
+            # The server default applies to JSON data, Flight data is passed
+            # as a DataFrame unless the request asks for another format
+            argument_format = body.get("argumentFormat", "pandas")
+        else:
+            argument_format = body.get("argumentFormat", self.argument_format)
+        if argument_format not in _ARGUMENT_FORMATS:
+            self.error_out(
+                400,
+                f"Unsupported argument format: {argument_format}. "
+                f"Supported formats are {', '.join(_ARGUMENT_FORMATS)}.",
+            )
+            return
+
         # Transforming user script into a proper function.
         user_code = body["script"]
         arguments = None
-        arguments_str = ""
+        arg_names = []
         if self.arrow_server is not None and "dataPath" in body:
             # arrow flight scenario
-            arrow_data = self.get_arrow_data(body["dataPath"])
-            if arrow_data is not None:
+            arrow_data = self.get_arrow_data(body["dataPath"], argument_format)
+            if isinstance(arrow_data, dict):
+                arguments = arrow_data
+            elif arrow_data is not None:
                 arguments = {"_arg1": arrow_data}
         elif "data" in body:
             # legacy scenario
@@ -98,7 +260,7 @@ class EvaluationPlaneHandler(BaseHandler):
             args_in = sorted(arguments.keys())
             n = len(arguments)
             if sorted('_arg'+str(i+1) for i in range(n)) == args_in:
-                arguments_str = ", " + ", ".join(args_in)
+                arg_names = args_in
             else:
                 self.error_out(
                     400,
@@ -106,16 +268,21 @@ class EvaluationPlaneHandler(BaseHandler):
                     "the format _arg1, _arg2, _argN",
                 )
                 return
-        function_to_evaluate = f"def _user_script(tabpy{arguments_str}):\n"
-        for u in user_code.splitlines():
-            function_to_evaluate += " " + u + "\n"
+
+            if "data" in body and argument_format != "list":
+                arguments = self._convert_arguments(arguments, argument_format)
+                arg_names = sorted(arguments.keys())
+
+        user_script, function_to_evaluate = self.script_cache.get_function(
+            user_code, arg_names, globals()
+        )
 
         self.logger.log(
             logging.INFO, f"function to evaluate={function_to_evaluate}"
         )
 
         try:
-            result = yield self._call_subprocess(function_to_evaluate, arguments)
+            result = yield self._call_subprocess(user_script, arguments)
         except (
             gen.TimeoutError,
             requests.exceptions.ConnectTimeout,
@@ -124,6 +291,10 @@ class EvaluationPlaneHandler(BaseHandler):
             self.logger.log(logging.ERROR, self._error_message_timeout)
             self.error_out(408, self._error_message_timeout)
             return
+        except AdmissionRejected as e:
+            self.set_header("Retry-After", str(e.retry_after))
+            self.error_out(503, "Server is busy, please retry later", info=str(e))
+            return
 
         if result is not None:
             if self.arrow_server is not None and "dataPath" in body:
@@ -135,28 +306,95 @@ class EvaluationPlaneHandler(BaseHandler):
                 })
                 result = { 'outputDataPath': output_data_id }
                 self.logger.log(logging.WARN, f'outputDataPath={output_data_id}')
+                self.write(json_codec.dumps(result))
             else:
-                if isinstance(result, pandas.DataFrame):
-                    result = result.to_dict(orient='list')
-            self.write(simplejson.dumps(result, ignore_nan=True))
+                output = self._dumps_result(result)
+                if cache_key is not None:
+                    self.result_cache.put(cache_key, output)
+                self.write(output)
         else:
+            if cache_key is not None:
+                self.result_cache.put(cache_key, b"null")
             self.write("null")
         self.finish()
 
-    def get_arrow_data(self, filename):
+    def _get_result_cache_key(self):
+        """
+        Returns key for the request in the result cache, or None if the
+        result should not be cached.
+
+        The key is computed from the raw request body, which includes the
+        argumentFormat of the request if it has one, and the default
+        argument format of the server.
+        """
+        if self.result_cache is None or b'"dataPath"' in self.request.body:
+            # Arrow results are handed over through the flight server
+            return None
+        if "no-store" in self._cache_control_directives():
+            return None
+        return make_key(self.argument_format, self.request.body)
+
+    @staticmethod
+    def _convert_arguments(arguments, argument_format):
+        """
+        Converts lists of values from the request to NumPy arrays, one
+        per argument, or to a single DataFrame passed as _arg1 with
+        a column per argument (a pandas DataFrame or a pyarrow Table).
+        """
+        if argument_format == "numpy":
+            return {name: numpy.asarray(values) for name, values in arguments.items()}
+
+        names = sorted(arguments.keys(), key=lambda name: int(name[len("_arg"):]))
+        if argument_format == "arrow":
+            return {"_arg1": pyarrow.table({name: arguments[name] for name in names})}
+        return {"_arg1": pandas.DataFrame({name: arguments[name] for name in names})}
+
+    @staticmethod
+    def _dumps_result(result):
+        if isinstance(result, pandas.DataFrame):
+            result = result.to_dict(orient='list')
+        elif isinstance(result, pandas.Series):
+            result = result.to_numpy()
+        elif isinstance(result, (pyarrow.Table, pyarrow.RecordBatch)):
+            result = result.to_pydict()
+        elif isinstance(result, (pyarrow.Array, pyarrow.ChunkedArray)):
+            result = result.to_pylist()
+        return json_codec.dumps(result)
+
+    def get_arrow_data(self, filename, argument_format="pandas"):
         descriptor = pyarrow.flight.FlightDescriptor.for_path(filename)
         info = self.arrow_server.get_flight_info(None, descriptor)
         for endpoint in info.endpoints:
             for location in endpoint.locations:
                 key = (descriptor.descriptor_type.value, descriptor.command,
                        tuple(descriptor.path or tuple()))
-                df = self.arrow_server.flights.pop(key).to_pandas()
+                table = self.arrow_server.flights.pop(key)
+                if argument_format == "arrow":
+                    return table
+                if argument_format == "numpy":
+                    return self._table_to_numpy(table)
+                df = table.to_pandas()
                 return df
         self.logger.log(logging.INFO, f'no data found for {filename}')
         return ''
 
+    @staticmethod
+    def _table_to_numpy(table):
+        """
+        Returns a NumPy array per column of the table as _arg1, _arg2, ...
+        Columns of primitive types without nulls stored in a single chunk
+        are passed as read-only views of the Arrow buffers, other columns
+        are copied.
+        """
+        arguments = {}
+        for i, column in enumerate(table.columns):
+            if column.num_chunks == 1:
+                column = column.chunk(0)
+            arguments[f"_arg{i + 1}"] = column.to_numpy(zero_copy_only=False)
+        return arguments
+
     def upload_arrow_data(self, data, filename, metadata):
-        my_table = pyarrow.table(data)
+        my_table = to_arrow_table(data)
         if metadata is not None:
             my_table.schema.with_metadata(metadata)
         descriptor = pyarrow.flight.FlightDescriptor.for_path(filename)
@@ -174,6 +412,18 @@ class EvaluationPlaneHandler(BaseHandler):
             return
 
         self._add_CORS_header()
+        yield self._coalesce(
+            self.single_flight, self._get_single_flight_key(), self._evaluate
+        )
+
+    def _get_single_flight_key(self):
+        if b'"dataPath"' in self.request.body:
+            # Arrow input data is consumed by the first request
+            return None
+        return make_key("evaluate", self.request.body)
+
+    @gen.coroutine
+    def _evaluate(self):
         try:
             yield self._post_impl()
         except Exception as e:
@@ -194,20 +444,35 @@ class EvaluationPlaneHandler(BaseHandler):
                 )
 
     @gen.coroutine
-    def _call_subprocess(self, function_to_evaluate, arguments):
+    def _call_subprocess(self, user_script, arguments):
         restricted_tabpy = RestrictedTabPy(
-            self.protocol, self.port, self.logger, self.eval_timeout, self.request.headers
+            self.protocol,
+            self.port,
+            self.logger,
+            self.eval_timeout,
+            self.request.headers,
+            self.python_service,
         )
-        # Exec does not run the function, so it does not block.
-        exec(function_to_evaluate, globals())
-
-        # 'noqa' comments below tell flake8 to ignore undefined _user_script
-        # name - the name is actually defined with user script being wrapped
-        # in _user_script function (constructed as a striong) and then executed
-        # with exec() call above.
-        future = self.executor.submit(_user_script,  # noqa: F821
-                                      restricted_tabpy,
-                                      **arguments if arguments is not None else None)
-
-        ret = yield gen.with_timeout(timedelta(seconds=self.eval_timeout), future)
+        queue_wait = yield self.admission_control.acquire(self.eval_timeout)
+        start = time.monotonic()
+        try:
+            future = self.executor.submit(user_script,
+                                          restricted_tabpy,
+                                          **arguments if arguments is not None else None)
+
+            try:
+                ret = yield gen.with_timeout(timedelta(seconds=self.eval_timeout), future)
+            except gen.TimeoutError:
+                # Nobody is waiting for the result anymore, free the worker
+                # instead of letting the script run until it completes.
+                self.executor.reclaim(future)
+                raise
+        finally:
+            execution_time = time.monotonic() - start
+            self.admission_control.release(execution_time)
+            self.logger.log(
+                logging.DEBUG,
+                f"Script waited in queue for {queue_wait:.3f} s, "
+                f"executed in {execution_time:.3f} s",
+            )
         raise gen.Return(ret)
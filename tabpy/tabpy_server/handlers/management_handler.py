@@ -85,6 +85,7 @@ class ManagementHandler(BaseHandler):
             schema = request_data.get("schema", None)
             src_path = request_data.get("src_path", None)
             is_public = request_data.get("is_public", None)
+            options = request_data.get("options", None)
             target_path = get_query_object_path(
                 self.settings[SettingsParameters.StateFilePath], name, version
             )
@@ -119,6 +120,7 @@ class ManagementHandler(BaseHandler):
                         target=target,
                         schema=schema,
                         is_public=is_public,
+                        options=options,
                     )
                 else:
                     self.tabpy_state.update_endpoint(
@@ -132,6 +134,7 @@ class ManagementHandler(BaseHandler):
                         schema=schema,
                         version=version,
                         is_public=is_public,
+                        options=options,
                     )
 
             except Exception as e:
@@ -0,0 +1,27 @@
+import json
+import logging
+from tabpy.tabpy_server.handlers import BaseHandler
+from tabpy.tabpy_server.handlers.util import AuthErrorStates
+
+
+class MetricsHandler(BaseHandler):
+    """
+    MetricsHandler reports runtime statistics (caches, executors, etc.)
+    collected by TabPy components.
+    """
+
+    def initialize(self, app):
+        super(MetricsHandler, self).initialize(app)
+        self.app = app
+
+    def get(self):
+        if self.should_fail_with_auth_error() != AuthErrorStates.NONE:
+            self.fail_with_auth_error()
+            return
+
+        self._add_CORS_header()
+
+        metrics = self.app.get_metrics()
+        self.logger.log(logging.DEBUG, f"Collected metrics: {metrics}")
+        self.write(json.dumps(metrics))
+        self.finish()
@@ -0,0 +1,151 @@
+import logging
+import urllib
+
+from tornado import gen, locks
+
+from tabpy.tabpy_server.app.app_parameters import SettingsParameters
+from tabpy.tabpy_server.common import json_codec
+from tabpy.tabpy_server.common.admission_control import AdmissionRejected
+from tabpy.tabpy_server.common.messages import QueryError, QuerySuccessful, UnknownURI
+from tabpy.tabpy_server.common.util import format_exception
+from tabpy.tabpy_server.handlers.query_plane_handler import (
+    QueryPlaneHandler,
+    _get_uuid,
+    _result_json,
+)
+from tabpy.tabpy_server.handlers.util import AuthErrorStates
+
+
+class QueryBatchHandler(QueryPlaneHandler):
+    """
+    Runs a list of queries of deployed endpoints in a single request.
+
+    Queries are posted to /query/<endpoint>/batch as a JSON object with
+    a "queries" list. Every query has the same format as the body of
+    /query/<endpoint> and can name another endpoint with an "endpoint" key:
+
+        {"queries": [{"data": {"x": 1}},
+                     {"endpoint": "other", "data": {"x": 2}}]}
+
+    Queries run on the query executor, at most TABPY_QUERY_BATCH_PARALLELISM
+    of them at the same time, and use the result cache like single queries.
+    The response has a result per query, in the order of the queries, with
+    the HTTP status the query would have with /query/<endpoint>.
+    """
+
+    def initialize(self, app):
+        super(QueryBatchHandler, self).initialize(app)
+        self.parallelism = app.settings[SettingsParameters.QueryBatchParallelism]
+
+    @gen.coroutine
+    def _run_batch_query(self, endpoint_name, query, semaphore):
+        try:
+            data = self._sanitize_request_data(
+                {k: v for k, v in query.items() if k != "endpoint"}
+            )
+        except Exception as e:
+            raise gen.Return(_error(400, format_exception(e, "Invalid Input Data")))
+
+        try:
+            (po_name, _) = self.python_service.ps.get_actual_model(endpoint_name)
+        except RuntimeError as e:
+            raise gen.Return(_error(500, "Unknown endpoint type", str(e)))
+        if not po_name:
+            raise gen.Return(
+                _error(404, "UnknownURI", f"Endpoint '{endpoint_name}' does not exist")
+            )
+
+        uid = _get_uuid()
+        with (yield semaphore.acquire()):
+            try:
+                (response_type, response, _) = yield self._query(
+                    po_name, data, uid, None
+                )
+            except AdmissionRejected as e:
+                raise gen.Return(
+                    _error(503, "Server is busy, please retry later", str(e))
+                )
+
+        if response_type == QuerySuccessful:
+            raise gen.Return(
+                _result_json(
+                    response["response_json"],
+                    response["version"],
+                    po_name,
+                    uid,
+                    status=200,
+                )
+            )
+
+        if response_type == UnknownURI:
+            raise gen.Return(
+                _error(
+                    404,
+                    "UnknownURI",
+                    f'No query object has been registered with the name "{po_name}"',
+                )
+            )
+        if response_type == QueryError:
+            raise gen.Return(_error(400, "QueryError", response))
+        raise gen.Return(_error(500, f"Error querying function '{po_name}'", response))
+
+    @gen.coroutine
+    def _process_batch(self, endpoint_name):
+        self._add_CORS_header()
+        try:
+            request = json_codec.loads(self.request.body or "{}")
+            queries = request.get("queries") if isinstance(request, dict) else None
+            if not isinstance(queries, list) or not all(
+                isinstance(q, dict) for q in queries
+            ):
+                raise RuntimeError(
+                    'Input data must be a dictionary with a list of dictionaries '
+                    'called "queries"'
+                )
+        except Exception as e:
+            self.logger.log(logging.ERROR, str(e))
+            self.error_out(400, format_exception(e, "Invalid Input Data"))
+            return
+
+        self.logger.log(
+            logging.DEBUG, f"Processing batch of {len(queries)} queries..."
+        )
+        semaphore = locks.Semaphore(self.parallelism)
+        try:
+            results = yield [
+                self._run_batch_query(
+                    query.get("endpoint", endpoint_name), query, semaphore
+                )
+                for query in queries
+            ]
+        except Exception as e:
+            self.logger.log(logging.ERROR, str(e))
+            err_msg = format_exception(e, "process query batch")
+            self.error_out(500, "Error processing query batch", info=err_msg)
+            return
+
+        # Successful results are spliced in as they were serialized (or
+        # cached)
+        self.set_header("Content-Type", "application/json; charset=UTF-8")
+        self.write(b'{"results":[' + b",".join(results) + b"]}")
+        self.finish()
+
+    @gen.coroutine
+    def post(self, endpoint_name):
+        self.logger.log(logging.DEBUG, "Processing POST for query batch...")
+
+        if self.should_fail_with_auth_error() != AuthErrorStates.NONE:
+            self.fail_with_auth_error()
+            return
+
+        if not self.request_body_size_within_limit():
+            return
+
+        endpoint_name = urllib.parse.unquote(endpoint_name)
+        yield self._process_batch(endpoint_name)
+
+    get = post
+
+
+def _error(status, message, info=None):
+    return json_codec.dumps({"status": status, "message": message, "info": info or {}})
@@ -1,15 +1,16 @@
 from tabpy.tabpy_server.handlers import BaseHandler
 import logging
 import time
+from tabpy.tabpy_server.common import json_codec
+from tabpy.tabpy_server.common.admission_control import AdmissionRejected
 from tabpy.tabpy_server.common.messages import (
     Query,
     QuerySuccessful,
     QueryError,
     UnknownURI,
 )
-from hashlib import md5
 import uuid
-import json
+from tabpy.tabpy_server.common.result_cache import make_key
 from tabpy.tabpy_server.common.util import format_exception
 import urllib
 from tornado import gen
@@ -21,10 +22,71 @@ def _get_uuid():
     return str(uuid.uuid4())
 
 
+def _result_json(response_json, version, model, uid, status=None):
+    """
+    Returns the JSON object of a successful query. The result is serialized
+    once, cached results are spliced in as they are.
+    """
+    parts = [b"{"]
+    if status is not None:
+        parts.append(b'"status":%d,' % status)
+    parts.extend(
+        (
+            b'"response":',
+            response_json,
+            b',"version":',
+            json_codec.dumps(version),
+            b',"model":',
+            json_codec.dumps(model),
+            b',"uuid":',
+            json_codec.dumps(uid),
+            b"}",
+        )
+    )
+    return b"".join(parts)
+
+
 class QueryPlaneHandler(BaseHandler):
     def initialize(self, app):
         super(QueryPlaneHandler, self).initialize(app)
+        self.single_flight = app.query_single_flight
+        self.query_executor = app.query_executor
+        self.get_admission_control = app.get_query_admission_control
+
+    @gen.coroutine
+    def _run_query(self, po_name, data, uid):
+        """
+        Runs the model on the query executor, within the admission limit of
+        the endpoint.
 
+        Returns
+        -------
+        out : (Msg, float)
+            Response of the python service and the time in seconds the
+            model was running.
+
+        Raises
+        ------
+        AdmissionRejected
+            If the query waited for its turn for too long.
+        """
+        admission_control = self.get_admission_control(po_name)
+        if admission_control is not None:
+            yield admission_control.acquire(self.eval_timeout)
+        start_time = time.time()
+        try:
+            # Models run on the query executor, so the IOLoop keeps serving
+            # other requests in the meantime
+            response = yield self.query_executor.submit(
+                self.python_service.ps.query, po_name, data, uid
+            )
+        finally:
+            gls_time = time.time() - start_time
+            if admission_control is not None:
+                admission_control.release(gls_time)
+        raise gen.Return((response, gls_time))
+
+    @gen.coroutine
     def _query(self, po_name, data, uid, qry):
         """
         Parameters
@@ -47,22 +109,75 @@ class QueryPlaneHandler(BaseHandler):
         out : (result type, dict, int)
             A triple containing a result type, the result message
             as a dictionary, and the time in seconds that it took to complete
-            the request.
+            the request. For successful queries the dictionary has the
+            serialized result under "response_json" and the version of the
+            endpoint under "version".
         """
         self.logger.log(logging.DEBUG, f"Collecting query info for {po_name}...")
-        start_time = time.time()
-        response = self.python_service.ps.query(po_name, data, uid)
-        gls_time = time.time() - start_time
+        result_cache = self.python_service.ps.result_cache
+        cache_entry = self._get_result_cache_entry(po_name, data)
+        if cache_entry is not None and not self._cache_bypassed():
+            (cache_key, _, version) = cache_entry
+            cached = result_cache.get(cache_key)
+            if cached is not None:
+                self.logger.log(logging.DEBUG, "Responding with cached result")
+                raise gen.Return(
+                    (QuerySuccessful, {"response_json": cached, "version": version}, 0)
+                )
+
+        (response, gls_time) = yield self._run_query(po_name, data, uid)
         self.logger.log(logging.DEBUG, f"Query info: {response}")
 
         if isinstance(response, QuerySuccessful):
-            response_json = response.to_json()
-            md5_tag = md5(response_json.encode("utf-8")).hexdigest()
-            self.set_header("Etag", f'"{md5_tag}"')
-            return (QuerySuccessful, response.for_json(), gls_time)
+            response_json = json_codec.dumps(response.response)
+            if cache_entry is not None:
+                (cache_key, cache_ttl, version) = cache_entry
+                # A new version may have been loaded in the meantime
+                if response.version == version:
+                    result_cache.put(
+                        cache_key, response_json, ttl=cache_ttl, group=po_name
+                    )
+            raise gen.Return(
+                (
+                    QuerySuccessful,
+                    {"response_json": response_json, "version": response.version},
+                    gls_time,
+                )
+            )
         else:
             self.logger.log(logging.ERROR, f"Failed query, response: {response}")
-            return (type(response), response.for_json(), gls_time)
+            raise gen.Return((type(response), response.for_json(), gls_time))
+
+    def _get_result_cache_entry(self, po_name, data):
+        """
+        Returns (key, ttl, version) of the query in the result cache, or None
+        if the result should not be cached.
+        """
+        ps = self.python_service.ps
+        cache_ttl = ps.get_result_cache_ttl(po_name)
+        if cache_ttl is None or "no-store" in self._cache_control_directives():
+            return None
+        version = ps.query_objects[po_name]["version"]
+        key = make_key("query", po_name, str(version), json_codec.dumps(data))
+        return (key, cache_ttl, version)
+
+    def _set_etag(self, po_name, version, response_json):
+        # The tag is computed from the serialized result which is written
+        # to the response, the uuid of the response is not part of it
+        tag = make_key(po_name, str(version), response_json).hex()
+        self.set_header("Etag", f'"{tag}"')
+
+    def finish(self, chunk=None):
+        # Tornado only checks If-None-Match of GET requests without an Etag
+        # set by the handler, queries are checked for any method
+        if chunk is not None:
+            self.write(chunk)
+            chunk = None
+        if self.get_status() == 200 and self.check_etag_header():
+            self.logger.log(logging.DEBUG, "Result not modified")
+            self._write_buffer = []
+            self.set_status(304)
+        return super(QueryPlaneHandler, self).finish(chunk)
 
     # handle HTTP Options requests to support CORS
     # don't check API key (client does not send or receive data for OPTIONS,
@@ -78,19 +193,18 @@ class QueryPlaneHandler(BaseHandler):
         self._add_CORS_header()
         self.write({})
 
+    @gen.coroutine
     def _handle_result(self, po_name, data, qry, uid):
-        (response_type, response, gls_time) = self._query(po_name, data, uid, qry)
+        (response_type, response, gls_time) = yield self._query(po_name, data, uid, qry)
 
         if response_type == QuerySuccessful:
-            result_dict = {
-                "response": response["response"],
-                "version": response["version"],
-                "model": po_name,
-                "uuid": uid,
-            }
-            self.write(result_dict)
+            response_json = response["response_json"]
+            self._set_etag(po_name, response["version"], response_json)
+            body = _result_json(response_json, response["version"], po_name, uid)
+            self.set_header("Content-Type", "application/json; charset=UTF-8")
+            self.write(body)
             self.finish()
-            return (gls_time, response["response"])
+            raise gen.Return((gls_time, response_json))
         else:
             if response_type == UnknownURI:
                 self.error_out(
@@ -106,7 +220,7 @@ class QueryPlaneHandler(BaseHandler):
             else:
                 self.error_out(500, f"Error querying function '{po_name}'", info=response)
 
-            return (None, None)
+            raise gen.Return((None, None))
 
     def _sanitize_request_data(self, data):
         if not isinstance(data, dict):
@@ -123,6 +237,7 @@ class QueryPlaneHandler(BaseHandler):
             self.logger.log(logging.CRITICAL, msg)
             raise RuntimeError(msg)
 
+    @gen.coroutine
     def _process_query(self, endpoint_name, start):
         self.logger.log(logging.DEBUG, f"Processing query {endpoint_name}...")
         try:
@@ -132,10 +247,10 @@ class QueryPlaneHandler(BaseHandler):
                 self.request.body = {}
 
             # extract request data explicitly for caching purpose
-            request_json = self.request.body.decode("utf-8")
+            request_json = self.request.body
 
             # Sanitize input data
-            data = self._sanitize_request_data(json.loads(request_json))
+            data = self._sanitize_request_data(json_codec.loads(request_json))
         except Exception as e:
             self.logger.log(logging.ERROR, str(e))
             err_msg = format_exception(e, "Invalid Input Data")
@@ -172,12 +287,16 @@ class QueryPlaneHandler(BaseHandler):
             qry = Query(po_name, request_json)
             gls_time = 0
             # send a query to PythonService and return
-            (gls_time, _) = self._handle_result(po_name, data, qry, uid)
+            (gls_time, _) = yield self._handle_result(po_name, data, qry, uid)
 
             # if error occurred, GLS time is None.
-            if not gls_time:
+            if gls_time is None:
                 return
 
+        except AdmissionRejected as e:
+            self.set_header("Retry-After", str(e.retry_after))
+            self.error_out(503, "Server is busy, please retry later", info=str(e))
+            return
         except Exception as e:
             self.logger.log(logging.ERROR, str(e))
             err_msg = format_exception(e, "process query")
@@ -186,30 +305,11 @@ class QueryPlaneHandler(BaseHandler):
 
     def _get_actual_model(self, endpoint_name):
         # Find the actual query to run from given endpoint
-        all_endpoint_names = []
-
-        while True:
-            endpoint_info = self.python_service.ps.query_objects.get(endpoint_name)
-            if not endpoint_info:
-                return [None, None]
-
-            all_endpoint_names.append(endpoint_name)
-
-            endpoint_type = endpoint_info.get("type", "model")
-
-            if endpoint_type == "alias":
-                endpoint_name = endpoint_info["endpoint_obj"]
-            elif endpoint_type == "model":
-                break
-            else:
-                self.error_out(
-                    500,
-                    "Unknown endpoint type",
-                    info=f'Endpoint type "{endpoint_type}" does not exist',
-                )
-                return
-
-        return (endpoint_name, all_endpoint_names)
+        try:
+            return self.python_service.ps.get_actual_model(endpoint_name)
+        except RuntimeError as e:
+            self.error_out(500, "Unknown endpoint type", info=str(e))
+            return
 
     @gen.coroutine
     def get(self, endpoint_name):
@@ -222,7 +322,11 @@ class QueryPlaneHandler(BaseHandler):
 
         start = time.time()
         endpoint_name = urllib.parse.unquote(endpoint_name)
-        self._process_query(endpoint_name, start)
+        yield self._coalesce(
+            self.single_flight,
+            make_key("query", endpoint_name, self.request.body),
+            lambda: self._process_query(endpoint_name, start),
+        )
 
     @gen.coroutine
     def post(self, endpoint_name):
@@ -237,4 +341,8 @@ class QueryPlaneHandler(BaseHandler):
 
         start = time.time()
         endpoint_name = urllib.parse.unquote(endpoint_name)
-        self._process_query(endpoint_name, start)
+        yield self._coalesce(
+            self.single_flight,
+            make_key("query", endpoint_name, self.request.body),
+            lambda: self._process_query(endpoint_name, start),
+        )
@@ -193,6 +193,29 @@ class TabPyState:
 
         return is_public
 
+    def _check_and_set_options(self, options, defaultValue):
+        if options is None:
+            return defaultValue
+
+        if not isinstance(options, dict):
+            raise ValueError("options must be a dictionary.")
+
+        if not isinstance(options.get("is_deterministic", False), bool):
+            raise ValueError("is_deterministic must be a boolean.")
+
+        for key in ("batch_window_ms", "max_batch_rows", "cache_ttl"):
+            value = options.get(key)
+            if value is None:
+                continue
+            if (
+                isinstance(value, bool)
+                or not isinstance(value, (int, float))
+                or value < 0
+            ):
+                raise ValueError(f"{key} must be a non-negative number.")
+
+        return options
+
     @state_lock
     def add_endpoint(
         self,
@@ -205,6 +228,7 @@ class TabPyState:
         dependencies=None,
         schema=None,
         is_public=None,
+        options=None,
     ):
         """
         Add a new endpoint to the TabPy.
@@ -221,6 +245,8 @@ class TabPyState:
             The endpoint type (model, alias)
         target : str, optional
             The target endpoint name for the alias to be added.
+        options : dict, optional
+            Options of running queries of the endpoint, e.g. the batch window.
 
         Note:
         The version of this endpoint will be set to 1 since it is a new
@@ -239,6 +265,7 @@ class TabPyState:
             endpoint_type = self._check_and_set_endpoint_type(endpoint_type, None)
             dependencies = self._check_and_set_dependencies(dependencies, [])
             is_public = self._check_and_set_is_public(is_public, False)
+            options = self._check_and_set_options(options, {})
 
             self._check_target(target)
             if target and target not in endpoints:
@@ -255,6 +282,7 @@ class TabPyState:
                 "last_modified_time": int(time()),
                 "schema": schema,
                 "is_public": is_public,
+                "options": options,
             }
 
             endpoints[name] = endpoint_info
@@ -299,6 +327,7 @@ class TabPyState:
         dependencies=None,
         schema=None,
         is_public=None,
+        options=None,
     ):
         """
         Update an existing endpoint on the TabPy.
@@ -319,6 +348,8 @@ class TabPyState:
             List of dependent endpoints for this existing endpoint
         target : str, optional
             The target endpoint name for the alias.
+        options : dict, optional
+            Options of running queries of the endpoint, e.g. the batch window.
 
         Note:
         For those parameters that are not specified, those values will not
@@ -344,6 +375,8 @@ class TabPyState:
             # We need to check for this when updating and set to False by default
             is_public = self._check_and_set_is_public(
                 is_public, getattr(endpoint_info, "is_public", False))
+            options = self._check_and_set_options(
+                options, endpoint_info.get("options", {}))
 
             self._check_target(target)
             if target and target not in endpoints:
@@ -367,6 +400,7 @@ class TabPyState:
                 "last_modified_time": int(time()),
                 "schema": schema,
                 "is_public": is_public,
+                "options": options,
             }
 
             endpoints[name] = endpoint_info
@@ -84,7 +84,8 @@ def init_model_evaluator(settings, tabpy_state, python_service):
         else:
             local_path = object_path
             msg = LoadObject(
-                object_name, local_path, object_version, False, object_type
+                object_name, local_path, object_version, False, object_type,
+                obj_info.get("options"),
             )
         python_service.manage_request(msg)
 
@@ -183,7 +184,12 @@ def on_state_change(
                 else:
                     local_path = object_path
                     msg = LoadObject(
-                        object_name, local_path, object_version, is_update, object_type
+                        object_name,
+                        local_path,
+                        object_version,
+                        is_update,
+                        object_type,
+                        endpoint_info.get("options"),
                     )
 
                 python_service.manage_request(msg)
@@ -0,0 +1,234 @@
+"""
+Micro-batching of concurrent queries of a deployed endpoint.
+
+Many models (e.g. scikit-learn pipelines) are far cheaper per row when
+called on one large input than on many small ones. MicroBatcher collects
+queries of an endpoint arriving within a short window, concatenates their
+list arguments, runs the model once and splits the result back per query.
+"""
+
+import json
+import logging
+import threading
+
+import numpy
+
+
+logger = logging.getLogger(__name__)
+
+
+class _Batch:
+    def __init__(self):
+        self.params = []
+        self.rows = []
+        self.total_rows = 0
+        self.results = None
+        # set when the batch is full and should run without waiting for
+        # the rest of the window
+        self.full = threading.Event()
+        self.done = threading.Event()
+
+    def add(self, params, rows):
+        self.params.append(params)
+        self.rows.append(rows)
+        self.total_rows += rows
+        return len(self.params) - 1
+
+
+def _get_signature(params):
+    """
+    Returns (signature, rows) of query parameters, or None if the query
+    can not be batched.
+
+    Queries can be batched if every list argument has the same number of
+    rows. Queries are batched together if they have the same arguments
+    (by position or by name) and equal values of non-list arguments.
+    """
+    if isinstance(params, dict):
+        items = sorted(params.items())
+    else:
+        items = enumerate(params)
+
+    signature = []
+    rows = None
+    for key, value in items:
+        if isinstance(value, list):
+            if rows is None:
+                rows = len(value)
+            elif len(value) != rows:
+                return None
+            signature.append((key, None))
+        else:
+            try:
+                signature.append((key, json.dumps(value, sort_keys=True)))
+            except TypeError:
+                return None
+    if rows is None:
+        return None
+    return (isinstance(params, dict), tuple(signature)), rows
+
+
+def _merge(batch):
+    first = batch.params[0]
+    if isinstance(first, dict):
+        return {
+            key: (
+                [row for params in batch.params for row in params[key]]
+                if isinstance(value, list)
+                else value
+            )
+            for key, value in first.items()
+        }
+    return [
+        (
+            [row for params in batch.params for row in params[i]]
+            if isinstance(value, list)
+            else value
+        )
+        for i, value in enumerate(first)
+    ]
+
+
+def _call(endpoint_obj, params):
+    if isinstance(params, dict):
+        return endpoint_obj.query(**params)
+    return endpoint_obj.query(*params)
+
+
+class MicroBatcher:
+    """
+    Runs concurrent queries of an endpoint as a single call of the model.
+
+    The first query of a batch waits for the batch window, queries arriving
+    in the meantime join the batch. The first query then runs the model
+    with the list arguments of all queries concatenated and splits the
+    result, which has to be a list (or array) with a row per input row.
+    If the model fails or returns a result which can not be split, the
+    queries of the batch are run one by one.
+
+    Queries are called from threads of the query executor, so the number of
+    queries in a batch is also limited by TABPY_QUERY_WORKERS.
+    """
+
+    def __init__(self, window, max_rows=0):
+        """
+        Parameters
+        ----------
+        window : float
+            Time in seconds the first query of a batch waits for other
+            queries.
+
+        max_rows : int
+            Maximum number of rows of a batch, a full batch runs right away.
+            0 or less means the number of rows is not limited.
+        """
+        self.window = window
+        self.max_rows = max_rows
+        self.batches = 0
+        self.batched_queries = 0
+        self.fallbacks = 0
+        self._lock = threading.Lock()
+        self._pending = {}
+
+    def query(self, endpoint_obj, params):
+        """
+        Queries the endpoint object, in a batch with concurrent queries if
+        possible.
+        """
+        signature = _get_signature(params)
+        if signature is None:
+            return _call(endpoint_obj, params)
+        signature, rows = signature
+        if self.max_rows > 0 and rows >= self.max_rows:
+            return _call(endpoint_obj, params)
+
+        with self._lock:
+            batch = self._pending.get(signature)
+            if (
+                batch is not None
+                and self.max_rows > 0
+                and batch.total_rows + rows > self.max_rows
+            ):
+                # The query does not fit, the batch runs right away and the
+                # query starts a new one
+                del self._pending[signature]
+                batch.full.set()
+                batch = None
+            is_leader = batch is None
+            if is_leader:
+                batch = _Batch()
+                self._pending[signature] = batch
+            index = batch.add(params, rows)
+            if self.max_rows > 0 and batch.total_rows >= self.max_rows:
+                del self._pending[signature]
+                batch.full.set()
+
+        if is_leader:
+            batch.full.wait(self.window)
+            with self._lock:
+                if self._pending.get(signature) is batch:
+                    del self._pending[signature]
+            try:
+                batch.results = self._run(endpoint_obj, batch)
+            finally:
+                batch.done.set()
+        else:
+            batch.done.wait()
+
+        if batch.results is None:
+            # The leader failed unexpectedly
+            return _call(endpoint_obj, params)
+        (is_error, result) = batch.results[index]
+        if is_error:
+            raise result
+        return result
+
+    def _run(self, endpoint_obj, batch):
+        if len(batch.params) == 1:
+            return [_run_one(endpoint_obj, batch.params[0])]
+
+        try:
+            result = _call(endpoint_obj, _merge(batch))
+            if not isinstance(result, (list, tuple, numpy.ndarray)):
+                raise ValueError(f"Result of type {type(result)} can not be split")
+            if len(result) != batch.total_rows:
+                raise ValueError(
+                    f"Result has {len(result)} rows, expected {batch.total_rows}"
+                )
+        except Exception as e:
+            logger.warning(
+                f"Batch of {len(batch.params)} queries failed, "
+                f"running them one by one: {e}"
+            )
+            with self._lock:
+                self.fallbacks += 1
+            return [_run_one(endpoint_obj, params) for params in batch.params]
+
+        with self._lock:
+            self.batches += 1
+            self.batched_queries += len(batch.params)
+        results = []
+        start = 0
+        for rows in batch.rows:
+            results.append((False, result[start:start + rows]))
+            start += rows
+        return results
+
+    def get_stats(self):
+        """
+        Returns dictionary with batching statistics.
+        """
+        return {
+            "window": self.window,
+            "max_rows": self.max_rows,
+            "batches": self.batches,
+            "batched_queries": self.batched_queries,
+            "fallbacks": self.fallbacks,
+        }
+
+
+def _run_one(endpoint_obj, params):
+    try:
+        return (False, _call(endpoint_obj, params))
+    except Exception as e:
+        return (True, e)
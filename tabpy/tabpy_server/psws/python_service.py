@@ -19,12 +19,25 @@ from tabpy.tabpy_server.common.messages import (
     ObjectCount,
     ObjectList,
 )
+from tabpy.tabpy_server.psws.micro_batcher import MicroBatcher
 from tabpy.tabpy_tools.query_object import QueryObject
 
 
 logger = logging.getLogger(__name__)
 
 
+def _create_batcher(options):
+    """
+    Creates MicroBatcher for an endpoint deployed with a batch window, or
+    returns None if queries of the endpoint are not batched.
+    """
+    options = options or {}
+    window_ms = options.get("batch_window_ms") or 0
+    if window_ms <= 0:
+        return None
+    return MicroBatcher(window_ms / 1000, options.get("max_batch_rows") or 0)
+
+
 class PythonServiceHandler:
     """
     A wrapper around PythonService object that receives requests and calls the
@@ -73,17 +86,23 @@ class PythonService:
      'last_error':<your-recent-error-to-load-model>,
      'endpoint_obj':<loaded_query_objects>,
      'type':<object-type>,
-     'status':<LoadSuccessful-or-LoadFailed-or-LoadInProgress>}
+     'status':<LoadSuccessful-or-LoadFailed-or-LoadInProgress>,
+     'options':<options-the-object-was-deployed-with>}
 
+    Results of deterministic endpoints are kept in `result_cache` (if set),
+    grouped by endpoint name. Loading a new version of an endpoint or
+    deleting it invalidates its cached results.
     """
 
-    def __init__(self, query_objects=None):
+    def __init__(self, query_objects=None, result_cache=None):
 
         self.EXECUTOR = concurrent.futures.ThreadPoolExecutor(max_workers=1)
         self.query_objects = query_objects or {}
+        self.result_cache = result_cache
 
     def _load_object(
-        self, object_uri, object_url, object_version, is_update, object_type
+        self, object_uri, object_url, object_version, is_update, object_type,
+        options=None
     ):
         try:
             logger.info(
@@ -104,7 +123,10 @@ class PythonService:
                 "endpoint_obj": po,
                 "status": "LoadSuccessful",
                 "last_error": None,
+                "options": options or {},
+                "batcher": _create_batcher(options),
             }
+            self._invalidate_results(object_uri)
         except Exception as e:
             logger.exception(e)
             logger.error(
@@ -120,7 +142,8 @@ class PythonService:
             }
 
     def load_object(
-        self, object_uri, object_url, object_version, is_update, object_type
+        self, object_uri, object_url, object_version, is_update, object_type,
+        options=None
     ):
         try:
             obj_info = self.query_objects.get(object_uri)
@@ -155,6 +178,7 @@ class PythonService:
                     object_version,
                     is_update,
                     object_type,
+                    options,
                 )
 
                 return LoadInProgress(
@@ -185,6 +209,7 @@ class PythonService:
             return ObjectsDeleted(deleted)
         elif isinstance(object_uris, str):
             deleted_obj = self.query_objects.pop(object_uris, None)
+            self._invalidate_results(object_uris)
             if deleted_obj:
                 return ObjectsDeleted([object_uris])
             else:
@@ -207,8 +232,32 @@ class PythonService:
         logger.debug("Flushing query objects")
         n = len(self.query_objects)
         self.query_objects.clear()
+        if self.result_cache is not None:
+            self.result_cache.clear()
         return ObjectsFlushed(n, 0)
 
+    def _invalidate_results(self, object_uri):
+        if self.result_cache is not None:
+            self.result_cache.invalidate_group(object_uri)
+
+    def get_result_cache_ttl(self, object_uri):
+        """
+        Returns time in seconds results of the endpoint can be cached (0 if
+        they do not expire), or None if they should not be cached.
+        """
+        if self.result_cache is None:
+            return None
+        obj_info = self.query_objects.get(object_uri)
+        if not obj_info:
+            return None
+        options = obj_info.get("options") or {}
+        cache_ttl = options.get("cache_ttl") or 0
+        if cache_ttl > 0:
+            return cache_ttl
+        if options.get("is_deterministic"):
+            return 0
+        return None
+
     def count_objects(self):
         """Count the number of Loaded QueryObjects stored in memory"""
         count = 0
@@ -231,6 +280,52 @@ class PythonService:
 
         return ObjectList(objects)
 
+    def get_batching_stats(self):
+        """
+        Returns dictionary with micro-batching statistics of endpoints
+        deployed with a batch window.
+        """
+        return {
+            uri: obj_info["batcher"].get_stats()
+            for (uri, obj_info) in list(self.query_objects.items())
+            if obj_info.get("batcher") is not None
+        }
+
+    def get_actual_model(self, endpoint_name):
+        """
+        Finds the model to run for the endpoint, following aliases.
+
+        Returns
+        -------
+        (str, list of str)
+            Name of the model endpoint and names of all endpoints on the
+            way to it, or (None, None) if any of them does not exist.
+
+        Raises
+        ------
+        RuntimeError
+            If an endpoint on the way has unknown type.
+        """
+        all_endpoint_names = []
+
+        while True:
+            endpoint_info = self.query_objects.get(endpoint_name)
+            if not endpoint_info:
+                return (None, None)
+
+            all_endpoint_names.append(endpoint_name)
+
+            endpoint_type = endpoint_info.get("type", "model")
+
+            if endpoint_type == "alias":
+                endpoint_name = endpoint_info["endpoint_obj"]
+            elif endpoint_type == "model":
+                break
+            else:
+                raise RuntimeError(f'Endpoint type "{endpoint_type}" does not exist')
+
+        return (endpoint_name, all_endpoint_names)
+
     def query(self, object_uri, params, uid):
         """Execute a QueryObject query"""
         logger.debug(f"Querying Python service {object_uri}...")
@@ -260,7 +355,10 @@ class PythonService:
                     )
 
                 logger.debug(f"Querying endpoint with params ({params})...")
-                if isinstance(params, dict):
+                batcher = obj_info.get("batcher")
+                if batcher is not None:
+                    result = batcher.query(pred_obj, params)
+                elif isinstance(params, dict):
                     result = pred_obj.query(**params)
                 else:
                     result = pred_obj.query(*params)
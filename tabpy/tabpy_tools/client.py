@@ -49,6 +49,41 @@ def _check_endpoint_name(name):
         )
 
 
+def _get_options(batch_window_ms, max_batch_rows, is_deterministic, cache_ttl):
+    """Validates query options of an endpoint and returns them as a dict."""
+    if (
+        isinstance(batch_window_ms, bool)
+        or not isinstance(batch_window_ms, (int, float))
+        or batch_window_ms < 0
+    ):
+        raise ValueError("batch_window_ms must be a non-negative number")
+    if (
+        isinstance(max_batch_rows, bool)
+        or not isinstance(max_batch_rows, int)
+        or max_batch_rows < 0
+    ):
+        raise ValueError("max_batch_rows must be a non-negative integer")
+    if not isinstance(is_deterministic, bool):
+        raise ValueError("is_deterministic must be a boolean")
+    if (
+        isinstance(cache_ttl, bool)
+        or not isinstance(cache_ttl, (int, float))
+        or cache_ttl < 0
+    ):
+        raise ValueError("cache_ttl must be a non-negative number")
+
+    options = {}
+    if batch_window_ms > 0:
+        options["batch_window_ms"] = batch_window_ms
+        if max_batch_rows > 0:
+            options["max_batch_rows"] = max_batch_rows
+    if is_deterministic:
+        options["is_deterministic"] = True
+    if cache_ttl > 0:
+        options["cache_ttl"] = cache_ttl
+    return options
+
+
 class Client:
     def __init__(
         self, endpoint, query_timeout=1000, remote_server=False, localhost_endpoint=None
@@ -167,6 +202,29 @@ class Client:
         """
         return self._service.query(name, *args, **kwargs)
 
+    def query_batch(self, name, queries):
+        """Query an endpoint with a list of argument sets in a single
+        request.
+
+        Parameters
+        ----------
+        name : str
+            The name of the endpoint.
+
+        queries : list
+            Arguments of every query, either a list of ordered parameters
+            or a dict of named parameters.
+
+        Returns
+        -------
+        dict
+            Keys are:
+                results: list with a result per query, in the order of the
+                queries. Every result has the status the query would get
+                from query() and the keys of its response.
+        """
+        return self._service.query_batch(name, queries)
+
     #
     # Endpoints
     #
@@ -205,7 +263,10 @@ class Client:
         """Returns the endpoint upload destination."""
         return self._service.get_endpoint_upload_destination()["path"]
 
-    def deploy(self, name, obj, description="", schema=None, override=False, is_public=False):
+    def deploy(
+        self, name, obj, description="", schema=None, override=False, is_public=False,
+        batch_window_ms=0, max_batch_rows=0, is_deterministic=False, cache_ttl=0
+    ):
         """Deploys a Python function as an endpoint in the server.
 
         Parameters
@@ -240,14 +301,43 @@ class Client:
             Tableau. If True, function will be visible ta anyone on a site with this
             analytics extension configured
 
+        batch_window_ms : float, optional
+            If greater than 0, concurrent queries of the endpoint arriving
+            within this number of milliseconds are run as a single call of
+            the function, with list arguments of the queries concatenated.
+            The function has to return a list with a value per input row.
+            Queries are only batched with queries having the same non-list
+            arguments.
+
+        max_batch_rows : int, optional
+            Maximum number of rows of a batch of queries, a full batch runs
+            without waiting for the rest of the batch window. 0 means the
+            number of rows is not limited.
+
+        is_deterministic : bool, optional
+            Whether the function always returns the same result for the same
+            arguments. Results of deterministic functions are cached by the
+            server until the endpoint is updated or removed.
+
+        cache_ttl : float, optional
+            If greater than 0, results are cached for this number of seconds
+            (or until the endpoint is updated or removed), even if the
+            function is not deterministic.
+
         See Also
         --------
         remove, get_endpoints
         """
+        options = _get_options(
+            batch_window_ms, max_batch_rows, is_deterministic, cache_ttl
+        )
+
         if self._remote_server:
             return self._remote_deploy(
                 name, obj,
-                description=description, schema=schema, override=override, is_public=is_public
+                description=description, schema=schema, override=override, is_public=is_public,
+                batch_window_ms=batch_window_ms, max_batch_rows=max_batch_rows,
+                is_deterministic=is_deterministic, cache_ttl=cache_ttl,
             )
 
         endpoint = self.get_endpoints().get(name)
@@ -262,7 +352,9 @@ class Client:
 
             version = endpoint.version + 1
 
-        obj = self._gen_endpoint(name, obj, description, version, schema, is_public)
+        obj = self._gen_endpoint(
+            name, obj, description, version, schema, is_public, options
+        )
 
         self._upload_endpoint(obj)
 
@@ -343,7 +435,10 @@ class Client:
         )
         self._service.set_endpoint(endpoint, should_update_version=False)
 
-    def _gen_endpoint(self, name, obj, description, version=1, schema=None, is_public=False):
+    def _gen_endpoint(
+        self, name, obj, description, version=1, schema=None, is_public=False,
+        options=None
+    ):
         """Generates an endpoint dict.
 
         Parameters
@@ -365,6 +460,9 @@ class Client:
             True if function should be visible in the custom functions explorer
             within Tableau
 
+        options : dict, optional
+            Options of running queries of the endpoint.
+
         Returns
         -------
         dict
@@ -411,6 +509,7 @@ class Client:
             "docstring": endpoint_object.get_docstring(),
             "schema": copy.copy(schema),
             "is_public": is_public,
+            "options": options or {},
         }
 
     def _upload_endpoint(self, obj):
@@ -468,7 +567,8 @@ class Client:
             time.sleep(interval)
 
     def _remote_deploy(
-        self, name, obj, description="", schema=None, override=False, is_public=False
+        self, name, obj, description="", schema=None, override=False, is_public=False,
+        batch_window_ms=0, max_batch_rows=0, is_deterministic=False, cache_ttl=0
     ):
         """
         Remotely deploy a Python function using the /evaluate endpoint. Takes the same inputs
@@ -480,7 +580,9 @@ class Client:
         remote_script += (
             f"client.deploy("
             f"'{name}', {obj.__name__}, '{description}', "
-            f"override={override}, is_public={is_public}, schema={schema}"
+            f"override={override}, is_public={is_public}, schema={schema}, "
+            f"batch_window_ms={batch_window_ms}, max_batch_rows={max_batch_rows}, "
+            f"is_deterministic={is_deterministic}, cache_ttl={cache_ttl}"
             f")"
         )
 
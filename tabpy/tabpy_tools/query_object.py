@@ -5,10 +5,15 @@ import json
 import shutil
 
 import cloudpickle as _cloudpickle
+import numpy
 
 
 logger = logging.getLogger(__name__)
 
+# Boolean, integer, float and unicode string arrays, which the server
+# serializes itself (to JSON or Arrow)
+_SERIALIZABLE_DTYPE_KINDS = "biufU"
+
 
 class QueryObject(abc.ABC):
     """
@@ -92,6 +97,12 @@ class QueryObject(abc.ABC):
         """Convert a result from object query to python data structure that can
         easily serialize over network
         """
+        if isinstance(result, numpy.ndarray):
+            if result.dtype.kind in _SERIALIZABLE_DTYPE_KINDS:
+                # Serialized by the server without converting it to a list
+                return result
+            result = result.tolist()
+
         try:
             json.dumps(result)
         except TypeError:
@@ -34,6 +34,8 @@ class Endpoint(RESTObject):
         A list of endpoints that this endpoint depends on.
     methods : list
         ???
+    options : dict
+        Options of running queries of the endpoint, e.g. the batch window.
     """
 
     name = RESTProperty(str)
@@ -49,6 +51,7 @@ class Endpoint(RESTObject):
     schema_version = RESTProperty(int)
     schema = RESTProperty(str)
     is_public = RESTProperty(bool)
+    options = RESTProperty(dict)
 
     def __new__(cls, **kwargs):
         """Dispatch to the appropriate class."""
@@ -71,6 +74,7 @@ class Endpoint(RESTObject):
             and self.schema_version == other.schema_version
             and self.schema == other.schema
             and self.is_public == other.is_public
+            and self.options == other.options
         )
 
 
@@ -149,6 +153,16 @@ class RESTServiceClient:
             "query/" + name, data={"data": args or kwargs}, timeout=self.query_timeout
         )
 
+    def query_batch(self, name, queries):
+        """Performs a list of queries in a single request. Every query is
+        either a list of positional or a dict of keyword arguments.
+        Respects query_timeout."""
+        return self.service_client.POST(
+            "query/" + name + "/batch",
+            data={"queries": [{"data": query} for query in queries]},
+            timeout=self.query_timeout,
+        )
+
     def get_endpoint_upload_destination(self):
         """Returns a dict representing where endpoint data should be uploaded.
 
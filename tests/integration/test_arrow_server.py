@@ -27,7 +27,7 @@ class TestArrowServer(unittest.TestCase):
     
     def setUp(self):
         self.resources_path = os.path.join(os.path.dirname(__file__), "resources")
-        self.arrow_server.flights = {}
+        self.arrow_server.flights.clear()
 
     def get_descriptor(self, data_path):
         return pyarrow.flight.FlightDescriptor.for_path(data_path)
@@ -44,6 +44,7 @@ class TestArrowServer(unittest.TestCase):
         self.write_data(os.path.join(self.resources_path, "data.csv"))
         flight_info = list(self.arrow_server.list_flights(None, None))
         self.assertEqual(len(flight_info), 1)
+        self.assertGreater(flight_info[0].total_bytes, 0)
 
     def test_server_do_get(self):
         table = self.write_data(os.path.join(self.resources_path, "data.csv"))
@@ -45,7 +45,7 @@ class TestEvaluate(integ_test_base.IntegTestBase):
         result = response.read().decode("utf-8")
 
         self.assertEqual(200, response.status)
-        self.assertEqual("[42, 3.1415926]", result)
+        self.assertEqual([42, 3.1415926], json.loads(result))
 
     def test_none_returned(self):
         payload = """
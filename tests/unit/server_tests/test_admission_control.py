@@ -0,0 +1,53 @@
+from tornado import gen
+from tornado.testing import AsyncTestCase, gen_test
+
+from tabpy.tabpy_server.common.admission_control import (
+    AdmissionControl,
+    AdmissionRejected,
+)
+
+
+class TestAdmissionControl(AsyncTestCase):
+    @gen_test
+    def test_acquire_release(self):
+        control = AdmissionControl(max_in_flight=2, max_queue_depth=0)
+        queue_wait = yield control.acquire(timeout=1)
+        self.assertGreaterEqual(queue_wait, 0)
+        self.assertEqual(1, control.in_flight)
+
+        control.release(0.5)
+        stats = control.get_stats()
+        self.assertEqual(0, stats["in_flight"])
+        self.assertEqual(1, stats["admitted"])
+        self.assertEqual(1, stats["completed"])
+        self.assertEqual(0.5, stats["execution_seconds_total"])
+
+    @gen_test
+    def test_queue_full(self):
+        control = AdmissionControl(max_in_flight=1, max_queue_depth=1)
+        yield control.acquire(timeout=1)
+        waiting = control.acquire(timeout=5)
+        yield gen.moment
+        self.assertEqual(1, control.queued)
+
+        with self.assertRaises(AdmissionRejected) as err:
+            yield control.acquire(timeout=1)
+        self.assertEqual(1, err.exception.retry_after)
+        self.assertEqual(1, control.rejected)
+
+        control.release(2.0)
+        queue_wait = yield waiting
+        self.assertGreater(queue_wait, 0)
+        self.assertEqual(0, control.queued)
+        self.assertEqual(1, control.in_flight)
+        # average execution time 2 s for the only slot
+        self.assertEqual(2, control.retry_after())
+
+    @gen_test
+    def test_queue_timeout(self):
+        control = AdmissionControl(max_in_flight=1, max_queue_depth=0)
+        yield control.acquire(timeout=1)
+        with self.assertRaises(AdmissionRejected):
+            yield control.acquire(timeout=0.05)
+        self.assertEqual(0, control.queued)
+        self.assertEqual(1, control.rejected)
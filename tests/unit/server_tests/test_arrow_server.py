@@ -0,0 +1,65 @@
+import threading
+import unittest
+
+import pyarrow
+import pyarrow.flight
+
+from tabpy.tabpy_server.app.arrow_server import FlightServer
+
+
+class _Context:
+    def __init__(self, compression=None):
+        self.compression = compression
+
+    def get_middleware(self, key):
+        if self.compression is None:
+            return None
+        return type("Middleware", (), {"compression": self.compression})()
+
+
+class TestFlightServerCompression(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.server = FlightServer(
+            "localhost",
+            "grpc+tcp://localhost:0",
+            compression="zstd",
+            compression_threshold=1024,
+        )
+        threading.Thread(target=cls.server.serve, daemon=True).start()
+        cls.client = pyarrow.flight.FlightClient(f"grpc+tcp://localhost:{cls.server.port}")
+        cls.table = pyarrow.table({"a": [f"value {i % 10}" for i in range(10000)]})
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+
+    def _round_trip(self, headers=None):
+        descriptor = pyarrow.flight.FlightDescriptor.for_path("data")
+        writer, _ = self.client.do_put(descriptor, self.table.schema)
+        writer.write_table(self.table)
+        writer.close()
+        options = pyarrow.flight.FlightCallOptions(headers=headers or [])
+        info = self.client.get_flight_info(descriptor)
+        return self.client.do_get(info.endpoints[0].ticket, options).read_all()
+
+    def test_write_options(self):
+        options = self.server._get_write_options(_Context(), 2048)
+        self.assertEqual("zstd", options.compression)
+        self.assertIsNone(self.server._get_write_options(_Context(), 100))
+        self.assertIsNone(self.server._get_write_options(_Context("none"), 2048))
+        options = self.server._get_write_options(_Context("lz4_frame"), 2048)
+        self.assertEqual("lz4", options.compression)
+        # no size, e.g. streamed output
+        self.assertEqual("zstd", self.server._get_write_options(None).compression)
+
+    def test_compressed_round_trip(self):
+        self.assertTrue(self._round_trip().equals(self.table))
+
+    def test_opt_out(self):
+        table = self._round_trip([(b"x-tabpy-compression", b"none")])
+        self.assertTrue(table.equals(self.table))
+
+    def test_unsupported_compression(self):
+        with self.assertRaises(pyarrow.flight.FlightServerError):
+            self._round_trip([(b"x-tabpy-compression", b"gzip")])
@@ -0,0 +1,117 @@
+import base64
+import threading
+import time
+import unittest
+from unittest.mock import patch
+
+import pyarrow
+import pyarrow.flight
+
+from tabpy.tabpy_server.app.arrow_server import FlightServer
+from tabpy.tabpy_server.handlers import basic_auth_server_middleware_factory
+from tabpy.tabpy_server.handlers.basic_auth_server_middleware_factory import (
+    BasicAuthServerMiddlewareFactory,
+)
+from tabpy.tabpy_server.handlers.no_op_auth_handler import NoOpAuthHandler
+from tabpy.tabpy_server.handlers.util import hash_password
+
+
+def _basic(username, password):
+    value = base64.b64encode(f"{username}:{password}".encode()).decode()
+    return {"authorization": [f"Basic {value}"]}
+
+
+def _bearer(middleware):
+    return {"authorization": [middleware.sending_headers()["authorization"]]}
+
+
+class TestBasicAuthServerMiddlewareFactory(unittest.TestCase):
+    def setUp(self):
+        self.creds = {"user": hash_password("user", "P@ssw0rd")}
+
+    def test_bearer_token_reused(self):
+        factory = BasicAuthServerMiddlewareFactory(self.creds)
+        with patch.object(
+            basic_auth_server_middleware_factory,
+            "hash_password",
+            wraps=hash_password,
+        ) as mock_hash:
+            middleware = factory.start_call(None, _basic("user", "P@ssw0rd"))
+            for _ in range(3):
+                factory.start_call(None, _bearer(middleware))
+        self.assertEqual(1, mock_hash.call_count)
+
+    def test_credentials(self):
+        factory = BasicAuthServerMiddlewareFactory(self.creds)
+        basic = _basic("user", "P@ssw0rd")
+        middleware = factory.start_call(None, basic)
+        self.assertEqual(basic["authorization"][0], middleware.credentials)
+        self.assertIsNone(factory.start_call(None, _bearer(middleware)).credentials)
+
+    def test_invalid_credentials(self):
+        factory = BasicAuthServerMiddlewareFactory(self.creds)
+        with self.assertRaises(pyarrow.flight.FlightUnauthenticatedError):
+            factory.start_call(None, _basic("user", "wrong"))
+        with self.assertRaises(pyarrow.flight.FlightUnauthenticatedError):
+            factory.start_call(None, {"authorization": ["Bearer unknown"]})
+        with self.assertRaises(pyarrow.flight.FlightUnauthenticatedError):
+            factory.start_call(None, {})
+
+    def test_token_expires(self):
+        factory = BasicAuthServerMiddlewareFactory(self.creds, token_ttl=0.05)
+        middleware = factory.start_call(None, _basic("user", "P@ssw0rd"))
+        time.sleep(0.1)
+        with self.assertRaises(pyarrow.flight.FlightUnauthenticatedError):
+            factory.start_call(None, _bearer(middleware))
+        self.assertEqual(0, len(factory.tokens))
+
+    def test_token_table_bounded(self):
+        factory = BasicAuthServerMiddlewareFactory(self.creds, max_tokens=2)
+        first = factory.start_call(None, _basic("user", "P@ssw0rd"))
+        for _ in range(2):
+            factory.start_call(None, _basic("user", "P@ssw0rd"))
+        self.assertEqual(2, len(factory.tokens))
+        with self.assertRaises(pyarrow.flight.FlightUnauthenticatedError):
+            factory.start_call(None, _bearer(first))
+
+    def test_removed_user(self):
+        factory = BasicAuthServerMiddlewareFactory(self.creds)
+        middleware = factory.start_call(None, _basic("user", "P@ssw0rd"))
+        del self.creds["user"]
+        with self.assertRaises(pyarrow.flight.FlightUnauthenticatedError):
+            factory.start_call(None, _bearer(middleware))
+
+
+class TestBasicAuthFlightServer(unittest.TestCase):
+    def test_authenticated_calls(self):
+        factory = BasicAuthServerMiddlewareFactory(
+            {"user": hash_password("user", "P@ssw0rd")}
+        )
+        server = FlightServer(
+            "localhost",
+            "grpc+tcp://localhost:0",
+            auth_handler=NoOpAuthHandler(),
+            middleware={"basic": factory},
+        )
+        threading.Thread(target=server.serve, daemon=True).start()
+        try:
+            client = pyarrow.flight.FlightClient(f"grpc+tcp://localhost:{server.port}")
+            token_pair = client.authenticate_basic_token(b"user", b"P@ssw0rd")
+            options = pyarrow.flight.FlightCallOptions(headers=[token_pair])
+
+            table = pyarrow.table({"a": [1, 2]})
+            descriptor = pyarrow.flight.FlightDescriptor.for_path("data")
+            with patch.object(
+                basic_auth_server_middleware_factory,
+                "hash_password",
+                wraps=hash_password,
+            ) as mock_hash:
+                writer, _ = client.do_put(descriptor, table.schema, options)
+                writer.write_table(table)
+                writer.close()
+                info = client.get_flight_info(descriptor, options)
+                result = client.do_get(info.endpoints[0].ticket, options).read_all()
+            self.assertTrue(result.equals(table))
+            self.assertEqual(0, mock_hash.call_count)
+        finally:
+            server.shutdown()
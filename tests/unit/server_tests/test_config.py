@@ -223,6 +223,110 @@ class TestPartialConfigFile(unittest.TestCase):
         app = TabPyApp(self.config_file.name)
         self.assertEqual(app.settings["minimum_tls_version"], "TLSv1_3")
 
+    @patch("tabpy.tabpy_server.app.app.os.path.exists", return_value=True)
+    @patch("tabpy.tabpy_server.app.app._get_state_from_file")
+    @patch("tabpy.tabpy_server.app.app.TabPyState")
+    def test_evaluate_executor_valid(
+        self, mock_state, mock_get_state_from_file, mock_path_exists
+    ):
+        self.assertTrue(self.config_file is not None)
+        config_file = self.config_file
+        config_file.write(
+            "[TabPy]\n"
+            "TABPY_EVALUATE_EXECUTOR = Process\n"
+            "TABPY_EVALUATE_WORKERS = 3".encode()
+        )
+        config_file.close()
+
+        app = TabPyApp(self.config_file.name)
+        self.assertEqual(app.settings["evaluate_executor"], "process")
+        self.assertEqual(app.settings["evaluate_workers"], 3)
+
+    @patch("tabpy.tabpy_server.app.app.os.path.exists", return_value=True)
+    @patch("tabpy.tabpy_server.app.app._get_state_from_file")
+    @patch("tabpy.tabpy_server.app.app.TabPyState")
+    def test_evaluate_executor_invalid(
+        self, mock_state, mock_get_state_from_file, mock_path_exists
+    ):
+        self.assertTrue(self.config_file is not None)
+        config_file = self.config_file
+        config_file.write("[TabPy]\n" "TABPY_EVALUATE_EXECUTOR = gpu".encode())
+        config_file.close()
+
+        with self.assertRaises(RuntimeError):
+            TabPyApp(self.config_file.name)
+
+    @patch("tabpy.tabpy_server.app.app.os.path.exists", return_value=True)
+    @patch("tabpy.tabpy_server.app.app._get_state_from_file")
+    @patch("tabpy.tabpy_server.app.app.TabPyState")
+    def test_evaluate_max_in_flight_invalid(
+        self, mock_state, mock_get_state_from_file, mock_path_exists
+    ):
+        self.assertTrue(self.config_file is not None)
+        config_file = self.config_file
+        config_file.write("[TabPy]\n" "TABPY_EVALUATE_MAX_IN_FLIGHT = 0".encode())
+        config_file.close()
+
+        with self.assertRaises(RuntimeError):
+            TabPyApp(self.config_file.name)
+
+    @patch("tabpy.tabpy_server.app.app.os.path.exists", return_value=True)
+    @patch("tabpy.tabpy_server.app.app._get_state_from_file")
+    @patch("tabpy.tabpy_server.app.app.TabPyState")
+    def test_evaluate_argument_format_invalid(
+        self, mock_state, mock_get_state_from_file, mock_path_exists
+    ):
+        self.assertTrue(self.config_file is not None)
+        config_file = self.config_file
+        config_file.write("[TabPy]\n" "TABPY_EVALUATE_ARGUMENT_FORMAT = xml".encode())
+        config_file.close()
+
+        with self.assertRaises(RuntimeError):
+            TabPyApp(self.config_file.name)
+
+    @patch("tabpy.tabpy_server.app.app.os.path.exists", return_value=True)
+    @patch("tabpy.tabpy_server.app.app._get_state_from_file")
+    @patch("tabpy.tabpy_server.app.app.TabPyState")
+    def test_arrow_compression_invalid(
+        self, mock_state, mock_get_state_from_file, mock_path_exists
+    ):
+        self.assertTrue(self.config_file is not None)
+        config_file = self.config_file
+        config_file.write("[TabPy]\n" "TABPY_ARROWFLIGHT_COMPRESSION = gzip".encode())
+        config_file.close()
+
+        with self.assertRaises(RuntimeError):
+            TabPyApp(self.config_file.name)
+
+    @patch("tabpy.tabpy_server.app.app.os.path.exists", return_value=True)
+    @patch("tabpy.tabpy_server.app.app._get_state_from_file")
+    @patch("tabpy.tabpy_server.app.app.TabPyState")
+    def test_query_workers_invalid(
+        self, mock_state, mock_get_state_from_file, mock_path_exists
+    ):
+        self.assertTrue(self.config_file is not None)
+        config_file = self.config_file
+        config_file.write("[TabPy]\n" "TABPY_QUERY_WORKERS = 0".encode())
+        config_file.close()
+
+        with self.assertRaises(RuntimeError):
+            TabPyApp(self.config_file.name)
+
+    @patch("tabpy.tabpy_server.app.app.os.path.exists", return_value=True)
+    @patch("tabpy.tabpy_server.app.app._get_state_from_file")
+    @patch("tabpy.tabpy_server.app.app.TabPyState")
+    def test_query_batch_parallelism_invalid(
+        self, mock_state, mock_get_state_from_file, mock_path_exists
+    ):
+        self.assertTrue(self.config_file is not None)
+        config_file = self.config_file
+        config_file.write("[TabPy]\n" "TABPY_QUERY_BATCH_PARALLELISM = 0".encode())
+        config_file.close()
+
+        with self.assertRaises(RuntimeError):
+            TabPyApp(self.config_file.name)
+
+
 class TestTransferProtocolValidation(unittest.TestCase):
     def assertTabPyAppRaisesRuntimeError(self, expected_message):
         with self.assertRaises(RuntimeError) as err:
@@ -4,9 +4,13 @@ import os
 import tempfile
 import string
 
-from tornado.testing import AsyncHTTPTestCase
+from unittest.mock import patch
+
+import pyarrow
+from tornado.testing import AsyncHTTPTestCase, gen_test
 
 from tabpy.tabpy_server.app.app import TabPyApp
+from tabpy.tabpy_server.app.arrow_server import FlightServer
 from tabpy.tabpy_server.handlers.util import hash_password
 
 
@@ -190,7 +194,7 @@ class TestEvaluationPlaneHandlerWithAuth(AsyncHTTPTestCase):
                     decode('utf-8'))
             })
         self.assertEqual(200, response.code)
-        self.assertEqual(b'[1.0, null, 2.0]', response.body)
+        self.assertEqual([1.0, None, 2.0], json.loads(response.body))
 
     def test_script_returns_none(self):
         response = self.fetch(
@@ -557,3 +561,584 @@ class TestEvaluationPlaneHandlerDefault(AsyncHTTPTestCase):
             body=self.script
         )
         self.assertEqual(200, response.code)
+
+    def test_evaluation_script_cache(self):
+        for _ in range(3):
+            response = self.fetch(
+                "/evaluate",
+                method="POST",
+                body=self.script
+            )
+            self.assertEqual(200, response.code)
+            self.assertEqual([6, -3], json.loads(response.body))
+
+        response = self.fetch("/metrics")
+        self.assertEqual(200, response.code)
+        stats = json.loads(response.body)["evaluate_script_cache"]
+        self.assertEqual(1, stats["misses"])
+        self.assertEqual(2, stats["hits"])
+
+    def test_evaluation_numpy_arguments(self):
+        response = self.fetch(
+            "/evaluate",
+            method="POST",
+            body=json.dumps({
+                "argumentFormat": "numpy",
+                "data": {"_arg1": [2.0, 3.0], "_arg2": [3, -1]},
+                "script": "import numpy as np\n"
+                          "assert isinstance(_arg1, np.ndarray)\n"
+                          "return _arg1 * _arg2",
+            })
+        )
+        self.assertEqual(200, response.code)
+        self.assertEqual([6.0, -3.0], json.loads(response.body))
+
+    def test_evaluation_pandas_arguments(self):
+        response = self.fetch(
+            "/evaluate",
+            method="POST",
+            body=json.dumps({
+                "argumentFormat": "pandas",
+                "data": {"_arg1": [2, 3], "_arg2": [3, -1]},
+                "script": "return _arg1['_arg1'] * _arg1['_arg2']",
+            })
+        )
+        self.assertEqual(200, response.code)
+        self.assertEqual([6, -3], json.loads(response.body))
+
+    def test_evaluation_arrow_arguments(self):
+        response = self.fetch(
+            "/evaluate",
+            method="POST",
+            body=json.dumps({
+                "argumentFormat": "arrow",
+                "data": {"_arg1": [2, 3], "_arg2": [3, -1]},
+                "script": "import pyarrow.compute as pc\n"
+                          "return pc.multiply(_arg1['_arg1'], _arg1['_arg2'])",
+            })
+        )
+        self.assertEqual(200, response.code)
+        self.assertEqual([6, -3], json.loads(response.body))
+
+    def test_evaluation_ndarray_result_with_nan(self):
+        response = self.fetch(
+            "/evaluate",
+            method="POST",
+            body=json.dumps({
+                "data": {"_arg1": [1, 4]},
+                "script": "import numpy\n"
+                          "return numpy.array(_arg1 + [float('nan')]) ** 0.5",
+            })
+        )
+        self.assertEqual(200, response.code)
+        self.assertEqual([1.0, 2.0, None], json.loads(response.body))
+
+    def test_evaluation_unsupported_argument_format(self):
+        response = self.fetch(
+            "/evaluate",
+            method="POST",
+            body=json.dumps({
+                "argumentFormat": "xml",
+                "data": {"_arg1": [1]},
+                "script": "return _arg1",
+            })
+        )
+        self.assertEqual(400, response.code)
+
+
+class TestEvaluationPlaneHandlerProcessExecutor(AsyncHTTPTestCase):
+    @classmethod
+    def setUpClass(cls):
+        prefix = "__TestEvaluationPlaneHandlerProcessExecutor_"
+
+        # create config file
+        cls.config_file = tempfile.NamedTemporaryFile(
+            mode="w+t", prefix=prefix, suffix=".conf", delete=False
+        )
+        cls.config_file.write(
+            "[TabPy]\n"
+            "TABPY_EVALUATE_EXECUTOR = process\n"
+            "TABPY_EVALUATE_WORKERS = 1"
+        )
+        cls.config_file.close()
+
+        cls.script = (
+            '{"data":{"_arg1":[2,3],"_arg2":[3,-1]},'
+            '"script":"res=[]\\nfor i in range(len(_arg1)):\\n  '
+            'res.append(_arg1[i] * _arg2[i])\\nreturn res"}'
+        )
+
+        cls.script_raises = (
+            '{"data":{"_arg1":[2,3]},'
+            '"script":"return _arg1[5]"}'
+        )
+
+    @classmethod
+    def tearDownClass(cls):
+        os.remove(cls.config_file.name)
+
+    def get_app(self):
+        self.app = TabPyApp(self.config_file.name)
+        return self.app._create_tornado_web_app()
+
+    def tearDown(self):
+        self.app.evaluate_executor.shutdown()
+        super().tearDown()
+
+    def test_evaluation_in_process(self):
+        response = self.fetch(
+            "/evaluate",
+            method="POST",
+            body=self.script
+        )
+        self.assertEqual(200, response.code)
+        self.assertEqual([6, -3], json.loads(response.body))
+
+    def test_evaluation_error_in_process(self):
+        response = self.fetch(
+            "/evaluate",
+            method="POST",
+            body=self.script_raises
+        )
+        self.assertEqual(500, response.code)
+        self.assertEqual(
+            "IndexError : list index out of range",
+            json.loads(response.body)["info"]
+        )
+
+
+class TestEvaluationPlaneHandlerTimeout(AsyncHTTPTestCase):
+    @classmethod
+    def setUpClass(cls):
+        prefix = "__TestEvaluationPlaneHandlerTimeout_"
+
+        # create config file
+        cls.config_file = tempfile.NamedTemporaryFile(
+            mode="w+t", prefix=prefix, suffix=".conf", delete=False
+        )
+        cls.config_file.write(
+            "[TabPy]\n"
+            "TABPY_EVALUATE_EXECUTOR = process\n"
+            "TABPY_EVALUATE_WORKERS = 1\n"
+            "TABPY_EVALUATE_TIMEOUT = 3"
+        )
+        cls.config_file.close()
+
+        cls.script_endless = (
+            '{"data":{"_arg1":[2,3]},'
+            '"script":"while True:\\n  pass"}'
+        )
+        cls.script = (
+            '{"data":{"_arg1":[2,3]},'
+            '"script":"return [x * 2 for x in _arg1]"}'
+        )
+
+    @classmethod
+    def tearDownClass(cls):
+        os.remove(cls.config_file.name)
+
+    def get_app(self):
+        self.app = TabPyApp(self.config_file.name)
+        return self.app._create_tornado_web_app()
+
+    def tearDown(self):
+        self.app.evaluate_executor.shutdown()
+        super().tearDown()
+
+    def test_timed_out_worker_is_reclaimed(self):
+        response = self.fetch(
+            "/evaluate",
+            method="POST",
+            body=self.script_endless,
+            request_timeout=30
+        )
+        self.assertEqual(408, response.code)
+
+        # the only worker is available again
+        response = self.fetch(
+            "/evaluate",
+            method="POST",
+            body=self.script,
+            request_timeout=30
+        )
+        self.assertEqual(200, response.code)
+        self.assertEqual([4, 6], json.loads(response.body))
+
+        response = self.fetch("/metrics")
+        stats = json.loads(response.body)["evaluate_executor"]
+        self.assertEqual("process", stats["type"])
+        self.assertEqual(1, stats["reclaimed_workers"])
+
+
+class _AddModel:
+    def query(self, x, y):
+        return [a + b for a, b in zip(x, y)]
+
+
+class TestEvaluationPlaneHandlerQueryInProcess(AsyncHTTPTestCase):
+    @classmethod
+    def setUpClass(cls):
+        prefix = "__TestEvaluationPlaneHandlerQueryInProcess_"
+
+        # create config file
+        cls.config_file = tempfile.NamedTemporaryFile(
+            mode="w+t", prefix=prefix, suffix=".conf", delete=False
+        )
+        cls.config_file.write(
+            "[TabPy]\n"
+            # nothing listens on this port, queries over HTTP would fail
+            "TABPY_PORT = 1"
+        )
+        cls.config_file.close()
+
+    @classmethod
+    def tearDownClass(cls):
+        os.remove(cls.config_file.name)
+
+    def get_app(self):
+        self.app = TabPyApp(self.config_file.name)
+        query_objects = self.app.python_service.ps.query_objects
+        query_objects["add"] = {
+            "version": 1,
+            "type": "model",
+            "endpoint_obj": _AddModel(),
+            "status": "LoadSuccessful",
+            "last_error": None,
+        }
+        query_objects["add alias"] = {
+            "version": 1,
+            "type": "alias",
+            "endpoint_obj": "add",
+            "status": "LoadSuccessful",
+            "last_error": None,
+        }
+        return self.app._create_tornado_web_app()
+
+    def _evaluate(self, script):
+        return self.fetch(
+            "/evaluate",
+            method="POST",
+            body=json.dumps(
+                {"data": {"_arg1": [1, 2], "_arg2": [3, 4]}, "script": script}
+            ),
+        )
+
+    def test_query(self):
+        response = self._evaluate(
+            "return tabpy.query('add', _arg1, _arg2)['response']"
+        )
+        self.assertEqual(200, response.code)
+        self.assertEqual([4, 6], json.loads(response.body))
+
+    def test_query_alias(self):
+        response = self._evaluate(
+            "res = tabpy.query('add%20alias', x=_arg1, y=_arg2)\n"
+            "return [res['model'], res['version']]"
+        )
+        self.assertEqual(200, response.code)
+        self.assertEqual(["add", 1], json.loads(response.body))
+
+    def test_query_unknown_endpoint(self):
+        response = self._evaluate("return tabpy.query('nope', _arg1)")
+        self.assertEqual(200, response.code)
+        self.assertEqual(
+            {"message": "UnknownURI", "info": "Endpoint 'nope' does not exist"},
+            json.loads(response.body),
+        )
+
+    def test_query_error(self):
+        response = self._evaluate("return tabpy.query('add', _arg1)['response']")
+        self.assertEqual(404, response.code)
+        self.assertEqual(
+            "Error processing script", json.loads(response.body)["message"]
+        )
+
+    def test_query_many(self):
+        response = self._evaluate(
+            "res = tabpy.query_many([\n"
+            "    ('add', (_arg1, _arg2)),\n"
+            "    ('nope', (_arg1,)),\n"
+            "    ('add alias', (), {'x': _arg2, 'y': _arg2}),\n"
+            "    ('add', (_arg1,)),\n"
+            "])\n"
+            "return [r.get('response', r.get('message')) for r in res]"
+        )
+        self.assertEqual(200, response.code)
+        result = json.loads(response.body)
+        self.assertEqual([4, 6], result[0])
+        self.assertEqual("UnknownURI", result[1])
+        self.assertEqual([6, 8], result[2])
+        self.assertEqual("Error querying function 'add'", result[3])
+
+
+class TestEvaluationPlaneHandlerResultCache(AsyncHTTPTestCase):
+    @classmethod
+    def setUpClass(cls):
+        prefix = "__TestEvaluationPlaneHandlerResultCache_"
+
+        # create config file
+        cls.config_file = tempfile.NamedTemporaryFile(
+            mode="w+t", prefix=prefix, suffix=".conf", delete=False
+        )
+        cls.config_file.write(
+            "[TabPy]\n"
+            "TABPY_EVALUATE_RESULT_CACHE_SIZE_MB = 1"
+        )
+        cls.config_file.close()
+
+        cls.script = (
+            '{"data":{"_arg1":[2,3]},'
+            '"script":"import random\\nreturn [x * random.random() for x in _arg1]"}'
+        )
+
+    @classmethod
+    def tearDownClass(cls):
+        os.remove(cls.config_file.name)
+
+    def get_app(self):
+        self.app = TabPyApp(self.config_file.name)
+        return self.app._create_tornado_web_app()
+
+    def _evaluate(self, headers=None):
+        response = self.fetch(
+            "/evaluate",
+            method="POST",
+            body=self.script,
+            headers=headers
+        )
+        self.assertEqual(200, response.code)
+        return json.loads(response.body)
+
+    def _get_stats(self):
+        response = self.fetch("/metrics")
+        return json.loads(response.body)["evaluate_result_cache"]
+
+    def test_cached_result(self):
+        first = self._evaluate()
+        self.assertEqual(first, self._evaluate())
+        stats = self._get_stats()
+        self.assertEqual(1, stats["misses"])
+        self.assertEqual(1, stats["hits"])
+        self.assertEqual(1, stats["entries"])
+
+    def test_cached_result_not_decoded(self):
+        first = self._evaluate()
+        with patch(
+            "tabpy.tabpy_server.handlers.evaluation_plane_handler.json_codec.loads"
+        ) as loads:
+            self.assertEqual(first, self._evaluate())
+        loads.assert_not_called()
+
+    def test_no_cache_header(self):
+        first = self._evaluate()
+        second = self._evaluate(headers={"Cache-Control": "no-cache"})
+        self.assertNotEqual(first, second)
+        # the fresh result replaced the cached one
+        self.assertEqual(second, self._evaluate())
+
+    def test_no_store_header(self):
+        self._evaluate(headers={"Cache-Control": "no-store"})
+        self.assertEqual(0, self._get_stats()["entries"])
+
+
+class TestEvaluationPlaneHandlerCoalescing(AsyncHTTPTestCase):
+    @classmethod
+    def setUpClass(cls):
+        prefix = "__TestEvaluationPlaneHandlerCoalescing_"
+
+        # create config file
+        cls.config_file = tempfile.NamedTemporaryFile(
+            mode="w+t", prefix=prefix, suffix=".conf", delete=False
+        )
+        cls.config_file.write("[TabPy]\n" "TABPY_COALESCE_REQUESTS = true")
+        cls.config_file.close()
+
+        cls.script = (
+            '{"data":{"_arg1":[2,3]},'
+            '"script":"import random, time\\ntime.sleep(0.5)\\n'
+            'return [x * random.random() for x in _arg1]"}'
+        )
+
+    @classmethod
+    def tearDownClass(cls):
+        os.remove(cls.config_file.name)
+
+    def get_app(self):
+        self.app = TabPyApp(self.config_file.name)
+        return self.app._create_tornado_web_app()
+
+    @gen_test(timeout=30)
+    def test_identical_requests_coalesced(self):
+        responses = yield [
+            self.http_client.fetch(
+                self.get_url("/evaluate"), method="POST", body=self.script
+            )
+            for _ in range(3)
+        ]
+        bodies = [json.loads(r.body) for r in responses]
+        self.assertEqual(bodies[0], bodies[1])
+        self.assertEqual(bodies[0], bodies[2])
+
+        response = yield self.http_client.fetch(self.get_url("/metrics"))
+        stats = json.loads(response.body)["evaluate_single_flight"]
+        self.assertEqual(1, stats["leaders"])
+        self.assertEqual(2, stats["coalesced"])
+        self.assertEqual(0, stats["in_flight"])
+
+    @gen_test(timeout=30)
+    def test_coalesced_error(self):
+        script = '{"data":{"_arg1":[2,3]},"script":"import time\\ntime.sleep(0.5)\\nreturn 1/0"}'
+        responses = yield [
+            self.http_client.fetch(
+                self.get_url("/evaluate"), method="POST", body=script,
+                raise_error=False
+            )
+            for _ in range(2)
+        ]
+        self.assertEqual([500, 500], [r.code for r in responses])
+        self.assertEqual(responses[0].body, responses[1].body)
+
+    @gen_test(timeout=30)
+    def test_no_cache_requests_not_coalesced(self):
+        responses = yield [
+            self.http_client.fetch(
+                self.get_url("/evaluate"),
+                method="POST",
+                body=self.script,
+                headers={"Cache-Control": "no-cache"},
+            )
+            for _ in range(2)
+        ]
+        self.assertNotEqual(
+            json.loads(responses[0].body), json.loads(responses[1].body)
+        )
+
+        response = yield self.http_client.fetch(self.get_url("/metrics"))
+        stats = json.loads(response.body)["evaluate_single_flight"]
+        self.assertEqual(0, stats["coalesced"])
+
+
+class TestEvaluationPlaneHandlerAdmissionControl(AsyncHTTPTestCase):
+    @classmethod
+    def setUpClass(cls):
+        prefix = "__TestEvaluationPlaneHandlerAdmissionControl_"
+
+        # create config file
+        cls.config_file = tempfile.NamedTemporaryFile(
+            mode="w+t", prefix=prefix, suffix=".conf", delete=False
+        )
+        cls.config_file.write(
+            "[TabPy]\n"
+            "TABPY_EVALUATE_MAX_IN_FLIGHT = 1\n"
+            "TABPY_EVALUATE_MAX_QUEUE_DEPTH = 1"
+        )
+        cls.config_file.close()
+
+    @classmethod
+    def tearDownClass(cls):
+        os.remove(cls.config_file.name)
+
+    def get_app(self):
+        self.app = TabPyApp(self.config_file.name)
+        return self.app._create_tornado_web_app()
+
+    @gen_test(timeout=30)
+    def test_queue_full(self):
+        # different scripts, so requests are not coalesced
+        responses = yield [
+            self.http_client.fetch(
+                self.get_url("/evaluate"),
+                method="POST",
+                body=json.dumps({
+                    "data": {"_arg1": [i]},
+                    "script": "import time\ntime.sleep(0.5)\nreturn _arg1[0]",
+                }),
+                raise_error=False,
+            )
+            for i in range(3)
+        ]
+        self.assertEqual([200, 200, 503], [r.code for r in responses])
+        self.assertEqual([0, 1], [json.loads(r.body) for r in responses[:2]])
+        self.assertEqual("1", responses[2].headers["Retry-After"])
+
+        response = yield self.http_client.fetch(self.get_url("/metrics"))
+        stats = json.loads(response.body)["evaluate_admission"]
+        self.assertEqual(2, stats["admitted"])
+        self.assertEqual(1, stats["rejected"])
+        self.assertGreater(stats["queue_wait_seconds_max"], 0.3)
+
+
+class TestEvaluationPlaneHandlerArrow(AsyncHTTPTestCase):
+    @classmethod
+    def setUpClass(cls):
+        prefix = "__TestEvaluationPlaneHandlerArrow_"
+
+        # create config file
+        cls.config_file = tempfile.NamedTemporaryFile(
+            mode="w+t", prefix=prefix, suffix=".conf", delete=False
+        )
+        # the server default applies to JSON data only
+        cls.config_file.write("[TabPy]\n" "TABPY_EVALUATE_ARGUMENT_FORMAT = numpy")
+        cls.config_file.close()
+
+    @classmethod
+    def tearDownClass(cls):
+        os.remove(cls.config_file.name)
+
+    def get_app(self):
+        self.app = TabPyApp(self.config_file.name)
+        # The handler only uses the flight store, the server is not started
+        self.app.arrow_server = FlightServer("localhost", "grpc+tcp://localhost:0")
+        return self.app._create_tornado_web_app()
+
+    def tearDown(self):
+        self.app.arrow_server.shutdown()
+        super().tearDown()
+
+    def _put_table(self, path, table):
+        descriptor = pyarrow.flight.FlightDescriptor.for_path(path)
+        self.app.arrow_server.flights[FlightServer.descriptor_to_key(descriptor)] = table
+
+    def _get_table(self, path):
+        descriptor = pyarrow.flight.FlightDescriptor.for_path(path)
+        return self.app.arrow_server.flights[FlightServer.descriptor_to_key(descriptor)]
+
+    def _evaluate(self, script, argument_format=None):
+        body = {"dataPath": "input", "script": script}
+        if argument_format is not None:
+            body["argumentFormat"] = argument_format
+        response = self.fetch("/evaluate", method="POST", body=json.dumps(body))
+        self.assertEqual(200, response.code)
+        return self._get_table(json.loads(response.body)["outputDataPath"])
+
+    def test_pandas_arguments(self):
+        self._put_table("input", pyarrow.table({"a": [1, 2]}))
+        output = self._evaluate(
+            "import pandas\n"
+            "assert isinstance(_arg1, pandas.DataFrame)\n"
+            "return _arg1 * 2"
+        )
+        self.assertEqual([2, 4], output.column("a").to_pylist())
+
+    def test_arrow_table_passed_through(self):
+        table = pyarrow.table({"a": [1, 2], "b": ["x", "y"]})
+        self._put_table("input", table)
+        output = self._evaluate("return _arg1", argument_format="arrow")
+        self.assertIs(table, output)
+
+    def test_arrow_array_result(self):
+        self._put_table("input", pyarrow.table({"a": [1, 2]}))
+        output = self._evaluate(
+            "import pyarrow.compute as pc\nreturn pc.add(_arg1['a'], 1)",
+            argument_format="arrow",
+        )
+        self.assertEqual([2, 3], output.column(0).to_pylist())
+
+    def test_numpy_views(self):
+        self._put_table("input", pyarrow.table({"a": [1.0, 2.0], "b": [3.0, 4.0]}))
+        output = self._evaluate(
+            "assert not _arg1.flags.writeable\n"
+            "return {'c': _arg1 * _arg2}",
+            argument_format="numpy",
+        )
+        self.assertEqual([3.0, 8.0], output.column("c").to_pylist())
@@ -0,0 +1,269 @@
+from concurrent.futures import ThreadPoolExecutor
+import os
+import shutil
+import tempfile
+import time
+import unittest
+from unittest.mock import patch
+
+import pyarrow
+
+from tabpy.tabpy_server.app.flight_store import FlightStore, FlightTooLargeError
+
+
+def _table(n):
+    return pyarrow.table({"a": pyarrow.array(range(n), type=pyarrow.int64())})
+
+
+class TestFlightStore(unittest.TestCase):
+    def test_dict_interface(self):
+        store = FlightStore()
+        table = _table(10)
+        store["k"] = table
+        self.assertIn("k", store)
+        self.assertEqual(1, len(store))
+        self.assertTrue(store["k"].equals(table))
+        self.assertEqual([("k", table)], store.items())
+        self.assertTrue(store.pop("k").equals(table))
+        self.assertNotIn("k", store)
+        self.assertIsNone(store.pop("k", None))
+        with self.assertRaises(KeyError):
+            store["k"]
+
+    def test_size_accounting(self):
+        store = FlightStore()
+        store["a"] = _table(10)
+        store["b"] = _table(20)
+        self.assertEqual(240, store.get_stats()["size_bytes"])
+        store["a"] = _table(5)
+        self.assertEqual(200, store.get_stats()["size_bytes"])
+        store.pop("b")
+        self.assertEqual(40, store.get_stats()["size_bytes"])
+        store.clear()
+        self.assertEqual(0, store.get_stats()["size_bytes"])
+
+    def test_data_size(self):
+        store = FlightStore()
+        store["a"] = _table(10)
+        table, data_size = store.get_with_size("a")
+        self.assertEqual(10, table.num_rows)
+        self.assertEqual(80, data_size)
+        self.assertEqual([("a", table, 80)], store.items_with_size())
+        with self.assertRaises(KeyError):
+            store.get_with_size("b")
+
+    def test_lru_eviction(self):
+        store = FlightStore(max_bytes=200)
+        store["a"] = _table(10)
+        store["b"] = _table(10)
+        store["a"]
+        store["c"] = _table(10)
+        # 3 * 80 bytes > 200, "b" is the least recently used
+        self.assertNotIn("b", store)
+        self.assertIn("a", store)
+        self.assertIn("c", store)
+        stats = store.get_stats()
+        self.assertEqual(1, stats["evictions"])
+        self.assertEqual(160, stats["size_bytes"])
+
+    def test_too_large(self):
+        store = FlightStore(max_bytes=100)
+        with self.assertRaises(FlightTooLargeError):
+            store["a"] = _table(100)
+        self.assertEqual(0, len(store))
+
+    def test_too_large_reader(self):
+        store = FlightStore(max_bytes=100)
+        read = []
+
+        def batches():
+            for i in range(10):
+                read.append(i)
+                yield _table(10).to_batches()[0]
+
+        reader = pyarrow.RecordBatchReader.from_batches(_table(0).schema, batches())
+        with self.assertRaises(FlightTooLargeError):
+            store.put_reader("a", reader)
+        # 2 * 80 bytes > 100, the rest of the upload is not read
+        self.assertEqual(2, len(read))
+        self.assertEqual(0, len(store))
+
+    def test_ttl(self):
+        store = FlightStore(ttl=0.05)
+        store["a"] = _table(10)
+        self.assertIn("a", store)
+        time.sleep(0.1)
+        self.assertNotIn("a", store)
+        store["b"] = _table(10)
+        time.sleep(0.1)
+        stats = store.get_stats()
+        self.assertEqual(0, stats["flights"])
+        self.assertEqual(2, stats["expirations"])
+        self.assertEqual(0, stats["size_bytes"])
+
+    def test_ttl_idle_shard(self):
+        store = FlightStore(ttl=0.05, shards=2)
+        idle = next(k for k in range(10) if store._get_shard(k) is store._shards[0])
+        busy = next(k for k in range(10) if store._get_shard(k) is store._shards[1])
+        store[idle] = _table(10)
+        time.sleep(0.1)
+        # Putting to another shard expires the abandoned flight
+        store[busy] = _table(10)
+        self.assertEqual(80, store.size_bytes)
+        self.assertEqual(1, store.get_stats()["expirations"])
+
+    def test_shards(self):
+        store = FlightStore(shards=4)
+        for i in range(20):
+            store[i] = _table(1)
+        self.assertEqual(20, len(store))
+        self.assertEqual(set(range(20)), {key for key, _ in store.items()})
+        self.assertEqual(160, store.get_stats()["size_bytes"])
+
+    def test_lru_eviction_across_shards(self):
+        store = FlightStore(max_bytes=800, shards=4)
+        for i in range(10):
+            store[i] = _table(10)
+        store[0]
+        store[10] = _table(10)
+        # 1 is the least recently used flight, whatever shard it is in
+        self.assertNotIn(1, store)
+        self.assertIn(0, store)
+        self.assertEqual(10, len(store))
+
+    def test_concurrent_cycles(self):
+        store = FlightStore(max_bytes=80 * 50)
+        table = _table(10)
+
+        def cycle(worker):
+            for i in range(200):
+                key = (worker, i)
+                store[key] = table
+                # the flight may be evicted by other workers
+                found = store.pop(key, None)
+                if found is not None:
+                    self.assertTrue(found.equals(table))
+                store.items_with_size()
+                store.get_stats()
+
+        with ThreadPoolExecutor(max_workers=16) as pool:
+            list(pool.map(cycle, range(16)))
+
+        stats = store.get_stats()
+        self.assertEqual(0, stats["flights"])
+        self.assertEqual(0, stats["size_bytes"])
+        self.assertEqual(0, len(store))
+
+    def test_concurrent_budget(self):
+        store = FlightStore(max_bytes=80 * 20)
+
+        def put(worker):
+            for i in range(100):
+                store[(worker, i)] = _table(10)
+                try:
+                    store.get_with_size((worker, i // 2))
+                except KeyError:
+                    # evicted
+                    pass
+
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            list(pool.map(put, range(8)))
+
+        stats = store.get_stats()
+        self.assertLessEqual(stats["size_bytes"], store.max_bytes)
+        self.assertEqual(80 * stats["flights"], stats["size_bytes"])
+        self.assertEqual(800 - stats["flights"], stats["evictions"])
+
+
+class TestFlightStoreSpill(unittest.TestCase):
+    def setUp(self):
+        self.spill_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.spill_dir)
+
+    def _spill_files(self):
+        return [
+            os.path.join(root, name)
+            for root, _, names in os.walk(self.spill_dir)
+            for name in names
+        ]
+
+    def test_small_flight_in_memory(self):
+        store = FlightStore(spill_dir=self.spill_dir, spill_threshold=1000)
+        table = _table(10)
+        store.put_reader("a", pyarrow.RecordBatchReader.from_batches(
+            table.schema, table.to_batches()))
+        self.assertTrue(store["a"].equals(table))
+        self.assertEqual([], self._spill_files())
+        self.assertEqual(80, store.get_stats()["size_bytes"])
+
+    def test_spill_reader(self):
+        store = FlightStore(max_bytes=100, spill_dir=self.spill_dir,
+                            spill_threshold=100)
+        table = pyarrow.concat_tables([_table(10)] * 5)
+        store.put_reader("a", pyarrow.RecordBatchReader.from_batches(
+            table.schema, table.to_batches()))
+        self.assertTrue(store["a"].equals(table))
+        files = self._spill_files()
+        self.assertEqual(1, len(files))
+
+        stats = store.get_stats()
+        self.assertEqual(0, stats["size_bytes"])
+        self.assertEqual(os.path.getsize(files[0]), stats["spilled_bytes"])
+        self.assertEqual(1, stats["spills"])
+        self.assertEqual(stats["spilled_bytes"], store.get_with_size("a")[1])
+
+        self.assertTrue(store.pop("a").equals(table))
+        self.assertEqual([], self._spill_files())
+        self.assertEqual(0, store.get_stats()["spilled_bytes"])
+
+    def test_spill_table_expires(self):
+        store = FlightStore(ttl=0.05, spill_dir=self.spill_dir, spill_threshold=0)
+        store["a"] = _table(10)
+        self.assertEqual(1, len(self._spill_files()))
+        time.sleep(0.1)
+        self.assertNotIn("a", store)
+        self.assertEqual([], self._spill_files())
+
+    def test_spill_budget(self):
+        probe = FlightStore(spill_dir=self.spill_dir, spill_threshold=0)
+        probe["a"] = _table(10)
+        spill_bytes = probe.get_stats()["spilled_bytes"]
+        probe.close()
+
+        store = FlightStore(spill_dir=self.spill_dir, spill_threshold=0,
+                            max_spill_bytes=2 * spill_bytes)
+        store["a"] = _table(10)
+        store["b"] = _table(10)
+        store["a"]
+        store["c"] = _table(10)
+        self.assertIn("a", store)
+        self.assertNotIn("b", store)
+        self.assertIn("c", store)
+        stats = store.get_stats()
+        self.assertEqual(2 * spill_bytes, stats["spilled_bytes"])
+        self.assertEqual(1, stats["evictions"])
+
+        with self.assertRaises(FlightTooLargeError):
+            store["d"] = _table(100)
+        self.assertEqual(2, len(self._spill_files()))
+
+    def test_deferred_spill_file_deletion(self):
+        store = FlightStore(spill_dir=self.spill_dir, spill_threshold=0)
+        store["a"] = _table(10)
+        # Windows refuses to delete files which are still mapped
+        with patch("tabpy.tabpy_server.app.flight_store.os.remove",
+                   side_effect=PermissionError):
+            store.pop("a")
+        self.assertEqual(1, len(self._spill_files()))
+        self.assertEqual(0, store.get_stats()["spilled_bytes"])
+        self.assertEqual(0, len(store))
+        self.assertEqual([], self._spill_files())
+
+    def test_close(self):
+        store = FlightStore(spill_dir=self.spill_dir, spill_threshold=0)
+        store["a"] = _table(10)
+        store.close()
+        self.assertEqual(0, len(store))
+        self.assertEqual([], os.listdir(self.spill_dir))
@@ -0,0 +1,70 @@
+import unittest
+
+import numpy as np
+
+from tabpy.tabpy_server.common import json_codec
+
+
+class _CodecTests:
+    def test_loads_bytes(self):
+        self.assertEqual(
+            {"data": {"_arg1": [1, 2.5, "x", None]}},
+            self.codec.loads(b'{"data": {"_arg1": [1, 2.5, "x", null]}}'),
+        )
+
+    def test_loads_nan(self):
+        self.assertTrue(np.isnan(self.codec.loads(b"[NaN]")[0]))
+
+    def test_dumps_nan_as_null(self):
+        self.assertEqual(
+            [1.0, None, None, 2.0],
+            self.codec.loads(
+                self.codec.dumps([1.0, float("nan"), float("inf"), 2.0])
+            ),
+        )
+
+    def test_dumps_numpy(self):
+        value = {
+            "array": np.array([1.5, np.nan, 3.0]),
+            "strided": np.arange(6)[::2],
+            "scalar": np.int64(7),
+        }
+        self.assertEqual(
+            {"array": [1.5, None, 3.0], "strided": [0, 2, 4], "scalar": 7},
+            self.codec.loads(self.codec.dumps(value)),
+        )
+
+    def test_dumps_big_int(self):
+        self.assertEqual(b"[1180591620717411303424]", self.codec.dumps([2 ** 70]))
+
+    def test_dumps_not_serializable(self):
+        with self.assertRaises(TypeError):
+            self.codec.dumps([object()])
+
+
+class TestStdlibCodec(_CodecTests, unittest.TestCase):
+    def setUp(self):
+        self.codec = json_codec.StdlibCodec()
+
+
+@unittest.skipIf(json_codec.orjson is None, "orjson is not installed")
+class TestOrjsonCodec(_CodecTests, unittest.TestCase):
+    def setUp(self):
+        self.codec = json_codec.OrjsonCodec()
+
+
+class TestSetCodec(unittest.TestCase):
+    def setUp(self):
+        self.codec_name = json_codec.get_codec().name
+
+    def tearDown(self):
+        json_codec.set_codec(self.codec_name)
+
+    def test_set_codec(self):
+        json_codec.set_codec("stdlib")
+        self.assertEqual("stdlib", json_codec.get_codec().name)
+        self.assertEqual(b"[1, null]", json_codec.dumps([1, float("nan")]))
+
+    def test_set_unknown_codec(self):
+        with self.assertRaises(RuntimeError):
+            json_codec.set_codec("xml")
@@ -0,0 +1,131 @@
+import concurrent.futures
+import threading
+import unittest
+
+from tabpy.tabpy_server.common.messages import QueryFailed, QuerySuccessful
+from tabpy.tabpy_server.psws.micro_batcher import MicroBatcher
+from tabpy.tabpy_server.psws.python_service import PythonService
+
+
+class _RecordingModel:
+    def __init__(self):
+        self.calls = []
+        self.lock = threading.Lock()
+
+    def query(self, x, scale=1):
+        if not isinstance(x, list):
+            return x * scale
+        with self.lock:
+            self.calls.append(list(x))
+        if "bad" in x:
+            raise ValueError("bad row")
+        return [v * scale for v in x]
+
+
+def _run_concurrently(batcher, model, params_list):
+    with concurrent.futures.ThreadPoolExecutor(len(params_list)) as executor:
+        futures = [
+            executor.submit(batcher.query, model, params) for params in params_list
+        ]
+        return [f.result() for f in futures]
+
+
+class TestMicroBatcher(unittest.TestCase):
+    def test_concurrent_queries_batched(self):
+        model = _RecordingModel()
+        batcher = MicroBatcher(window=0.3)
+        params_list = [{"x": [i, i + 1]} for i in range(0, 8, 2)]
+
+        results = _run_concurrently(batcher, model, params_list)
+
+        self.assertEqual([p["x"] for p in params_list], results)
+        self.assertEqual(1, len(model.calls))
+        self.assertEqual(8, len(model.calls[0]))
+        stats = batcher.get_stats()
+        self.assertEqual(1, stats["batches"])
+        self.assertEqual(4, stats["batched_queries"])
+
+    def test_positional_arguments(self):
+        model = _RecordingModel()
+        batcher = MicroBatcher(window=0.3)
+
+        results = _run_concurrently(batcher, model, [[[1], 2], [[3, 4], 2]])
+
+        self.assertEqual([[2], [6, 8]], results)
+        self.assertEqual(1, len(model.calls))
+
+    def test_different_scalar_arguments_not_batched(self):
+        model = _RecordingModel()
+        batcher = MicroBatcher(window=0.2)
+
+        results = _run_concurrently(
+            batcher, model, [{"x": [1], "scale": 2}, {"x": [1], "scale": 3}]
+        )
+
+        self.assertEqual([[2], [3]], results)
+        self.assertEqual(2, len(model.calls))
+
+    def test_max_rows(self):
+        model = _RecordingModel()
+        batcher = MicroBatcher(window=5, max_rows=4)
+        params_list = [{"x": [i, i]} for i in range(2)]
+
+        results = _run_concurrently(batcher, model, params_list)
+
+        # the full batch does not wait for the 5 s window
+        self.assertEqual([[0, 0], [1, 1]], results)
+        self.assertEqual([[0, 0, 1, 1]], model.calls)
+
+    def test_not_batchable(self):
+        model = _RecordingModel()
+        batcher = MicroBatcher(window=5)
+
+        # without list arguments, or with lists of different lengths
+        self.assertEqual(2, batcher.query(model, {"x": 1, "scale": 2}))
+        self.assertEqual(
+            [[1], [1, 1]], batcher.query(model, {"x": [1, 2], "scale": [1]})
+        )
+        self.assertEqual(0, batcher.get_stats()["batches"])
+
+    def test_fallback_on_failure(self):
+        model = _RecordingModel()
+        batcher = MicroBatcher(window=0.3)
+
+        futures = []
+        with concurrent.futures.ThreadPoolExecutor(2) as executor:
+            futures.append(executor.submit(batcher.query, model, {"x": [1]}))
+            futures.append(executor.submit(batcher.query, model, {"x": ["bad"]}))
+
+        self.assertEqual([1], futures[0].result())
+        with self.assertRaises(ValueError):
+            futures[1].result()
+        self.assertEqual(1, batcher.get_stats()["fallbacks"])
+
+
+class TestPythonServiceBatching(unittest.TestCase):
+    def test_query_with_batcher(self):
+        model = _RecordingModel()
+        ps = PythonService()
+        ps.query_objects["model"] = {
+            "version": 2,
+            "type": "model",
+            "endpoint_obj": model,
+            "status": "LoadSuccessful",
+            "last_error": None,
+            "batcher": MicroBatcher(window=0.3),
+        }
+
+        with concurrent.futures.ThreadPoolExecutor(3) as executor:
+            futures = [
+                executor.submit(ps.query, "model", {"x": x}, "uid")
+                for x in ([1], [2, 3], ["bad"])
+            ]
+        responses = [f.result() for f in futures]
+
+        self.assertEqual(QuerySuccessful("model", 2, [1]), responses[0])
+        self.assertEqual(QuerySuccessful("model", 2, [2, 3]), responses[1])
+        self.assertIsInstance(responses[2], QueryFailed)
+        self.assertEqual(
+            {"model": ps.query_objects["model"]["batcher"].get_stats()},
+            ps.get_batching_stats(),
+        )
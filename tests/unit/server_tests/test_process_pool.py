@@ -0,0 +1,75 @@
+import math
+import time
+import unittest
+
+import numpy as np
+
+from tabpy.tabpy_server.app.process_pool import ProcessPool
+
+
+class _NotPicklableError(Exception):
+    def __init__(self, message, lock):
+        super().__init__(message)
+        self.lock = lock
+
+
+def _raise_not_picklable():
+    import threading
+    raise _NotPicklableError("cannot pickle me", threading.Lock())
+
+
+class TestProcessPool(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.pool = ProcessPool(max_workers=2)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.pool.shutdown()
+
+    def test_submit(self):
+        future = self.pool.submit(math.factorial, 10)
+        self.assertEqual(3628800, future.result(timeout=30))
+
+    def test_map(self):
+        self.assertEqual(
+            [1, 4, 9], list(self.pool.map(pow, [1, 2, 3], [2, 2, 2], timeout=30))
+        )
+
+    def test_exception(self):
+        future = self.pool.submit(math.sqrt, "not a number")
+        with self.assertRaises(TypeError):
+            future.result(timeout=30)
+
+    def test_not_picklable_exception(self):
+        future = self.pool.submit(_raise_not_picklable)
+        with self.assertRaises(Exception) as err:
+            future.result(timeout=30)
+        self.assertEqual("_NotPicklableError", err.exception.__class__.__name__)
+        self.assertEqual("cannot pickle me", str(err.exception))
+
+    def test_numpy_arguments(self):
+        arr = np.arange(1000000, dtype=np.float64)
+        result = self.pool.submit(np.multiply, arr, 2).result(timeout=30)
+        self.assertTrue(np.array_equal(arr * 2, result))
+        self.assertTrue(result.flags.writeable)
+
+    def test_not_picklable_call(self):
+        future = self.pool.submit(lambda: 1)
+        with self.assertRaises(Exception):
+            future.result(timeout=30)
+        # the pool is still usable
+        self.assertEqual(2, self.pool.submit(abs, -2).result(timeout=30))
+
+    def test_reclaim(self):
+        future = self.pool.submit(time.sleep, 60)
+        while not future.running():
+            time.sleep(0.01)
+        self.assertTrue(self.pool.reclaim(future))
+        with self.assertRaises(TimeoutError):
+            future.result(timeout=30)
+        self.assertFalse(self.pool.reclaim(future))
+        self.assertGreaterEqual(self.pool.get_stats()["reclaimed_workers"], 1)
+        # the killed worker is replaced
+        results = [self.pool.submit(abs, -i) for i in range(4)]
+        self.assertEqual([0, 1, 2, 3], [r.result(timeout=30) for r in results])
@@ -0,0 +1,153 @@
+import json
+import os
+import tempfile
+import threading
+import time
+
+from tornado.testing import AsyncHTTPTestCase
+
+from tabpy.tabpy_server.app.app import TabPyApp
+
+
+class _AddModel:
+    def query(self, x, y=0):
+        return x + y
+
+
+class _CountingModel:
+    def __init__(self):
+        self.calls = 0
+
+    def query(self, x):
+        self.calls += 1
+        return x * 2
+
+
+class _FailingModel:
+    def query(self, x):
+        raise ValueError("bad input")
+
+
+class _SlowModel:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.running = 0
+        self.max_running = 0
+
+    def query(self, x):
+        with self.lock:
+            self.running += 1
+            self.max_running = max(self.max_running, self.running)
+        time.sleep(0.1)
+        with self.lock:
+            self.running -= 1
+        return x
+
+
+def _endpoint(endpoint_obj, version=1):
+    return {
+        "version": version,
+        "type": "model",
+        "endpoint_obj": endpoint_obj,
+        "status": "LoadSuccessful",
+        "last_error": None,
+    }
+
+
+class TestQueryBatchHandler(AsyncHTTPTestCase):
+    @classmethod
+    def setUpClass(cls):
+        prefix = "__TestQueryBatchHandler_"
+
+        # create config file
+        cls.config_file = tempfile.NamedTemporaryFile(
+            mode="w+t", prefix=prefix, suffix=".conf", delete=False
+        )
+        cls.config_file.write(
+            "[TabPy]\n"
+            "TABPY_QUERY_WORKERS = 8\n"
+            "TABPY_QUERY_BATCH_PARALLELISM = 2"
+        )
+        cls.config_file.close()
+
+    @classmethod
+    def tearDownClass(cls):
+        os.remove(cls.config_file.name)
+
+    def get_app(self):
+        self.app = TabPyApp(self.config_file.name)
+        self.slow_model = _SlowModel()
+        query_objects = self.app.python_service.ps.query_objects
+        query_objects["add"] = _endpoint(_AddModel(), version=3)
+        query_objects["failing"] = _endpoint(_FailingModel())
+        query_objects["slow"] = _endpoint(self.slow_model)
+        self.deterministic = _CountingModel()
+        query_objects["deterministic"] = dict(
+            _endpoint(self.deterministic), options={"is_deterministic": True}
+        )
+        return self.app._create_tornado_web_app()
+
+    def _batch(self, name, body):
+        return self.fetch(
+            f"/query/{name}/batch", method="POST", body=json.dumps(body)
+        )
+
+    def test_results_in_order(self):
+        response = self._batch(
+            "add",
+            {
+                "queries": [
+                    {"data": {"x": 1, "y": 2}},
+                    {"data": [10, 20]},
+                    {"endpoint": "missing", "data": {"x": 1}},
+                    {"endpoint": "failing", "data": {"x": 1}},
+                    {"x": 1},
+                ]
+            },
+        )
+        self.assertEqual(200, response.code)
+        results = json.loads(response.body)["results"]
+        self.assertEqual(5, len(results))
+
+        self.assertEqual(200, results[0]["status"])
+        self.assertEqual(3, results[0]["response"])
+        self.assertEqual(3, results[0]["version"])
+        self.assertEqual("add", results[0]["model"])
+        self.assertIn("uuid", results[0])
+        self.assertEqual(200, results[1]["status"])
+        self.assertEqual(30, results[1]["response"])
+        self.assertEqual(404, results[2]["status"])
+        self.assertEqual("UnknownURI", results[2]["message"])
+        self.assertEqual(500, results[3]["status"])
+        self.assertIn("bad input", results[3]["info"]["error"])
+        self.assertEqual(400, results[4]["status"])
+
+    def test_bounded_parallelism(self):
+        response = self._batch(
+            "slow", {"queries": [{"data": {"x": i}} for i in range(6)]}
+        )
+        self.assertEqual(200, response.code)
+        results = json.loads(response.body)["results"]
+        self.assertEqual(list(range(6)), [r["response"] for r in results])
+        self.assertEqual(2, self.slow_model.max_running)
+
+    def test_result_cache(self):
+        body = {"queries": [{"data": {"x": 2}}]}
+        self._batch("deterministic", body)
+        response = self._batch("deterministic", body)
+        results = json.loads(response.body)["results"]
+        self.assertEqual(200, results[0]["status"])
+        self.assertEqual(4, results[0]["response"])
+        self.assertEqual(1, self.deterministic.calls)
+
+    def test_invalid_body(self):
+        response = self._batch("add", {"data": {"x": 1}})
+        self.assertEqual(400, response.code)
+
+        response = self._batch("add", {"queries": [1, 2]})
+        self.assertEqual(400, response.code)
+
+    def test_empty_batch(self):
+        response = self._batch("add", {"queries": []})
+        self.assertEqual(200, response.code)
+        self.assertEqual({"results": []}, json.loads(response.body))
@@ -0,0 +1,214 @@
+import json
+import os
+import tempfile
+import time
+
+from tornado.testing import AsyncHTTPTestCase, gen_test
+
+from tabpy.tabpy_server.app.app import TabPyApp
+
+
+class _SlowModel:
+    def query(self, x):
+        time.sleep(0.5)
+        return x
+
+
+def _endpoint(endpoint_obj):
+    return {
+        "version": 1,
+        "type": "model",
+        "endpoint_obj": endpoint_obj,
+        "status": "LoadSuccessful",
+        "last_error": None,
+    }
+
+
+class TestQueryPlaneHandlerExecutor(AsyncHTTPTestCase):
+    @classmethod
+    def setUpClass(cls):
+        prefix = "__TestQueryPlaneHandlerExecutor_"
+
+        # create config file
+        cls.config_file = tempfile.NamedTemporaryFile(
+            mode="w+t", prefix=prefix, suffix=".conf", delete=False
+        )
+        cls.config_file.write(
+            "[TabPy]\n"
+            "TABPY_QUERY_WORKERS = 4\n"
+            "TABPY_QUERY_MAX_IN_FLIGHT_PER_ENDPOINT = 1"
+        )
+        cls.config_file.close()
+
+    @classmethod
+    def tearDownClass(cls):
+        os.remove(cls.config_file.name)
+
+    def get_app(self):
+        self.app = TabPyApp(self.config_file.name)
+        query_objects = self.app.python_service.ps.query_objects
+        query_objects["slow1"] = _endpoint(_SlowModel())
+        query_objects["slow2"] = _endpoint(_SlowModel())
+        return self.app._create_tornado_web_app()
+
+    def _query(self, name, x):
+        return self.http_client.fetch(
+            self.get_url(f"/query/{name}"),
+            method="POST",
+            body=json.dumps({"data": {"x": x}}),
+        )
+
+    @gen_test(timeout=30)
+    def test_endpoints_overlap(self):
+        start = time.monotonic()
+        responses = yield [self._query("slow1", 1), self._query("slow2", 2)]
+        elapsed = time.monotonic() - start
+        self.assertEqual([1, 2], [json.loads(r.body)["response"] for r in responses])
+        # sequential execution would take at least 1 s
+        self.assertLess(elapsed, 0.9)
+
+    @gen_test(timeout=30)
+    def test_ioloop_not_blocked(self):
+        query = self._query("slow1", 1)
+        start = time.monotonic()
+        response = yield self.http_client.fetch(self.get_url("/info"))
+        self.assertEqual(200, response.code)
+        self.assertLess(time.monotonic() - start, 0.4)
+        yield query
+
+    @gen_test(timeout=30)
+    def test_per_endpoint_limit(self):
+        start = time.monotonic()
+        yield [self._query("slow1", 1), self._query("slow1", 2)]
+        self.assertGreaterEqual(time.monotonic() - start, 1.0)
+
+        response = yield self.http_client.fetch(self.get_url("/metrics"))
+        stats = json.loads(response.body)["query_admission"]["slow1"]
+        self.assertEqual(1, stats["max_in_flight"])
+        self.assertEqual(2, stats["completed"])
+
+
+class _CountingModel:
+    def __init__(self):
+        self.calls = 0
+
+    def query(self, x):
+        self.calls += 1
+        return [v * 2 for v in x]
+
+
+class TestQueryPlaneHandlerResultCache(AsyncHTTPTestCase):
+    @classmethod
+    def setUpClass(cls):
+        prefix = "__TestQueryPlaneHandlerResultCache_"
+
+        # create config file
+        cls.config_file = tempfile.NamedTemporaryFile(
+            mode="w+t", prefix=prefix, suffix=".conf", delete=False
+        )
+        cls.config_file.write("[TabPy]\n" "TABPY_QUERY_RESULT_CACHE_SIZE_MB = 1")
+        cls.config_file.close()
+
+    @classmethod
+    def tearDownClass(cls):
+        os.remove(cls.config_file.name)
+
+    def get_app(self):
+        self.app = TabPyApp(self.config_file.name)
+        self.ps = self.app.python_service.ps
+        self.deterministic = _CountingModel()
+        self.plain = _CountingModel()
+        self.ps.query_objects["deterministic"] = dict(
+            _endpoint(self.deterministic), options={"is_deterministic": True}
+        )
+        self.ps.query_objects["plain"] = _endpoint(self.plain)
+        return self.app._create_tornado_web_app()
+
+    def _query(self, name, x, headers=None):
+        return self.fetch(
+            f"/query/{name}",
+            method="POST",
+            body=json.dumps({"data": {"x": x}}),
+            headers=headers,
+        )
+
+    def test_deterministic_endpoint_cached(self):
+        first = self._query("deterministic", [1, 2])
+        second = self._query("deterministic", [1, 2])
+        self.assertEqual(200, second.code)
+        self.assertEqual(1, self.deterministic.calls)
+
+        first_body = json.loads(first.body)
+        second_body = json.loads(second.body)
+        self.assertEqual([2, 4], second_body["response"])
+        self.assertEqual(1, second_body["version"])
+        self.assertEqual("deterministic", second_body["model"])
+        self.assertNotEqual(first_body["uuid"], second_body["uuid"])
+        self.assertEqual(first.headers["Etag"], second.headers["Etag"])
+
+        self._query("deterministic", [3])
+        self.assertEqual(2, self.deterministic.calls)
+
+    def test_if_none_match(self):
+        first = self._query("plain", [1, 2])
+        etag = first.headers["Etag"]
+
+        for if_none_match in (etag, f'"other", W/{etag}', "*"):
+            response = self._query(
+                "plain", [1, 2], headers={"If-None-Match": if_none_match}
+            )
+            self.assertEqual(304, response.code)
+            self.assertEqual(b"", response.body)
+            self.assertEqual(etag, response.headers["Etag"])
+
+        response = self._query("plain", [3], headers={"If-None-Match": etag})
+        self.assertEqual(200, response.code)
+        self.assertEqual([6], json.loads(response.body)["response"])
+        self.assertNotEqual(etag, response.headers["Etag"])
+
+        # the tag depends on the endpoint, not only on the result
+        response = self._query("deterministic", [1, 2])
+        self.assertNotEqual(etag, response.headers["Etag"])
+
+        response = self.fetch(
+            "/query/plain",
+            method="GET",
+            body=json.dumps({"data": {"x": [1, 2]}}),
+            headers={"If-None-Match": etag},
+            allow_nonstandard_methods=True,
+        )
+        self.assertEqual(304, response.code)
+
+    def test_not_deterministic_endpoint_not_cached(self):
+        self._query("plain", [1, 2])
+        self._query("plain", [1, 2])
+        self.assertEqual(2, self.plain.calls)
+
+    def test_cache_control(self):
+        self._query("deterministic", [1], headers={"Cache-Control": "no-store"})
+        self._query("deterministic", [1])
+        self.assertEqual(2, self.deterministic.calls)
+        self._query("deterministic", [1], headers={"Cache-Control": "no-cache"})
+        self.assertEqual(3, self.deterministic.calls)
+        self._query("deterministic", [1])
+        self.assertEqual(3, self.deterministic.calls)
+
+    def test_invalidated_on_new_version_and_delete(self):
+        self._query("deterministic", [1])
+        self.assertEqual(1, self.ps.result_cache.get_stats()["entries"])
+
+        # the cached result of version 1 is never returned for version 2
+        self.ps.query_objects["deterministic"]["version"] = 2
+        response = self._query("deterministic", [1])
+        self.assertEqual(2, json.loads(response.body)["version"])
+        self.assertEqual(2, self.deterministic.calls)
+
+        self.ps.delete_objects("deterministic")
+        self.assertEqual(0, self.ps.result_cache.get_stats()["entries"])
+
+        self.ps.result_cache.put(b"key", b"[2]", group="plain")
+        self.ps._load_object("plain", "deterministic", 2, True, "alias")
+        self.assertIsNone(self.ps.result_cache.get(b"key"))
+
+        response = self.fetch("/metrics")
+        self.assertIn("query_result_cache", json.loads(response.body))
@@ -0,0 +1,97 @@
+import time
+import unittest
+
+from tabpy.tabpy_server.common.result_cache import ResultCache, make_key
+
+
+class TestResultCache(unittest.TestCase):
+    def test_make_key(self):
+        self.assertEqual(make_key("list", b"body"), make_key("list", "body"))
+        self.assertNotEqual(make_key("list", b"body"), make_key("numpy", b"body"))
+        # parts are length prefixed
+        self.assertNotEqual(make_key("ab", "c"), make_key("a", "bc"))
+
+    def test_get_put(self):
+        cache = ResultCache(max_bytes=100, ttl=0)
+        self.assertIsNone(cache.get(b"k"))
+        self.assertTrue(cache.put(b"k", b"[1, 2]"))
+        self.assertEqual(b"[1, 2]", cache.get(b"k"))
+
+        stats = cache.get_stats()
+        self.assertEqual(1, stats["hits"])
+        self.assertEqual(1, stats["misses"])
+        self.assertEqual(1, stats["entries"])
+        self.assertEqual(6, stats["size_bytes"])
+
+    def test_replace(self):
+        cache = ResultCache(max_bytes=100, ttl=0)
+        cache.put(b"k", b"12345")
+        cache.put(b"k", b"123")
+        self.assertEqual(b"123", cache.get(b"k"))
+        self.assertEqual(3, cache.get_stats()["size_bytes"])
+
+    def test_lru_eviction_by_bytes(self):
+        cache = ResultCache(max_bytes=10, ttl=0)
+        cache.put(b"a", b"1234")
+        cache.put(b"b", b"1234")
+        cache.get(b"a")
+        cache.put(b"c", b"1234")
+
+        self.assertIsNone(cache.get(b"b"))
+        self.assertEqual(b"1234", cache.get(b"a"))
+        self.assertEqual(b"1234", cache.get(b"c"))
+        stats = cache.get_stats()
+        self.assertEqual(1, stats["evictions"])
+        self.assertEqual(8, stats["size_bytes"])
+
+    def test_too_large_value(self):
+        cache = ResultCache(max_bytes=3, ttl=0)
+        self.assertFalse(cache.put(b"k", b"1234"))
+        self.assertIsNone(cache.get(b"k"))
+
+    def test_ttl(self):
+        cache = ResultCache(max_bytes=100, ttl=0.05)
+        cache.put(b"k", b"1")
+        self.assertEqual(b"1", cache.get(b"k"))
+        time.sleep(0.1)
+        self.assertIsNone(cache.get(b"k"))
+        stats = cache.get_stats()
+        self.assertEqual(1, stats["expirations"])
+        self.assertEqual(0, stats["size_bytes"])
+
+    def test_invalidate_and_clear(self):
+        cache = ResultCache(max_bytes=100, ttl=0)
+        cache.put(b"a", b"1")
+        cache.put(b"b", b"2")
+        cache.invalidate(b"a")
+        self.assertIsNone(cache.get(b"a"))
+        cache.clear()
+        self.assertIsNone(cache.get(b"b"))
+        self.assertEqual(0, cache.get_stats()["size_bytes"])
+
+    def test_entry_ttl(self):
+        cache = ResultCache(max_bytes=100, ttl=0)
+        cache.put(b"a", b"1", ttl=0.05)
+        cache.put(b"b", b"2")
+        time.sleep(0.1)
+        self.assertIsNone(cache.get(b"a"))
+        self.assertEqual(b"2", cache.get(b"b"))
+
+    def test_invalidate_group(self):
+        cache = ResultCache(max_bytes=6, ttl=0)
+        cache.put(b"a", b"1", group="add")
+        cache.put(b"b", b"2", group="add")
+        cache.put(b"c", b"3", group="mul")
+        cache.invalidate_group("add")
+        self.assertIsNone(cache.get(b"a"))
+        self.assertIsNone(cache.get(b"b"))
+        self.assertEqual(b"3", cache.get(b"c"))
+        self.assertEqual(1, cache.get_stats()["size_bytes"])
+
+        # evicted entries leave their group
+        cache.put(b"d", b"1234", group="mul")
+        cache.put(b"e", b"12", group="add")
+        self.assertIsNone(cache.get(b"c"))
+        cache.invalidate_group("mul")
+        self.assertEqual(b"12", cache.get(b"e"))
+        self.assertEqual(2, cache.get_stats()["size_bytes"])
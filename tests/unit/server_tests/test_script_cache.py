@@ -0,0 +1,64 @@
+import unittest
+
+from tabpy.tabpy_server.common.script_cache import (
+    ScriptCache,
+    build_function_source,
+)
+
+
+class TestScriptCache(unittest.TestCase):
+    def test_build_function_source(self):
+        source = build_function_source("x = _arg1\nreturn x", ["_arg1", "_arg2"])
+        self.assertEqual(
+            "def _user_script(tabpy, _arg1, _arg2):\n x = _arg1\n return x\n", source
+        )
+
+    def test_hit_and_miss(self):
+        cache = ScriptCache(10)
+        f1, _ = cache.get_function("return _arg1 * 2", ["_arg1"], {})
+        f2, _ = cache.get_function("return _arg1 * 2", ["_arg1"], {})
+
+        self.assertEqual(4, f1(None, 2))
+        self.assertEqual(6, f2(None, 3))
+        # every call gets its own function object
+        self.assertIsNot(f1, f2)
+        self.assertEqual(
+            {"size": 1, "max_size": 10, "hits": 1, "misses": 1}, cache.get_stats()
+        )
+
+    def test_arguments_are_part_of_key(self):
+        cache = ScriptCache(10)
+        cache.get_function("return 1", [], {})
+        f, _ = cache.get_function("return 1", ["_arg1"], {})
+
+        self.assertEqual(1, f(None, 5))
+        self.assertEqual(2, cache.get_stats()["misses"])
+
+    def test_lru_eviction(self):
+        cache = ScriptCache(2)
+        cache.get_function("return 1", [], {})
+        cache.get_function("return 2", [], {})
+        cache.get_function("return 1", [], {})
+        cache.get_function("return 3", [], {})
+        # "return 2" was least recently used and got evicted
+        cache.get_function("return 2", [], {})
+
+        stats = cache.get_stats()
+        self.assertEqual(2, stats["size"])
+        self.assertEqual(1, stats["hits"])
+        self.assertEqual(4, stats["misses"])
+
+    def test_disabled_cache(self):
+        cache = ScriptCache(0)
+        cache.get_function("return 1", [], {})
+        cache.get_function("return 1", [], {})
+
+        stats = cache.get_stats()
+        self.assertEqual(0, stats["size"])
+        self.assertEqual(2, stats["misses"])
+
+    def test_syntax_error(self):
+        cache = ScriptCache(10)
+        with self.assertRaises(SyntaxError):
+            cache.get_function("return (", [], {})
+        self.assertEqual(0, cache.get_stats()["size"])
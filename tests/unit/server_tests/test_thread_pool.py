@@ -0,0 +1,91 @@
+import threading
+import time
+import unittest
+
+from tabpy.tabpy_server.app.thread_pool import ThreadPool
+
+
+def _spin():
+    while True:
+        pass
+
+
+def _spin_handling_errors():
+    while True:
+        try:
+            sum(range(100))
+        except Exception:
+            pass
+
+
+def _ignore_interrupts(interrupted, stop):
+    while not stop.is_set():
+        try:
+            time.sleep(0.01)
+        except BaseException:
+            interrupted.set()
+
+
+class TestThreadPool(unittest.TestCase):
+    def setUp(self):
+        self.pool = ThreadPool(max_workers=1)
+
+    def tearDown(self):
+        self.pool.shutdown()
+
+    def test_submit(self):
+        self.assertEqual(3, self.pool.submit(abs, -3).result(timeout=30))
+
+    def test_reclaim_running(self):
+        future = self.pool.submit(_spin)
+        while not future.running():
+            time.sleep(0.01)
+        self.assertTrue(self.pool.reclaim(future))
+        with self.assertRaises(TimeoutError):
+            future.result(timeout=30)
+        self.assertEqual(1, self.pool.get_stats()["reclaimed_workers"])
+        # the only worker thread is free again
+        self.assertEqual(3, self.pool.submit(abs, -3).result(timeout=30))
+
+    def test_reclaim_running_handling_errors(self):
+        future = self.pool.submit(_spin_handling_errors)
+        while not future.running():
+            time.sleep(0.01)
+        self.assertTrue(self.pool.reclaim(future))
+        with self.assertRaises(TimeoutError):
+            future.result(timeout=30)
+        stats = self.pool.get_stats()
+        self.assertEqual(1, stats["reclaimed_workers"])
+        self.assertEqual(0, stats["interrupted_workers"])
+        self.assertEqual(3, self.pool.submit(abs, -3).result(timeout=30))
+
+    def test_reclaim_ignored(self):
+        interrupted = threading.Event()
+        stop = threading.Event()
+        future = self.pool.submit(_ignore_interrupts, interrupted, stop)
+        while not future.running():
+            time.sleep(0.01)
+        self.assertTrue(self.pool.reclaim(future))
+        self.assertTrue(interrupted.wait(30))
+
+        # the script keeps its worker thread
+        stats = self.pool.get_stats()
+        self.assertEqual(0, stats["reclaimed_workers"])
+        self.assertEqual(1, stats["interrupted_workers"])
+
+        stop.set()
+        future.result(timeout=30)
+        self.assertEqual(0, self.pool.get_stats()["reclaimed_workers"])
+
+    def test_reclaim_pending(self):
+        running = self.pool.submit(time.sleep, 0.5)
+        pending = self.pool.submit(abs, -3)
+        self.assertTrue(self.pool.reclaim(pending))
+        self.assertTrue(pending.cancelled())
+        running.result(timeout=30)
+        self.assertEqual(0, self.pool.get_stats()["reclaimed_workers"])
+
+    def test_reclaim_done(self):
+        future = self.pool.submit(abs, -3)
+        future.result(timeout=30)
+        self.assertFalse(self.pool.reclaim(future))
@@ -67,6 +67,15 @@ class TestClient(unittest.TestCase):
 
         self.client._service.query.assert_called_once_with("foo", a=1, b=2, c=3)
 
+    def test_query_batch(self):
+        self.client._service.query_batch.return_value = "ok"
+
+        self.assertEqual(self.client.query_batch("foo", [[1, 2], {"a": 3}]), "ok")
+
+        self.client._service.query_batch.assert_called_once_with(
+            "foo", [[1, 2], {"a": 3}]
+        )
+
     def test_get_endpoints(self):
         self.client._service.get_endpoints.return_value = "foo"
 
@@ -105,6 +114,24 @@ class TestClient(unittest.TestCase):
         client.deploy('name', lambda: True, 'description')
         mock_evaluate_remote_script.assert_called()
 
+    def test_deploy_invalid_batch_options(self):
+        with self.assertRaises(ValueError):
+            self.client.deploy("name", lambda x: x, batch_window_ms=-1)
+        with self.assertRaises(ValueError):
+            self.client.deploy("name", lambda x: x, batch_window_ms=5, max_batch_rows=1.5)
+
+    def test_deploy_invalid_cache_options(self):
+        with self.assertRaises(ValueError):
+            self.client.deploy("name", lambda x: x, is_deterministic="yes")
+        with self.assertRaises(ValueError):
+            self.client.deploy("name", lambda x: x, cache_ttl=-5)
+
+    def test_gen_endpoint_options(self):
+        endpoint = self.client._gen_endpoint(
+            "name", lambda x: x, "", options={"batch_window_ms": 5}
+        )
+        self.assertEqual({"batch_window_ms": 5}, endpoint["options"])
+
     def test_gen_remote_script(self):
         client = Client("http://example.com:9004/", remote_server=True)
         script = client._gen_remote_script()
@@ -0,0 +1,26 @@
+import unittest
+
+import numpy
+
+from tabpy.tabpy_tools.custom_query_object import CustomQueryObject
+
+
+class TestQueryObject(unittest.TestCase):
+    def _query(self, result):
+        return CustomQueryObject(lambda: result).query()
+
+    def test_serializable_result(self):
+        self.assertEqual({"a": [1, 2]}, self._query({"a": [1, 2]}))
+
+    def test_not_serializable_result(self):
+        with self.assertRaises(TypeError):
+            self._query(object())
+
+    def test_numeric_array_passed_through(self):
+        result = numpy.array([1.5, 2.5])
+        self.assertIs(result, self._query(result))
+
+    def test_object_array(self):
+        self.assertEqual([1, "a"], self._query(numpy.array([1, "a"], dtype=object)))
+        with self.assertRaises(TypeError):
+            self._query(numpy.array([object()], dtype=object))